@@ -0,0 +1,129 @@
+import os
+import sys
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+# Проверка одновременной работы нескольких рабочих мест с одной бд:
+# писатели создают брони, читатели строят отчет, как generate_top_clients_report.
+# Запуск: python debug/check_concurrency.py [путь к hotel.db]
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from db import Database, get_db_path  # noqa: E402
+from migrations import migrate  # noqa: E402
+
+WRITERS = 3
+READERS = 3
+WRITES_PER_WRITER = 200
+DURATION_LIMIT = 120  # с
+
+source = sys.argv[1] if len(sys.argv) > 1 else get_db_path()
+work_dir = tempfile.mkdtemp()
+db_path = os.path.join(work_dir, 'hotel.db')
+shutil.copy(source, db_path)
+print(f"Копия бд: {db_path}")
+
+migrate(Database(db_path))
+
+errors = []
+reads = [0] * READERS
+stop = threading.Event()
+
+setup = sqlite3.connect(db_path)
+room_id = setup.execute("SELECT id FROM Rooms LIMIT 1").fetchone()[0]
+client_id = setup.execute("SELECT id FROM Clients LIMIT 1").fetchone()[0]
+before = setup.execute("SELECT COUNT(*) FROM Bookings").fetchone()[0]
+setup.close()
+
+
+# Каждое рабочее место - отдельный экземпляр Database со своими соединениями
+def writer(number):
+    station = Database(db_path)
+    try:
+        for i in range(WRITES_PER_WRITER):
+            # Каждый писатель бронирует свои ночи, чтобы брони не пересекались
+            night = WRITES_PER_WRITER * number + i
+            with station.transaction() as cursor:
+                cursor.execute("""
+                    INSERT INTO Bookings (room_id, checkin_date, checkout_date, total_price)
+                    VALUES (?, date('2100-01-01', ?), date('2100-01-01', ?), ?)
+                """, (room_id, f"+{night} days", f"+{night + 1} days", i))
+                booking_id = cursor.lastrowid
+                cursor.execute("INSERT INTO BookingGuests (booking_id, client_id) VALUES (?, ?)",
+                               (booking_id, client_id))
+                cursor.execute("INSERT INTO Payments (booking_id, client_id, amount, payment_date) VALUES (?, ?, ?, ?)",
+                               (booking_id, client_id, i, "2100-01-01"))
+    except sqlite3.Error as e:
+        errors.append(f"писатель {number}: {e}")
+    finally:
+        station.close_all()
+
+
+def reader(number):
+    station = Database(db_path)
+    try:
+        while not stop.is_set():
+            station.fetchall("""
+                SELECT c.id, c.name, SUM(p.amount)
+                FROM Clients c
+                JOIN Payments p ON p.client_id = c.id
+                GROUP BY c.id
+                ORDER BY SUM(p.amount) DESC
+                LIMIT 10
+            """)
+            reads[number] += 1
+    except sqlite3.Error as e:
+        errors.append(f"читатель {number}: {e}")
+    finally:
+        station.close_all()
+
+
+def checkpointer():
+    station = Database(db_path)
+    while not stop.is_set():
+        try:
+            station.checkpoint()
+        except sqlite3.Error as e:
+            errors.append(f"checkpoint: {e}")
+        time.sleep(0.2)
+    station.close_all()
+
+
+start = time.perf_counter()
+writers = [threading.Thread(target=writer, args=(n,)) for n in range(WRITERS)]
+readers = [threading.Thread(target=reader, args=(n,)) for n in range(READERS)]
+background = readers + [threading.Thread(target=checkpointer)]
+for thread in background + writers:
+    thread.start()
+for thread in writers:
+    thread.join(DURATION_LIMIT)
+stop.set()
+for thread in background:
+    thread.join()
+elapsed = time.perf_counter() - start
+
+check = sqlite3.connect(db_path)
+after = check.execute("SELECT COUNT(*) FROM Bookings").fetchone()[0]
+mode = check.execute("PRAGMA journal_mode").fetchone()[0]
+check.close()
+wal_path = db_path + '-wal'
+wal_size = os.path.getsize(wal_path) if os.path.exists(wal_path) else 0
+
+expected = WRITERS * WRITES_PER_WRITER
+print(f"Режим журнала: {mode}")
+print(f"Время: {elapsed:.2f} с")
+print(f"Записано броней: {after - before} из {expected}")
+print(f"Выполнено отчетов: {sum(reads)}")
+print(f"Размер WAL после проверки: {wal_size} байт")
+
+if errors:
+    print(f"\nОшибки ({len(errors)}):")
+    for error in errors:
+        print(f"  {error}")
+
+ok = not errors and after - before == expected and mode == 'wal'
+print("\nРЕЗУЛЬТАТ:", "OK" if ok else "ОШИБКА")
+shutil.rmtree(work_dir, ignore_errors=True)
+sys.exit(0 if ok else 1)
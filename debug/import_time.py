@@ -0,0 +1,89 @@
+import os
+import re
+import subprocess
+import sys
+
+# Время импорта модулей при запуске приложения (python -X importtime).
+# Запуск: python debug/import_time.py [--save]
+# Без аргументов сравнивает с сохраненным замером import_time_baseline.txt,
+# с --save перезаписывает его. Проверка не проходит, если при запуске
+# импортируются библиотеки, которые должны загружаться только при экспорте.
+
+DEBUG_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(DEBUG_DIR, '..', 'src')
+BASELINE = os.path.join(DEBUG_DIR, 'import_time_baseline.txt')
+LAZY = ('openpyxl', 'docx', 'lxml')
+TOP = 15
+RUNS = 5
+
+LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)')
+
+
+# Один запуск интерпретатора; возвращает {модуль: мкс} для модулей,
+# которые импортирует main, и множество всех загруженных модулей
+def measure():
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import main'],
+        cwd=SRC_DIR, capture_output=True, text=True)
+    times = {}
+    loaded = set()
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if not match:
+            continue
+        loaded.add(match.group(4))
+        # Вложенность показана отступом по два пробела; main - первый уровень
+        if len(match.group(3)) == 2:
+            times[match.group(4)] = int(match.group(2))
+        elif match.group(4) == 'main':
+            times['main (собственный код)'] = int(match.group(1))
+    return times, loaded
+
+
+# Для каждого модуля берется лучший из нескольких запусков
+def best_of(runs):
+    best = {}
+    loaded = set()
+    for _ in range(runs):
+        times, names = measure()
+        loaded |= names
+        for name, us in times.items():
+            best[name] = min(us, best.get(name, us))
+    return best, loaded
+
+
+def load_baseline():
+    if not os.path.exists(BASELINE):
+        return None
+    with open(BASELINE, encoding='utf-8') as f:
+        for line in f:
+            if line.startswith('total_us'):
+                return int(line.split()[1])
+    return None
+
+
+times, loaded = best_of(RUNS)
+total = sum(times.values())
+top = sorted(times.items(), key=lambda item: item[1], reverse=True)[:TOP]
+
+print(f"Импорт при запуске: {total / 1000:.1f} мс (лучший из {RUNS} запусков)")
+for name, us in top:
+    print(f"{us / 1000:8.1f} мс  {name}")
+
+if '--save' in sys.argv:
+    with open(BASELINE, 'w', encoding='utf-8') as f:
+        f.write("# python debug/import_time.py --save\n")
+        f.write(f"total_us {total}\n")
+        for name, us in top:
+            f.write(f"{us:>9} {name}\n")
+    print(f"Сохранено: {BASELINE}")
+else:
+    baseline = load_baseline()
+    if baseline:
+        print(f"Сохраненный замер: {baseline / 1000:.1f} мс ({(total - baseline) / baseline:+.0%})")
+
+eager = sorted({name.split('.')[0] for name in loaded} & set(LAZY))
+if eager:
+    print(f"RESULT FAIL: при запуске импортируются {', '.join(eager)}")
+    sys.exit(1)
+print("RESULT OK")
@@ -0,0 +1,137 @@
+import threading
+from bisect import bisect_left, bisect_right
+
+from db import CacheVersion
+
+
+# Даты броней хранятся в бд строками ГГГГ-ММ-ДД, поэтому сравниваются как строки
+def _iso(value):
+    return value if isinstance(value, str) else value.isoformat()
+
+
+# --- Брони одного номера, отсортированные по дате заезда ---
+# max_end[i] - самая поздняя дата выезда среди первых i+1 броней. Бронь
+# пересекается с периодом [checkin, checkout), если заезд раньше checkout,
+# а выезд позже checkin; среди броней с заездом раньше checkout (префикс
+# массива, находится бинарным поиском) достаточно проверить max_end.
+class RoomIntervals:
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.ids = []
+        self.max_end = []
+
+    def add(self, booking_id, start, end):
+        i = bisect_right(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        self.ids.insert(i, booking_id)
+        self._rebuild_max(i)
+
+    def remove(self, booking_id):
+        i = self.ids.index(booking_id)
+        del self.starts[i], self.ends[i], self.ids[i]
+        self._rebuild_max(i)
+
+    # Пересчет max_end начиная с позиции i
+    def _rebuild_max(self, i):
+        latest = self.max_end[i - 1] if i > 0 else ""
+        del self.max_end[i:]
+        for end in self.ends[i:]:
+            if end > latest:
+                latest = end
+            self.max_end.append(latest)
+
+    def overlaps(self, start, end):
+        i = bisect_left(self.starts, end)
+        return i > 0 and self.max_end[i - 1] > start
+
+    def __len__(self):
+        return len(self.ids)
+
+
+# --- Индекс занятости номеров ---
+# Загружает брони всех номеров одним запросом и отвечает, какие номера
+# свободны на период, без обращения к бд. После собственных изменений
+# индекс обновляется через add/remove; изменения с других рабочих мест
+# приводят к перезагрузке (db.CacheVersion). Индекс читается из фоновых
+# потоков, поэтому все операции идут под блокировкой; загрузка строит
+# новые структуры без нее, чтобы главный поток не ждал перезагрузки.
+class AvailabilityIndex:
+    def __init__(self, database):
+        self.database = database
+        self._rooms = {}
+        self._room_of = {}
+        self.version = CacheVersion(database)
+        self._lock = threading.RLock()
+
+    def load(self):
+        load = self.version.begin()
+        try:
+            rows = self.database.fetchall("""
+                SELECT id, room_id, checkin_date, checkout_date
+                FROM Bookings
+                ORDER BY room_id, checkin_date
+            """)
+            rooms = {}
+            room_of = {}
+            for booking_id, room_id, checkin, checkout in rows:
+                self._append(rooms, room_of, booking_id, room_id, checkin, checkout)
+        except BaseException:
+            self.version.cancel(load)
+            raise
+        with self._lock:
+            self._rooms, self._room_of = rooms, room_of
+            for booking_id, booking in self.version.finish(load):
+                if booking is None:
+                    self.remove(booking_id)
+                else:
+                    self.add(booking_id, *booking)
+
+    # Перезагрузка, если бд изменена другим соединением (или индекс еще не загружен)
+    def refresh(self):
+        if self.version.stale():
+            self.load()
+
+    # Добавление строк, уже упорядоченных по дате заезда
+    @staticmethod
+    def _append(rooms, room_of, booking_id, room_id, checkin, checkout):
+        room = rooms.setdefault(room_id, RoomIntervals())
+        room.starts.append(checkin)
+        room.ends.append(checkout)
+        room.ids.append(booking_id)
+        room.max_end.append(max(checkout, room.max_end[-1]) if room.max_end else checkout)
+        room_of[booking_id] = room_id
+
+    def add(self, booking_id, room_id, checkin, checkout):
+        with self._lock:
+            self.remove(booking_id)
+            self.version.record((booking_id, (room_id, checkin, checkout)))
+            self._rooms.setdefault(room_id, RoomIntervals()).add(booking_id, _iso(checkin), _iso(checkout))
+            self._room_of[booking_id] = room_id
+
+    def remove(self, booking_id):
+        with self._lock:
+            self.version.record((booking_id, None))
+            room_id = self._room_of.pop(booking_id, None)
+            if room_id is not None:
+                room = self._rooms[room_id]
+                room.remove(booking_id)
+                if not room:
+                    del self._rooms[room_id]
+
+    def is_free(self, room_id, checkin, checkout):
+        with self._lock:
+            room = self._rooms.get(room_id)
+            return room is None or not room.overlaps(_iso(checkin), _iso(checkout))
+
+    # Номера из room_ids, свободные на период [checkin, checkout)
+    def free_rooms(self, room_ids, checkin, checkout):
+        checkin, checkout = _iso(checkin), _iso(checkout)
+        free = set()
+        with self._lock:
+            for room_id in room_ids:
+                room = self._rooms.get(room_id)
+                if room is None or not room.overlaps(checkin, checkout):
+                    free.add(room_id)
+        return free
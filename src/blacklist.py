@@ -0,0 +1,58 @@
+import threading
+
+import contacts
+from db import CacheVersion
+
+
+# --- Черный список в памяти ---
+# Множества id клиентов из черного списка и их нормализованных паспортов.
+# Проверка гостей брони и паспорта нового клиента - только поиск в
+# множествах, без запроса к бд: она выполняется и внутри транзакции записи.
+# Загрузка и refresh() идут в фоновом потоке (App.reload_blacklist, загрузка
+# таблиц клиентов и номеров). После собственных изменений списка вызывается
+# App.reload_blacklist(), изменения с других рабочих мест обнаруживаются
+# через db.CacheVersion.
+class BlacklistCache:
+    def __init__(self, database):
+        self.database = database
+        self._clients = set()
+        self._passports = set()
+        self.version = CacheVersion(database)
+        self._lock = threading.RLock()
+
+    def load(self):
+        load = self.version.begin()
+        try:
+            rows = self.database.fetchall("""
+                SELECT c.id, c.passport
+                FROM Blacklist b
+                JOIN Clients c ON c.id = b.client_id
+            """)
+        except BaseException:
+            self.version.cancel(load)
+            raise
+        clients = {client_id for client_id, _ in rows}
+        passports = {contacts.passport(passport) for _, passport in rows}
+        passports.discard(None)
+        with self._lock:
+            self._clients, self._passports = clients, passports
+            self.version.finish(load)
+
+    # Перезагрузка, если бд изменена другим соединением (или список еще не загружен)
+    def refresh(self):
+        if self.version.stale():
+            self.load()
+
+    # Сброс после изменения черного списка: загрузится при следующем refresh
+    def invalidate(self):
+        self.version.reset()
+
+    def contains(self, client_id):
+        with self._lock:
+            return client_id in self._clients
+
+    # Паспорт (в любой записи) принадлежит клиенту из черного списка
+    def passport_listed(self, passport):
+        passport = contacts.passport(passport)
+        with self._lock:
+            return passport is not None and passport in self._passports
@@ -0,0 +1,50 @@
+# --- Данные клиента: проверка и приведение телефона и паспорта к единому виду ---
+# Clients.contact и Clients.passport хранятся так, как их ввели. Для
+# точного поиска и проверки уникальности рядом хранятся нормализованные
+# значения (contact_digits, passport_norm) с индексами. Их записывает
+# приложение при каждом добавлении и изменении клиента.
+
+
+MAX_NAME_LENGTH = 100
+MAX_CONTACT_LENGTH = 50
+MAX_PASSPORT_LENGTH = 20
+FIELDS = ("ФИО", "Контактные данные", "Паспортные данные", "Дата рождения")
+
+
+# Ошибки в данных клиента {поле: строка} - одни и те же правила для окна
+# добавления и для импорта. Формат даты рождения проверяет вызывающий код.
+def validate(data):
+    errors = [f"• Поле '{field}' не заполнено" for field in FIELDS if not data[field]]
+    if len(data["ФИО"]) > MAX_NAME_LENGTH:
+        errors.append(f"• ФИО слишком длинное (максимум {MAX_NAME_LENGTH} символов)")
+    if len(data["Контактные данные"]) > MAX_CONTACT_LENGTH:
+        errors.append(f"• Контактные данные слишком длинные (максимум {MAX_CONTACT_LENGTH} символов)")
+    if len(data["Паспортные данные"]) > MAX_PASSPORT_LENGTH:
+        errors.append(f"• Паспортные данные слишком длинные (максимум {MAX_PASSPORT_LENGTH} символов)")
+    return errors
+
+
+# Телефон - только цифры; российский номер приводится к виду 7XXXXXXXXXX
+# (8 900 ... и 900 ... записываются так же, как +7 900 ...)
+def phone(text):
+    if text is None:
+        return None
+    digits = ''.join(ch for ch in str(text) if ch.isdigit())
+    if len(digits) == 11 and digits[0] == '8':
+        digits = '7' + digits[1:]
+    elif len(digits) == 10 and digits[0] == '9':
+        digits = '7' + digits
+    return digits or None
+
+
+# Паспорт - буквы и цифры в верхнем регистре, без пробелов, дефисов и №
+def passport(text):
+    if text is None:
+        return None
+    return ''.join(ch for ch in str(text).upper() if ch.isalnum()) or None
+
+
+# Телефон записан полностью (можно искать точным совпадением)
+def is_full_phone(text):
+    digits = phone(text)
+    return digits is not None and len(digits) >= 11
@@ -0,0 +1,133 @@
+import calendar
+from datetime import date, datetime, timedelta
+
+
+# Даты во всех таблицах бд хранятся текстом ГГГГ-ММ-ДД (ISO 8601): такие
+# строки сортируются и сравниваются как даты, поэтому ORDER BY и выборки по
+# диапазону работают по индексу. В интерфейсе даты вводятся и показываются
+# как ДД.ММ.ГГГГ; преобразование выполняется только здесь.
+DB_FORMAT = "%Y-%m-%d"
+UI_FORMAT = "%d.%m.%Y"
+
+
+# Разбор даты, введенной пользователем (ДД.ММ.ГГГГ). При ошибке - ValueError
+def parse_ui(text):
+    return datetime.strptime(text.strip(), UI_FORMAT).date()
+
+
+# Разбор даты из бд
+def parse_db(text):
+    return datetime.strptime(text[:10], DB_FORMAT).date()
+
+
+# Значение для записи в бд: date/datetime или строка в формате интерфейса
+def to_db(value):
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, date):
+        return value.strftime(DB_FORMAT)
+    return parse_ui(value).strftime(DB_FORMAT)
+
+
+# Значение из бд для показа в интерфейсе. Нераспознанные значения
+# показываются как есть
+def to_ui(value):
+    if not value:
+        return ""
+    try:
+        return parse_db(value).strftime(UI_FORMAT)
+    except (TypeError, ValueError):
+        return value
+
+
+def today_db():
+    return date.today().strftime(DB_FORMAT)
+
+
+# Приведение даты произвольного из исторических форматов (ДД.ММ.ГГГГ,
+# ГГГГ-ММ-ДД, с временем или без ведущих нулей) к формату бд.
+# Возвращает None, если значение не распознано.
+def normalize(value):
+    if not isinstance(value, str):
+        return None
+    text = value.strip()
+    for fmt in (DB_FORMAT, UI_FORMAT, "%Y-%m-%d %H:%M:%S", "%d.%m.%Y %H:%M:%S", "%d.%m.%y"):
+        try:
+            return datetime.strptime(text, fmt).strftime(DB_FORMAT)
+        except ValueError:
+            continue
+    return None
+
+
+# Условие поиска по столбцу даты для значения, введенного в формате
+# интерфейса целиком или частично. Дата ("05.06.2025"), месяц ("06.2025")
+# и год ("2025") дают диапазон BETWEEN, который выполняется по индексу;
+# день и месяц без года ("05.06") и прочий текст ищутся через LIKE.
+# Возвращает (sql, params).
+def search_condition(column, text):
+    text = text.strip()
+    parts = text.split(".")
+    if not all(part.isdigit() for part in parts):
+        return f"{column} LIKE ?", (f"%{text}%",)
+    parts = [part.zfill(2) if len(part) < 4 else part for part in parts]
+    try:
+        if len(parts) == 3:
+            day = datetime.strptime(".".join(parts), UI_FORMAT).strftime(DB_FORMAT)
+            return f"{column} = ?", (day,)
+        if len(parts) == 2 and len(parts[1]) == 4:
+            month, year = parts
+            datetime.strptime(f"{year}-{month}", "%Y-%m")
+            return f"{column} BETWEEN ? AND ?", (f"{year}-{month}-01", f"{year}-{month}-31")
+        if len(parts) == 2:
+            day, month = parts
+            return f"{column} LIKE ?", (f"%-{month}-{day}",)
+        if len(parts[0]) == 4:
+            return f"{column} BETWEEN ? AND ?", (f"{parts[0]}-01-01", f"{parts[0]}-12-31")
+    except ValueError:
+        pass
+    return f"{column} LIKE ?", (f"%{text}%",)
+
+
+# Дата n лет назад; 29 февраля в невисокосном году - 28 февраля
+def _years_before(day, years):
+    try:
+        return day.replace(year=day.year - years)
+    except ValueError:
+        return day.replace(year=day.year - years, day=28)
+
+
+# Полных лет на дату today (по умолчанию - сегодня)
+def age(born, today=None):
+    if isinstance(born, datetime):
+        born = born.date()
+    today = today or date.today()
+    return today.year - born.year - ((today.month, today.day) < (born.month, born.day))
+
+
+# Условие "возраст от min_age до max_age лет включительно" по столбцу даты
+# рождения: диапазон дат BETWEEN, который выполняется по индексу.
+# max_age=None - без верхней границы. Возвращает (sql, params).
+def age_condition(column, min_age, max_age=None, today=None):
+    today = today or date.today()
+    latest = _years_before(today, min_age)
+    if max_age is None:
+        return f"{column} <= ?", (latest.strftime(DB_FORMAT),)
+    earliest = _years_before(today, max_age + 1) + timedelta(days=1)
+    return f"{column} BETWEEN ? AND ?", (earliest.strftime(DB_FORMAT), latest.strftime(DB_FORMAT))
+
+
+# Условие "день рождения в ближайшие days дней, считая сегодня" по столбцу
+# с месяцем и днем рождения ("ММ-ДД"): список дней IN (...), который
+# выполняется по индексу и через конец года. В невисокосный год родившиеся
+# 29 февраля попадают в список вместе с 28 февраля. Возвращает (sql, params).
+def birthday_condition(column, days, today=None):
+    today = today or date.today()
+    if days >= 366:
+        return f"{column} IS NOT NULL", ()
+    month_days = []
+    for offset in range(max(days, 1)):
+        day = today + timedelta(days=offset)
+        month_days.append(day.strftime("%m-%d"))
+        if (day.month, day.day) == (2, 28) and not calendar.isleap(day.year):
+            month_days.append("02-29")
+    return f"{column} IN ({', '.join('?' * len(month_days))})", tuple(month_days)
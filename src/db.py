@@ -0,0 +1,339 @@
+import sqlite3
+import threading
+import time
+import os
+from contextlib import contextmanager
+
+
+# --- Получение пути до файла с бд ---
+def get_db_path():
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    db_path = os.path.join(current_dir, "hotel.db")
+    return db_path
+
+
+# Настройки соединения, применяются один раз при его открытии.
+# WAL позволяет читать бд с других рабочих мест во время записи,
+# synchronous=NORMAL в режиме WAL не теряет целостность при сбое.
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",   # 16 МБ кэша страниц на соединение
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA wal_autocheckpoint = 1000",   # страниц
+    "PRAGMA journal_size_limit = 67108864",   # 64 МБ - предел размера WAL после checkpoint
+)
+
+# Ожидание снятия блокировки другим рабочим местом (мс)
+BUSY_TIMEOUT_MS = 3000
+# Повторы начала транзакции при занятой бд и пауза перед первым повтором (с)
+BUSY_RETRIES = 3
+BUSY_BACKOFF = 0.1
+
+# Как часто (в инструкциях виртуальной машины SQLite) прерываемый запрос
+# проверяет, не отменен ли он
+PROGRESS_STEPS = 1000
+# Размер первой и наибольшей пачки строк при чтении по частям
+FIRST_CHUNK = 100
+MAX_CHUNK = 10000
+
+
+# Запрос прерван по отмене (кнопкой или более новым запросом того же списка)
+class QueryCancelled(Exception):
+    pass
+
+
+# Запрос прерван, потому что выполнялся дольше отведенного времени
+class QueryTimeout(Exception):
+    pass
+
+
+# --- Отмена запросов ---
+# Токен передается в Database.interruptible: пока он действует, запросы
+# потока проверяют его каждые PROGRESS_STEPS инструкций SQLite. Запрос
+# прерывается после cancel() (из любого потока) или по истечении timeout
+# секунд и завершается ошибкой QueryCancelled или QueryTimeout.
+class CancelToken:
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self._deadline = time.monotonic() + timeout if timeout else None
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    def cancelled(self):
+        return self._event.is_set()
+
+    def expired(self):
+        return self._deadline is not None and time.monotonic() > self._deadline
+
+    # Проверка для progress handler: ненулевой результат прерывает запрос
+    def __call__(self):
+        return self._event.is_set() or self.expired()
+
+    # Ошибка, которой завершается прерванный запрос
+    def error(self):
+        if self.cancelled():
+            return QueryCancelled("Операция отменена")
+        return QueryTimeout(f"Запрос выполнялся дольше {self.timeout} с и был прерван, "
+                            f"чтобы не занимать базу данных. Уточните условия отбора.")
+
+
+# Ошибка "database is locked" / "database is busy"
+def is_busy_error(error):
+    code = getattr(error, 'sqlite_errorcode', None)
+    if code is not None:
+        return code & 0xFF in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+
+# --- Класс, управляющий долгоживущими соединениями с бд ---
+# Каждый поток получает собственное соединение, которое открывается при первом
+# обращении и переиспользуется до закрытия приложения.
+class Database:
+    def __init__(self, path, busy_timeout=BUSY_TIMEOUT_MS, retries=BUSY_RETRIES, backoff=BUSY_BACKOFF):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+        # Единственный писатель (writer.Writer); пока он не запущен,
+        # транзакции выполняются в соединении своего потока
+        self.writer = None
+
+    # Соединение текущего потока (создается при первом обращении). Внутри
+    # блока transaction() при запущенном писателе - соединение писателя,
+    # поэтому execute/fetchall/scalar в блоке видят его изменения.
+    def connection(self):
+        writer = self.writer
+        if writer is not None:
+            conn = writer.operation_connection()
+            if conn is not None:
+                return conn
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self.open_connection()
+            self._local.conn = conn
+            self._local.depth = 0
+        return conn
+
+    # Новое соединение; закрывается вместе с остальными в close_all()
+    def open_connection(self):
+        conn = self._connect()
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def _connect(self):
+        # isolation_level=None - транзакциями управляет transaction()
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout / 1000,
+                               isolation_level=None, check_same_thread=False)
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout)}")
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    # Начало транзакции на запись. Если бд занята другим рабочим местом
+    # дольше busy_timeout, попытка повторяется с растущей паузой.
+    def begin(self, conn):
+        delay = self.backoff
+        for attempt in range(self.retries + 1):
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                return
+            except sqlite3.OperationalError as e:
+                if not is_busy_error(e) or attempt == self.retries:
+                    raise
+            time.sleep(delay)
+            delay *= 2
+
+    # Транзакция: фиксируется при выходе из блока, откатывается при исключении.
+    # Вложенные вызовы оформляются через SAVEPOINT. Если запущен писатель,
+    # блок выполняется как его операция (см. writer.py), и чтение через
+    # db.* внутри блока идет через то же соединение (см. connection()).
+    @contextmanager
+    def transaction(self):
+        writer = self.writer
+        if writer is not None:
+            with writer.transaction() as cursor:
+                yield cursor
+            return
+        conn = self.connection()
+        depth = self._local.depth
+        if depth == 0:
+            self.begin(conn)
+        else:
+            conn.execute(f"SAVEPOINT sp_{depth}")
+        self._local.depth = depth + 1
+        try:
+            yield conn.cursor()
+        except BaseException:
+            self._local.depth = depth
+            if depth == 0:
+                conn.execute("ROLLBACK")
+            else:
+                conn.execute(f"ROLLBACK TO sp_{depth}")
+                conn.execute(f"RELEASE sp_{depth}")
+            raise
+        else:
+            self._local.depth = depth
+            if depth == 0:
+                conn.execute("COMMIT")
+            else:
+                conn.execute(f"RELEASE sp_{depth}")
+
+    def execute(self, sql, params=()):
+        return self.connection().execute(sql, params)
+
+    def fetchall(self, sql, params=()):
+        return self.connection().execute(sql, params).fetchall()
+
+    def fetchone(self, sql, params=()):
+        return self.connection().execute(sql, params).fetchone()
+
+    # Строки результата пачками: первая - из FIRST_CHUNK строк, каждая
+    # следующая вдвое больше (до MAX_CHUNK), чтобы первые строки можно было
+    # показать сразу, а остальные - за несколько обновлений таблицы
+    def chunks(self, sql, params=()):
+        cursor = self.connection().execute(sql, params)
+        size = FIRST_CHUNK
+        while True:
+            rows = cursor.fetchmany(size)
+            if not rows:
+                return
+            yield rows
+            size = min(size * 2, MAX_CHUNK)
+
+    # Запросы внутри блока прерываются по токену token (CancelToken).
+    # Вложенный блок проверяет и свой токен, и токены внешних блоков.
+    @contextmanager
+    def interruptible(self, token):
+        conn = self.connection()
+        tokens = getattr(self._local, 'tokens', ())
+        self._local.tokens = tokens + (token,)
+        conn.set_progress_handler(self._interrupted, PROGRESS_STEPS)
+        try:
+            yield token
+        except sqlite3.OperationalError as e:
+            if token() and 'interrupt' in str(e):
+                raise token.error() from e
+            raise
+        finally:
+            self._local.tokens = tokens
+            if not tokens:
+                conn.set_progress_handler(None, 0)
+
+    def _interrupted(self):
+        return any(token() for token in self._local.tokens)
+
+    # Проверка токенов между запросами (в долгих циклах обработки строк)
+    def check(self):
+        for token in getattr(self._local, 'tokens', ()):
+            if token():
+                raise token.error()
+
+    # Первое значение первой строки (или None)
+    def scalar(self, sql, params=()):
+        row = self.fetchone(sql, params)
+        return row[0] if row else None
+
+    # Признак изменения бд другими рабочими местами для кэшей в памяти:
+    # (ключ соединения, PRAGMA data_version). Значение меняется, только если
+    # бд изменило другое соединение, и у каждого соединения оно свое. Пока
+    # работает писатель, берется его соединение: собственные изменения
+    # приложения идут через него и значение не меняют, поэтому кэши, уже
+    # обновленные через add/remove, не перезагружаются. Без писателя -
+    # соединение текущего потока.
+    def data_version(self):
+        writer = self.writer
+        if writer is not None:
+            return writer.data_version()
+        return threading.get_ident(), self.scalar("PRAGMA data_version")
+
+    # Перенос содержимого WAL в основной файл бд и усечение WAL.
+    # Возвращает False, если checkpoint не завершен из-за активных читателей.
+    def checkpoint(self):
+        conn = self.connection()
+        if conn.in_transaction:
+            return False
+        try:
+            busy, _, _ = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        except sqlite3.OperationalError as e:
+            if is_busy_error(e):
+                return False
+            raise
+        return busy == 0
+
+    # Закрывает все открытые соединения (при выходе из приложения)
+    def close_all(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+
+
+# --- Версия данных кэша в памяти ---
+# Общая часть кэшей (availability.py, blacklist.py, names.py). Кэш строит
+# новые структуры без своей блокировки и подменяет ими старые под ней:
+#   load = version.begin()      - до чтения данных
+#   changes = version.finish(load) - под блокировкой кэша, вместе с подменой;
+#                                  возвращает изменения, записанные record()
+#                                  за время загрузки, для повтора
+# stale() - бд изменило другое рабочее место (см. Database.data_version(),
+# значение запоминается для каждого соединения) или был reset(). Если reset()
+# случился во время загрузки, ее версия не запоминается: данные могли быть
+# прочитаны до изменения, и следующий refresh загрузит их снова.
+class CacheVersion:
+    def __init__(self, database):
+        self.database = database
+        self._loaded = {}
+        self._generation = 0
+        self._journals = []
+        self._lock = threading.Lock()
+
+    def begin(self):
+        journal = []
+        with self._lock:
+            self._journals.append(journal)
+            generation = self._generation
+        return journal, generation, self.database.data_version()
+
+    def finish(self, load):
+        journal, generation, (key, version) = load
+        with self._lock:
+            self._journals.remove(journal)
+            if generation == self._generation:
+                self._loaded[key] = version
+        return journal
+
+    # Загрузка не удалась
+    def cancel(self, load):
+        with self._lock:
+            self._journals.remove(load[0])
+
+    # Собственное изменение кэша (add/remove) во время идущих загрузок
+    def record(self, change):
+        with self._lock:
+            for journal in self._journals:
+                journal.append(change)
+
+    def stale(self):
+        key, version = self.database.data_version()
+        with self._lock:
+            return self._loaded.get(key) != version
+
+    def reset(self):
+        with self._lock:
+            self._loaded = {}
+            self._generation += 1
+
+
+db = Database(get_db_path())
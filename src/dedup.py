@@ -0,0 +1,149 @@
+from difflib import SequenceMatcher
+
+import contacts
+from db import db
+
+
+# --- Поиск повторно заведенных клиентов ---
+# Сравнение каждого клиента с каждым - O(n²). Поэтому клиенты сначала
+# раскладываются по ключам блоков: паспорт, телефон, начало фамилии вместе
+# с датой рождения. Сравниваются только клиенты с общим ключом, и число
+# пар растет почти линейно. Ключи считаются по исходным полям (contacts),
+# поэтому находятся и дубликаты, записанные по-разному.
+SURNAME_PREFIX = 4
+MIN_PHONE_LENGTH = 7
+# В таком большом блоке общий ключ не говорит о дубликате
+# (например, телефон турфирмы у всех ее гостей)
+MAX_BLOCK = 50
+THRESHOLD = 0.6
+
+# Вклад совпадений в оценку пары (в сумме 1)
+NAME_WEIGHT = 0.4
+PASSPORT_WEIGHT = 0.3
+PHONE_WEIGHT = 0.15
+BIRTHDATE_WEIGHT = 0.15
+
+
+def _name(text):
+    return ' '.join(str(text or '').casefold().replace('ё', 'е').split())
+
+
+# Нормализованные поля клиента (id, name, contact, passport, birthdate)
+def _client(row):
+    phone = contacts.phone(row[2])
+    if phone is not None and len(phone) < MIN_PHONE_LENGTH:
+        phone = None
+    return row[0], _name(row[1]), phone, contacts.passport(row[3]), row[4] or None
+
+
+def _blocking_keys(client):
+    _, name, phone, passport, birthdate = client
+    keys = []
+    if passport:
+        keys.append(('passport', passport))
+    if phone:
+        keys.append(('phone', phone))
+    if name and birthdate:
+        keys.append(('name', name.split()[0][:SURNAME_PREFIX], birthdate))
+    return keys
+
+
+# Оценка пары от 0 до 1 и список совпавших полей. ФИО сравниваются
+# последними - это самая дорогая часть; если пара не наберет threshold
+# даже при полном совпадении ФИО, возвращается None.
+def score(a, b, threshold=0.0):
+    total = 0.0
+    reasons = []
+    if a[3] and a[3] == b[3]:
+        total += PASSPORT_WEIGHT
+        reasons.append("паспорт")
+    if a[2] and a[2] == b[2]:
+        total += PHONE_WEIGHT
+        reasons.append("телефон")
+    if a[4] and a[4] == b[4]:
+        total += BIRTHDATE_WEIGHT
+        reasons.append("дата рождения")
+    if total + NAME_WEIGHT < threshold:
+        return None
+    matcher = SequenceMatcher(None, a[1], b[1])
+    if total + NAME_WEIGHT * matcher.quick_ratio() < threshold:
+        return None
+    similarity = matcher.ratio()
+    total += NAME_WEIGHT * similarity
+    if total < threshold:
+        return None
+    return round(total, 2), [f"ФИО {similarity:.0%}"] + reasons
+
+
+# Пары возможных дубликатов с оценкой не ниже threshold, лучшие первыми:
+# (оценка, id старшего клиента, ФИО, id младшего, ФИО, совпавшие поля)
+def find_duplicates(threshold=THRESHOLD):
+    clients = {}
+    names = {}
+    blocks = {}
+    for row in db.execute("SELECT id, name, contact, passport, birthdate FROM Clients ORDER BY id"):
+        client = _client(row)
+        clients[client[0]] = client
+        names[client[0]] = row[1]
+        for key in _blocking_keys(client):
+            blocks.setdefault(key, []).append(client[0])
+
+    pairs = {}
+    for ids in blocks.values():
+        if len(ids) < 2 or len(ids) > MAX_BLOCK:
+            continue
+        for i, first in enumerate(ids):
+            for second in ids[i + 1:]:
+                if (first, second) not in pairs:
+                    pairs[first, second] = score(clients[first], clients[second], threshold)
+
+    found = [(result[0], first, names[first], second, names[second], ", ".join(result[1]))
+             for (first, second), result in pairs.items() if result is not None]
+    found.sort(key=lambda pair: (-pair[0], pair[1], pair[3]))
+    return found
+
+
+# --- Объединение клиентов ---
+# Брони, платежи, финансовые записи и черный список дубликата переводятся
+# на клиента keep_id, дубликат удаляется. Пустые поля оставшегося клиента
+# заполняются данными дубликата. Все выполняется в одной транзакции.
+def merge(keep_id, duplicate_id):
+    if keep_id == duplicate_id:
+        raise ValueError("Нельзя объединить клиента с самим собой")
+    with db.transaction() as cursor:
+        columns = "SELECT name, contact, passport, birthdate FROM Clients WHERE id = ?"
+        keep = cursor.execute(columns, (keep_id,)).fetchone()
+        duplicate = cursor.execute(columns, (duplicate_id,)).fetchone()
+        if keep is None or duplicate is None:
+            raise ValueError("Клиент не найден - возможно, он уже удален или объединен")
+
+        # Гости переносятся вставкой и удалением (а не UPDATE), чтобы
+        # сработали триггеры поискового индекса броней
+        cursor.execute("""
+            INSERT OR IGNORE INTO BookingGuests (booking_id, client_id)
+            SELECT booking_id, ? FROM BookingGuests WHERE client_id = ?
+        """, (keep_id, duplicate_id))
+        cursor.execute("DELETE FROM BookingGuests WHERE client_id = ?", (duplicate_id,))
+        cursor.execute("UPDATE Payments SET client_id = ? WHERE client_id = ?", (keep_id, duplicate_id))
+        cursor.execute("UPDATE Finances SET client_id = ? WHERE client_id = ?", (keep_id, duplicate_id))
+
+        # Запись черного списка переносится, если у клиента ее еще нет
+        if cursor.execute("SELECT 1 FROM Blacklist WHERE client_id = ?", (keep_id,)).fetchone() is None:
+            cursor.execute("""
+                UPDATE Blacklist SET client_id = ?
+                WHERE id = (SELECT MIN(id) FROM Blacklist WHERE client_id = ?)
+            """, (keep_id, duplicate_id))
+        cursor.execute("DELETE FROM Blacklist WHERE client_id = ?", (duplicate_id,))
+
+        cursor.execute("DELETE FROM Clients WHERE id = ?", (duplicate_id,))
+        name, contact, passport, birthdate = (
+            mine if mine not in (None, '') else theirs for mine, theirs in zip(keep, duplicate))
+        passport_norm = contacts.passport(passport)
+        if cursor.execute("SELECT 1 FROM Clients WHERE passport_norm = ? AND id <> ?",
+                          (passport_norm, keep_id)).fetchone() is not None:
+            passport_norm = None  # паспорт занят еще одним дубликатом
+        cursor.execute("""
+            UPDATE Clients SET name = ?, contact = ?, passport = ?, birthdate = ?,
+                               contact_digits = ?, passport_norm = ?
+            WHERE id = ?
+        """, (name, contact, passport, birthdate, contacts.phone(contact), passport_norm, keep_id))
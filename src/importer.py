@@ -0,0 +1,196 @@
+import codecs
+import csv
+import os
+import sqlite3
+from datetime import date
+
+import contacts
+import optional
+from dates import normalize, to_db
+from db import db
+
+
+# --- Загрузка клиентов из CSV или XLSX (перенос из другой системы) ---
+# Файл читается построчно, поэтому его размер не ограничен памятью. Строки
+# проверяются по тем же правилам, что и в окне добавления клиента, и
+# записываются пачками по BATCH_SIZE (после каждой сообщается ход импорта)
+# через executemany. Каждые WRITE_SIZE строк пачки - отдельная операция
+# писателя (writer.py): пока она выполняется, изменения с других окон
+# ждут, поэтому операция должна быть короткой. Уникальность паспорта
+# проверяется по множеству нормализованных паспортов, загруженному из бд
+# один раз. Отклоненные строки с причиной пишутся в CSV рядом с исходным файлом.
+BATCH_SIZE = 10000
+WRITE_SIZE = 100
+SAMPLE_SIZE = 65536
+
+# Заголовок столбца (без учета регистра) -> поле клиента
+HEADERS = {
+    "фио": "ФИО",
+    "клиент": "ФИО",
+    "name": "ФИО",
+    "контакт": "Контактные данные",
+    "контактные данные": "Контактные данные",
+    "телефон": "Контактные данные",
+    "phone": "Контактные данные",
+    "паспорт": "Паспортные данные",
+    "паспортные данные": "Паспортные данные",
+    "passport": "Паспортные данные",
+    "дата рождения": "Дата рождения",
+    "birthdate": "Дата рождения",
+}
+
+
+# Значение ячейки как строка; числа из Excel без дробной части ".0"
+def _text(value):
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+# Кодировка CSV: UTF-8 (в том числе с BOM) или cp1251, в которой
+# сохраняет CSV русский Excel
+def _encoding(path):
+    with open(path, 'rb') as f:
+        sample = f.read(SAMPLE_SIZE)
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(sample)
+    except UnicodeDecodeError:
+        return 'cp1251'
+    return 'utf-8-sig'
+
+
+# Строки файла (первая - заголовок) как списки значений ячеек
+def read_rows(path):
+    if path.lower().endswith(('.xlsx', '.xlsm')):
+        openpyxl = optional.openpyxl()
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            for row in workbook.active.iter_rows(values_only=True):
+                yield list(row)
+        finally:
+            workbook.close()
+        return
+    with open(path, newline='', encoding=_encoding(path)) as f:
+        try:
+            dialect = csv.Sniffer().sniff(f.read(SAMPLE_SIZE), delimiters=";,\t")
+        except csv.Error:
+            dialect = csv.excel
+        f.seek(0)
+        yield from csv.reader(f, dialect)
+
+
+# Проверка строки: (ошибки, дата рождения в формате бд). Кроме ДД.ММ.ГГГГ
+# принимаются ГГГГ-ММ-ДД и даты-ячейки Excel - так их выгружают другие системы.
+def _check(data, birthdate):
+    errors = contacts.validate(data)
+    if isinstance(birthdate, date):
+        birthdate = to_db(birthdate)
+    elif data["Дата рождения"]:
+        birthdate = normalize(data["Дата рождения"])
+        if birthdate is None:
+            errors.append("• Некорректный формат даты рождения (требуется ДД.ММ.ГГГГ)")
+    return errors, birthdate
+
+
+def _reason(errors):
+    return "; ".join(error.lstrip("• ") for error in errors)
+
+
+# Запись пачки частями по WRITE_SIZE строк. Если паспорт успели добавить
+# с другого рабочего места, такая часть записывается построчно, и эти
+# строки отклоняются. Возвращает отклоненные строки пачки.
+def _insert(batch):
+    failed = []
+    for start in range(0, len(batch), WRITE_SIZE):
+        failed.extend(_insert_part(batch[start:start + WRITE_SIZE]))
+    return failed
+
+
+def _insert_part(part):
+    sql = """INSERT INTO Clients (name, contact, passport, birthdate, contact_digits, passport_norm)
+             VALUES (?, ?, ?, ?, ?, ?)"""
+    try:
+        with db.transaction() as cursor:
+            cursor.executemany(sql, [values for values, _ in part])
+        return []
+    except sqlite3.IntegrityError:
+        pass
+    failed = []
+    with db.transaction() as cursor:
+        for values, source in part:
+            try:
+                cursor.execute(sql, values)
+            except sqlite3.IntegrityError:
+                failed.append(source)
+    return failed
+
+
+# Импорт клиентов из файла path. progress(обработано, отклонено)
+# вызывается после каждой пачки. Возвращает (добавлено, отклонено, файл
+# отклоненных строк или None).
+def import_clients(path, reject_path=None, progress=None):
+    rows = read_rows(path)
+    header = next(rows, None)
+    if header is None:
+        raise ValueError("Файл пуст")
+    header = [_text(title) for title in header]
+    columns = {}
+    for i, title in enumerate(header):
+        field = HEADERS.get(title.casefold())
+        if field is not None and field not in columns:
+            columns[field] = i
+    missing = [field for field in contacts.FIELDS if field not in columns]
+    if missing:
+        raise ValueError(f"В файле нет столбцов: {', '.join(missing)}")
+
+    passports = {passport for (passport,) in
+                 db.execute("SELECT passport_norm FROM Clients WHERE passport_norm IS NOT NULL")}
+    if reject_path is None:
+        reject_path = os.path.splitext(path)[0] + ".rejected.csv"
+    imported = rejected = processed = 0
+    batch = []
+
+    with open(reject_path, 'w', newline='', encoding='utf-8-sig') as reject_file:
+        rejects = csv.writer(reject_file, delimiter=';')
+        rejects.writerow(["Строка"] + header + ["Ошибка"])
+
+        def flush():
+            nonlocal imported, rejected
+            for line, cells, reason in _insert(batch):
+                rejects.writerow([line] + cells + [reason])
+                rejected += 1
+                imported -= 1
+            imported += len(batch)
+            batch.clear()
+            if progress is not None:
+                progress(processed, rejected)
+
+        for line, row in enumerate(rows, start=2):
+            cells = [_text(value) for value in row]
+            if not any(cells):
+                continue
+            processed += 1
+            data = {field: cells[i] if i < len(cells) else "" for field, i in columns.items()}
+            i = columns["Дата рождения"]
+            errors, birthdate = _check(data, row[i] if i < len(row) else None)
+            passport = contacts.passport(data["Паспортные данные"])
+            if not errors and passport in passports:
+                errors = ["• Клиент с такими паспортными данными уже существует"]
+            if errors:
+                rejects.writerow([line] + cells + [_reason(errors)])
+                rejected += 1
+                continue
+            passports.add(passport)
+            values = (data["ФИО"], data["Контактные данные"], data["Паспортные данные"], birthdate,
+                      contacts.phone(data["Контактные данные"]), passport)
+            batch.append((values, (line, cells, "Клиент с такими паспортными данными уже существует")))
+            if len(batch) >= BATCH_SIZE:
+                flush()
+        flush()
+
+    if not rejected:
+        os.remove(reject_path)
+        reject_path = None
+    return imported, rejected, reject_path
@@ -2,51 +2,82 @@ import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import sqlite3
 from datetime import datetime
-import openpyxl
 import locale
+import logging
 import os
 import glob
+import time
+from db import db, get_db_path, QueryCancelled
+from migrations import migrate, MigrationError
+from availability import AvailabilityIndex
+from blacklist import BlacklistCache
+from names import ClientNameIndex
+from workers import Worker
+from writer import Writer
+from dates import parse_ui, to_db, to_ui, today_db, search_condition, age, age_condition, birthday_condition
+from widgets import VirtualTreeview, EntryCombobox, LiveSearch
+from search import MIN_LENGTH, match_condition, global_search
+import optional
+import contacts
+import dedup
+import importer
+
+# Отладочные сообщения (время запуска и создания фреймов) выводятся в
+# консоль, только если задана переменная окружения HOTEL_DEBUG
+log = logging.getLogger(__name__)
 
 
 # --- Установка русского языка ---
-locale.setlocale(locale.LC_TIME, 'russian')
-
-# --- Получение пути до файла с бд ---
-def get_db_path():
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    db_path = os.path.join(current_dir, "hotel.db")
-    return db_path
+# 'russian' - имя локали в Windows, 'ru_RU.UTF-8' - в Linux
+for name in ('russian', 'ru_RU.UTF-8'):
+    try:
+        locale.setlocale(locale.LC_TIME, name)
+        break
+    except locale.Error:
+        continue
 
 # --- Класс, описывающий создание окна приложения ---
 class App(tk.Tk):
     def __init__(self, title, size):    
+        started = time.perf_counter()
         super().__init__()    
         self.title(title)    
         self.geometry(f'{size[0]}x{size[1]}') 
         self.minsize(size[0], size[1])
         
-        # Создание фреймов
+        # Приведение схемы бд к актуальной версии
+        self.startup_times = []
+        stage = time.perf_counter()
+        try:
+            migrate(db)
+            self.startup_times.append(("миграции бд", time.perf_counter() - stage))
+        except MigrationError as e:
+            messagebox.showerror("Ошибка базы данных", str(e))
+            db.close_all()
+            self.destroy()
+            return
+        
+        # Все изменения бд выполняются одним писателем с групповой фиксацией
+        # (после миграций, которые идут в собственной транзакции)
+        self.writer = Writer(db).start()
+        
+        # Запросы к бд и работа с файлами выполняются в фоновых потоках
+        self.worker = Worker(self)
+        
+        # Черный список в памяти: проверка гостей брони и паспортов новых клиентов
+        self.blacklist = BlacklistCache(db)
+        self.reload_blacklist()
+        
+        # ФИО клиентов в памяти для выпадающих списков выбора клиента
+        self.client_names = ClientNameIndex(db)
+        
+        # При запуске создаются только меню и окно входа. Фреймы разделов
+        # создаются и загружают данные при первом открытии (см. frame()).
+        self.frames = {}
+        stage = time.perf_counter()
         self.menu = Menu(self)
-        self.spravka = Spravka(self)
-        self.about = About(self)
-        self.clients = Clients(self)
-        self.rent = Rent(self)
-        self.room = Room(self)
-        self.report = Report(self)
-        self.payment = Payment(self)
-        self.admin = AdminPanel(self)
-        self.login = Login(self)
-        
-        # Передача ссылок в Menu для переключения фреймов
-        self.menu.set_login_frame(self.login)
-        self.menu.set_clients_frame(self.clients)
-        self.menu.set_rent_frame(self.rent)
-        self.menu.set_room_frame(self.room)
-        self.menu.set_spravka_frame(self.spravka)
-        self.menu.set_about_frame(self.about)
-        self.menu.set_report_frame(self.report)
-        self.menu.set_payment_frame(self.payment)
-        self.menu.set_admin_frame(self.admin)
+        self.startup_times.append(("меню", time.perf_counter() - stage))
+        self.show_frame("login")
         
         # Настройка стиля
         style = ttk.Style(self)
@@ -58,22 +89,96 @@ class App(tk.Tk):
                 font='Bold')
         # Сокрытие всех кнопок кроме "Вход" и "О программе" при старте
         self.menu.hide_main_buttons()
+        
+        # Периодический checkpoint, чтобы WAL-файл бд не разрастался
+        self.schedule_checkpoint()
+        
+        # Первое автоматическое резервное копирование через час (3600000 мс);
+        # дальше его планирует панель администрирования
+        self.after(3600000, self.backup_auto)
+        
+        self.startup_times.append(("всего до окна входа", time.perf_counter() - started))
+        self.report_startup_times()
         self.mainloop()
+        
+        # Закрытие соединений с бд после выхода из главного цикла
+        self.worker.shutdown()
+        self.writer.close()
+        db.close_all()
+    
+    # Фрейм раздела по имени из FRAMES. Создается при первом обращении
+    # и помещается под остальными фреймами, пока его не покажут.
+    def frame(self, name):
+        frame = self.frames.get(name)
+        if frame is None:
+            stage = time.perf_counter()
+            frame = FRAMES[name](self)
+            frame.lower()
+            self.frames[name] = frame
+            elapsed = time.perf_counter() - stage
+            if self.startup_times is not None:
+                self.startup_times.append((f"фрейм {name}", elapsed))
+            else:
+                log.debug("Фрейм %s создан за %.3f с", name, elapsed)
+        return frame
+    
+    # Показ раздела (с созданием фрейма при первом открытии)
+    def show_frame(self, name):
+        self.frame(name).tkraise()
+    
+    # Время этапов запуска - в отладочный журнал. Дальше в журнал выводится
+    # время создания каждого фрейма при первом открытии.
+    def report_startup_times(self):
+        log.debug("Время запуска:")
+        for stage, seconds in self.startup_times:
+            log.debug("  %s: %.3f с", stage, seconds)
+        self.startup_times = None
+    
+    def backup_auto(self):
+        self.frame("admin").create_backup_auto()
+    
+    # Загрузка черного списка в память в фоне (при запуске и после его изменения)
+    def reload_blacklist(self):
+        self.blacklist.invalidate()
+        self.worker.submit(self.blacklist.refresh, key="app.blacklist")
+    
+    # Планирует следующий checkpoint WAL (раз в 5 минут - 300000 мс)
+    def schedule_checkpoint(self):
+        self.after(300000, self.checkpoint_wal)
+    
+    # Переносит WAL в основной файл бд. Если другое рабочее место сейчас
+    # читает бд, checkpoint будет повторен при следующем запуске.
+    # Выполняется в фоне: checkpoint может ждать busy_timeout, пока бд
+    # занята другим рабочим местом. Ошибка не показывается - повтор через 5 минут.
+    def checkpoint_wal(self):
+        self.worker.submit(db.checkpoint, on_error=lambda error: None, key="app.checkpoint")
+        self.schedule_checkpoint()
 
 
 # --- Класс, описывающий создание фрейма КЛИЕНТЫ ---
 class Clients(ttk.Frame):
+    # Клиенты загружаются страницами по id (keyset): WHERE id > последний id
+    PAGE_SIZE = 500
+    NOT_BLACKLISTED = "NOT EXISTS (SELECT 1 FROM Blacklist b WHERE b.client_id = Clients.id)"
+    CLIENT_CARD_FIELDS = ("Визитов", "Ночей", "Оплачено", "Задолженность", "Последний заезд", "Черный список")
+
     def __init__(self, parent):
         super().__init__(parent)
         testLbl = ttk.Label(self, background='#35A7FF')
         testLbl.pack(expand=True, fill='both')
         self.place(relx=0.3, y=0, relwidth=0.7, relheight=1)
+        self.worker = parent.worker
         self.create_widgets()
-        self.fetch_data()
-        self.display_data()
         self.selected_item = None
+        self.rows = []
+        self.total = 0
+        self.has_more = False
+        self.loading = False
+        self.condition, self.params = self.NOT_BLACKLISTED, ()
+        self.importing = False
+        self.import_progress = (0, 0)
         self.blacklist_data = []
-        self.load_blacklist()
+        self.refresh_data()
         
     # Создание виджетов
     def create_widgets(self):
@@ -113,16 +218,18 @@ class Clients(ttk.Frame):
         
         self.history_client_search_entry = ttk.Entry(search_frame)
         self.history_client_search_entry.pack(side='left', padx=5, expand=True, fill='x')
+        LiveSearch(self.history_client_search_entry, self.search_history_clients)
         
         ttk.Button(search_frame, text="Найти", command=self.search_history_clients).pack(side='left', padx=5)
         ttk.Button(search_frame, text="Сброс", command=self.reset_history_client_search).pack(side='left', padx=5)
         
         # Таблица клиентов для истории
-        self.history_clients_tree = ttk.Treeview(
+        self.history_clients_tree = VirtualTreeview(
             self.history_tab, 
             columns=("ID", "ФИО", "Контакт", "Паспорт"), 
             show="headings",
-            height=5
+            height=5,
+            key=lambda row: row[0]
         )
         
         # Настройка колонок
@@ -140,13 +247,24 @@ class Clients(ttk.Frame):
         self.history_clients_tree.pack(fill='x', padx=5, pady=5)
         self.history_clients_tree.bind('<<TreeviewSelect>>', self.on_history_client_select)
         
+        # Карточка выбранного клиента: итоги за все время
+        card = ttk.LabelFrame(self.history_tab, text="Карточка клиента")
+        card.pack(fill='x', padx=5, pady=5)
+        self.client_card_labels = {}
+        for i, field in enumerate(self.CLIENT_CARD_FIELDS):
+            ttk.Label(card, text=f"{field}:").grid(row=i // 3, column=i % 3 * 2, sticky='e', padx=5, pady=2)
+            self.client_card_labels[field] = ttk.Label(card, text="—")
+            self.client_card_labels[field].grid(row=i // 3, column=i % 3 * 2 + 1, sticky='w', padx=5, pady=2)
+        
         # Таблица истории бронирований выбранного клиента
         ttk.Label(self.history_tab, text="История бронирований:").pack(pady=(10, 0))
         
-        self.history_bookings_tree = ttk.Treeview(
+        self.history_bookings_tree = VirtualTreeview(
             self.history_tab, 
             columns=("ID", "Номер", "Заезд", "Выезд", "Сумма", "Статус"), 
-            show="headings"
+            show="headings",
+            key=lambda row: row[0],
+            display=self.booking_values
         )
         
         # Настройка колонок
@@ -174,29 +292,16 @@ class Clients(ttk.Frame):
             self.reset_history_client_search()
             return
             
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        
-        if search_field == "ФИО":
-            cursor.execute("SELECT id, name, contact, passport FROM Clients WHERE name LIKE ?", 
-                          (f"%{search_text}%",))
-        elif search_field == "Контакт":
-            cursor.execute("SELECT id, name, contact, passport FROM Clients WHERE contact LIKE ?", 
-                          (f"%{search_text}%",))
-        elif search_field == "Паспорт":
-            cursor.execute("SELECT id, name, contact, passport FROM Clients WHERE passport LIKE ?", 
-                          (f"%{search_text}%",))
-            
-        clients = cursor.fetchall()
-        conn.close()
-        
-        # Очищение таблицы
-        for row in self.history_clients_tree.get_children():
-            self.history_clients_tree.delete(row)
-        
-        # Заполнение результатами поиска
-        for client in clients:
-            self.history_clients_tree.insert("", "end", values=client)
+        if search_field not in ("ФИО", "Контакт", "Паспорт"):
+            return
+        condition, params = self.client_condition(search_field, search_text)
+        self.worker.submit(db.chunks,
+                           f"SELECT id, name, contact, passport FROM Clients WHERE {condition}", params,
+                           on_chunk=self.display_history_clients, on_done=self.display_history_clients,
+                           widget=self, key="clients.history")
+    
+    def display_history_clients(self, clients):
+        self.history_clients_tree.set_rows(clients)
             
     def reset_history_search(self):
         """Сброс поиска в истории"""
@@ -208,23 +313,13 @@ class Clients(ttk.Frame):
         self.history_client_search_entry.delete(0, tk.END)
         
         # Загрузка всех клиентов
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, name, contact, passport FROM Clients")
-        clients = cursor.fetchall()
-        conn.close()
-        
-        # Очищение таблицы
-        for row in self.history_clients_tree.get_children():
-            self.history_clients_tree.delete(row)
-        
-        # Заполние данными
-        for client in clients:
-            self.history_clients_tree.insert("", "end", values=client)
-        
-        # Очищение таблицы бронирований
-        for row in self.history_bookings_tree.get_children():
-            self.history_bookings_tree.delete(row)
+        self.worker.submit(db.chunks, "SELECT id, name, contact, passport FROM Clients",
+                           on_chunk=self.display_history_clients, on_done=self.display_history_clients,
+                           widget=self, key="clients.history")
+        
+        # Очищение таблицы бронирований и карточки
+        self.history_bookings_tree.set_rows([])
+        self.display_client_card(None)
             
     # Обработчик выбора клиента в истории
     def on_history_client_select(self, event):
@@ -234,50 +329,68 @@ class Clients(ttk.Frame):
             return
             
         client_id = self.history_clients_tree.item(selected_item[0])['values'][0]
+        self.worker.submit(self.fetch_client_card, client_id,
+                           on_done=self.display_client_card, widget=self, key="clients.card")
         self.load_client_bookings_history(client_id)
 
+    # Итоги клиента одним запросом: готовые значения из ClientStats
+    # (поддерживаются триггерами), без просмотра истории
+    def fetch_client_card(self, client_id):
+        return db.fetchone("""
+            SELECT s.visits, s.nights, s.spent, s.billed - s.paid, s.last_checkin,
+                   EXISTS (SELECT 1 FROM Blacklist WHERE client_id = c.id)
+            FROM Clients c
+            LEFT JOIN ClientStats s ON s.client_id = c.id
+            WHERE c.id = ?
+        """, (client_id,))
+
+    def display_client_card(self, row):
+        if row is None or row[0] is None:
+            values = ("—",) * len(self.CLIENT_CARD_FIELDS)
+        else:
+            visits, nights, spent, balance, last_checkin, blacklisted = row
+            values = (visits, nights, f"{spent:.2f} руб.", f"{max(balance, 0):.2f} руб.",
+                      to_ui(last_checkin) or "—", "да" if blacklisted else "нет")
+        for field, value in zip(self.CLIENT_CARD_FIELDS, values):
+            self.client_card_labels[field].config(text=value)
+
     # Загружает историю бронирований для выбранного клиента
     def load_client_bookings_history(self, client_id):
-        
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        
-        cursor.execute("""
+        self.worker.submit(self.fetch_client_bookings, client_id,
+                           on_done=self.display_client_bookings, widget=self, key="clients.bookings")
+    
+    def fetch_client_bookings(self, client_id):
+        return db.fetchall("""
             SELECT 
-                r.id, 
+                b.id, 
                 rm.room_number, 
-                r.checkin_date, 
-                r.checkout_date, 
-                r.total_price,
-                CASE 
-                    WHEN r.checkout_date < date('now') THEN 'Завершено'
-                    WHEN r.checkin_date > date('now') THEN 'Предстоящее'
-                    ELSE 'Активное'
-                END as status
-            FROM Reservations r
-            JOIN Rooms rm ON r.room_id = rm.id
-            WHERE r.client_id = ?
-            ORDER BY r.checkin_date DESC
+                b.checkin_date, 
+                b.checkout_date, 
+                b.total_price
+            FROM BookingGuests g
+            JOIN Bookings b ON g.booking_id = b.id
+            JOIN Rooms rm ON b.room_id = rm.id
+            WHERE g.client_id = ?
+            ORDER BY b.checkin_date DESC
         """, (client_id,))
-        
-        bookings = cursor.fetchall()
-        conn.close()
-        
-        # Очищение таблицы
-        for row in self.history_bookings_tree.get_children():
-            self.history_bookings_tree.delete(row)
-        
-        # Заполнение данными
-        for booking in bookings:
-            res_id, room_number, checkin_date, checkout_date, total_price, status = booking
-            self.history_bookings_tree.insert("", "end", values=(
-                res_id,
-                room_number,
-                checkin_date,
-                checkout_date,
-                f"{total_price:.2f} руб.",
-                status
-            ))
+    
+    def display_client_bookings(self, bookings):
+        self.history_bookings_tree.set_rows(bookings)
+
+    # Значения строки истории бронирований для таблицы. Статус считается
+    # здесь, только для видимых строк, а не в запросе для каждой брони
+    @staticmethod
+    def booking_values(row):
+        res_id, room_number, checkin_date, checkout_date, total_price = row
+        today = today_db()
+        if checkout_date < today:
+            status = 'Завершено'
+        elif checkin_date > today:
+            status = 'Предстоящее'
+        else:
+            status = 'Активное'
+        return (res_id, room_number, to_ui(checkin_date), to_ui(checkout_date),
+                f"{total_price:.2f} руб.", status)
             
     def create_clients_tab(self):
         # Фрейм для поиска
@@ -287,12 +400,14 @@ class Clients(ttk.Frame):
         # Поля для поиска
         ttk.Label(search_frame, text="Поиск:").pack(side='left', padx=5)
         
-        self.search_field = ttk.Combobox(search_frame, values=["ФИО", "Контакт", "Паспорт", "Дата рождения"])
+        self.search_field = ttk.Combobox(search_frame, values=["ФИО", "Контакт", "Паспорт", "Дата рождения",
+                                                              "Возраст", "Дни рождения (N дней)"])
         self.search_field.pack(side='left', padx=5)
         self.search_field.current(0)
         
         self.search_entry = ttk.Entry(search_frame)
         self.search_entry.pack(side='left', padx=5, expand=True, fill='x')
+        LiveSearch(self.search_entry, lambda: self.search_clients(quiet=True))
         
         ttk.Button(search_frame, text="Найти", command=self.search_clients).pack(side='left', padx=5)
         ttk.Button(search_frame, text="Сброс", command=self.reset_search).pack(side='left', padx=5)
@@ -307,6 +422,8 @@ class Clients(ttk.Frame):
             ('Изменить', self.open_edit_client_window),
             ('Удалить', self.delete_client),
             ('В черный список', self.add_to_blacklist),
+            ('Импорт', self.import_clients),
+            ('Дубликаты', self.open_duplicates_window),
             ('Обновить', self.refresh_data)
         ]
         
@@ -317,7 +434,9 @@ class Clients(ttk.Frame):
         
         # Таблица клиентов
         self.columns = ("ID", "ФИО", "Контакт", "Паспорт", "Дата рождения")
-        self.tree = ttk.Treeview(self.clients_tab, columns=self.columns, show="headings")
+        self.tree = VirtualTreeview(self.clients_tab, columns=self.columns, show="headings",
+                                    key=lambda row: row[0], display=self.client_values,
+                                    on_end=self.load_next_page)
         
         for col in self.columns:
             self.tree.heading(col, text=col)
@@ -332,6 +451,10 @@ class Clients(ttk.Frame):
         
         self.tree.pack(expand=True, fill='both', padx=5, pady=5)
         self.tree.bind('<<TreeviewSelect>>', self.on_tree_select)
+        
+        # Количество загруженных и найденных клиентов
+        self.count_label = ttk.Label(self.clients_tab, text="")
+        self.count_label.pack(anchor='w', padx=5, pady=(0, 5))
 
     def create_blacklist_tab(self):
         # Фрейм для поиска
@@ -347,6 +470,7 @@ class Clients(ttk.Frame):
         
         self.blacklist_search_entry = ttk.Entry(search_frame)
         self.blacklist_search_entry.pack(side='left', padx=5, expand=True, fill='x')
+        LiveSearch(self.blacklist_search_entry, self.search_blacklist)
         
         ttk.Button(search_frame, text="Найти", command=self.search_blacklist).pack(side='left', padx=5)
         ttk.Button(search_frame, text="Сброс", command=self.reset_blacklist_search).pack(side='left', padx=5)
@@ -359,10 +483,12 @@ class Clients(ttk.Frame):
         ttk.Button(button_frame, text='Обновить', command=self.load_blacklist).pack(side='right', padx=5)
         
         # Таблица черного списка
-        self.blacklist_tree = ttk.Treeview(
+        self.blacklist_tree = VirtualTreeview(
             self.blacklist_tab, 
             columns=("ID", "ФИО", "Контакт", "Паспорт", "Дата рождения", "Причина"), 
-            show="headings"
+            show="headings",
+            key=lambda row: row[0],
+            display=self.client_values
         )
         
         columns = {
@@ -385,6 +511,11 @@ class Clients(ttk.Frame):
         self.blacklist_tree.pack(expand=True, fill='both', padx=5, pady=5)
         self.blacklist_tree.bind('<<TreeviewSelect>>', self.on_blacklist_select)
 
+    # Значения строки клиента для таблицы: дата рождения в формате интерфейса
+    @staticmethod
+    def client_values(row):
+        return row[:4] + (to_ui(row[4]),) + row[5:]
+
     def on_tree_select(self, event):
         self.selected_item = self.tree.selection()[0] if self.tree.selection() else None
 
@@ -404,11 +535,11 @@ class Clients(ttk.Frame):
         for row in self.blacklist_data:
             if search_field == "ФИО" and search_text.lower() in row[1].lower():
                 filtered_data.append(row)
-            elif search_field == "Контакт" and search_text.lower() in row[2].lower():
+            elif search_field == "Контакт" and search_text.lower() in str(row[2]).lower():
                 filtered_data.append(row)
-            elif search_field == "Паспорт" and search_text.lower() in row[3].lower():
+            elif search_field == "Паспорт" and search_text.lower() in str(row[3]).lower():
                 filtered_data.append(row)
-            elif search_field == "Дата рождения" and search_text.lower() in row[4].lower():
+            elif search_field == "Дата рождения" and search_text.lower() in to_ui(row[4]):
                 filtered_data.append(row)
             elif search_field == "Причина" and search_text.lower() in row[5].lower():
                 filtered_data.append(row)
@@ -416,53 +547,103 @@ class Clients(ttk.Frame):
         self.display_filtered_blacklist(filtered_data)
 
     def display_filtered_blacklist(self, data):
-        for row in self.blacklist_tree.get_children():
-            self.blacklist_tree.delete(row)
-        for row in data:
-            self.blacklist_tree.insert("", "end", values=row)
+        self.blacklist_tree.set_rows(data)
 
     def reset_blacklist_search(self):
         self.blacklist_search_entry.delete(0, tk.END)
         self.load_blacklist()
 
-    def fetch_data(self):
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM Clients WHERE id NOT IN (SELECT client_id FROM Blacklist)")
-        self.rows = cursor.fetchall()
-        conn.close()
-
-    def display_data(self):
-        for row in self.tree.get_children():
-            self.tree.delete(row)
-        for row in self.rows:
-            self.tree.insert("", "end", values=row)
+    # Страница клиентов после клиента с id after_id
+    # Заодно обновляется черный список в памяти (проверка паспорта нового клиента)
+    def fetch_data(self, condition=NOT_BLACKLISTED, params=(), after_id=0, limit=PAGE_SIZE):
+        self.master.blacklist.refresh()
+        return db.fetchall(f"SELECT id, name, contact, passport, birthdate FROM Clients "
+                           f"WHERE ({condition}) AND id > ? ORDER BY id LIMIT ?",
+                           params + (after_id, limit))
+
+    def fetch_total(self, condition, params):
+        return db.scalar(f"SELECT COUNT(*) FROM Clients WHERE {condition}", params)
+
+    # Загрузка клиентов в фоне; таблица обновляется по готовности.
+    # Первая страница показывается сразу, число найденных - когда досчитается.
+    # Новый поиск прерывает запросы предыдущего.
+    # При обновлении того же списка загружается столько строк, сколько уже
+    # было прокручено, чтобы таблица не теряла положение
+    def load_data(self, condition=NOT_BLACKLISTED, params=()):
+        limit = self.PAGE_SIZE
+        if (condition, params) == (self.condition, self.params):
+            limit = max(limit, len(self.rows))
+        self.condition, self.params = condition, params
+        self.loading = True
+        self.total = None
+        self.worker.submit(self.fetch_data, condition, params, 0, limit,
+                           on_done=self.display_first_page, on_error=self.page_failed,
+                           widget=self, key="clients.rows", cancellable=True)
+        self.worker.submit(self.fetch_total, condition, params,
+                           on_done=self.display_total, widget=self, key="clients.total", cancellable=True)
+
+    # Подгрузка следующей страницы, когда таблица прокручена до конца
+    def load_next_page(self):
+        if self.loading or not self.has_more:
+            return
+        self.loading = True
+        self.worker.submit(self.fetch_data, self.condition, self.params, self.rows[-1][0], self.PAGE_SIZE,
+                           on_done=self.display_next_page, on_error=self.page_failed,
+                           widget=self, key="clients.rows", cancellable=True)
+
+    def display_first_page(self, rows):
+        self.loading = False
+        self.has_more = len(rows) >= self.PAGE_SIZE if self.total is None else len(rows) < self.total
+        self.display_data(rows)
+
+    def display_total(self, total):
+        self.total = total
+        self.has_more = len(self.rows) < total
+        self.display_data()
+
+    def display_next_page(self, rows):
+        self.loading = False
+        self.has_more = len(rows) == self.PAGE_SIZE
+        self.display_data(self.rows + rows)
+
+    def page_failed(self, error):
+        self.loading = False
+        if isinstance(error, QueryCancelled):
+            return
+        messagebox.showerror("Ошибка", f"Не удалось загрузить клиентов: {error}")
+
+    def display_data(self, rows=None):
+        if rows is not None:
+            self.rows = rows
+        self.tree.set_rows(self.rows)
+        if self.total is None:
+            self.count_label.config(text=f"Показано {len(self.rows)}, подсчет...")
+        else:
+            self.count_label.config(text=f"Показано {len(self.rows)} из {max(self.total, len(self.rows))}")
 
     def load_blacklist(self):
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        cursor.execute("""
+        self.worker.submit(self.fetch_blacklist,
+                           on_done=self.display_blacklist, widget=self, key="clients.blacklist")
+
+    def fetch_blacklist(self):
+        return db.fetchall("""
             SELECT c.id, c.name, c.contact, c.passport, c.birthdate, b.reason 
             FROM Clients c
             JOIN Blacklist b ON c.id = b.client_id
         """)
-        self.blacklist_data = cursor.fetchall()
-        conn.close()
-        
-        self.display_blacklist()
 
-    def display_blacklist(self):
-        for row in self.blacklist_tree.get_children():
-            self.blacklist_tree.delete(row)
-        for row in self.blacklist_data:
-            self.blacklist_tree.insert("", "end", values=row)
+    def display_blacklist(self, data=None):
+        if data is not None:
+            self.blacklist_data = data
+        self.blacklist_tree.set_rows(self.blacklist_data)
 
     def refresh_data(self):
-        self.fetch_data()
-        self.display_data()
+        self.load_data()
         self.load_blacklist()
 
-    def search_clients(self):
+    # quiet - поиск по мере ввода: недописанный возраст или число дней
+    # не вызывают предупреждений
+    def search_clients(self, quiet=False):
         search_field = self.search_field.get()
         search_text = self.search_entry.get()
         
@@ -470,21 +651,55 @@ class Clients(ttk.Frame):
             self.refresh_data()
             return
             
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        
-        if search_field == "ФИО":
-            cursor.execute("SELECT * FROM Clients WHERE name LIKE ?", (f"%{search_text}%",))
-        elif search_field == "Контакт":
-            cursor.execute("SELECT * FROM Clients WHERE contact LIKE ?", (f"%{search_text}%",))
-        elif search_field == "Паспорт":
-            cursor.execute("SELECT * FROM Clients WHERE passport LIKE ?", (f"%{search_text}%",))
+        if search_field in ("ФИО", "Контакт", "Паспорт"):
+            self.load_data(*self.client_condition(search_field, search_text))
         elif search_field == "Дата рождения":
-            cursor.execute("SELECT * FROM Clients WHERE birthdate LIKE ?", (f"%{search_text}%",))
-            
-        self.rows = cursor.fetchall()
-        conn.close()
-        self.display_data()
+            self.load_data(*search_condition("birthdate", search_text))
+        elif search_field == "Возраст":
+            ages = self.parse_age_range(search_text)
+            if ages is None:
+                if not quiet:
+                    messagebox.showwarning("Предупреждение", "Укажите возраст числом или диапазоном: 30, 25-40, 60+")
+                return
+            self.load_data(*age_condition("birthdate", *ages))
+        elif search_field == "Дни рождения (N дней)":
+            if not search_text.strip().isdigit():
+                if not quiet:
+                    messagebox.showwarning("Предупреждение", "Укажите число дней, например 7")
+                return
+            self.load_data(*birthday_condition("birth_month_day", int(search_text)))
+        else:
+            self.total = 0
+            self.display_first_page([])
+
+    # Возраст из строки поиска: "30", "25-40" или "60+" -> (от, до);
+    # до=None - без верхней границы. None, если строка не разобрана
+    @staticmethod
+    def parse_age_range(text):
+        text = text.replace(" ", "").replace("–", "-")
+        try:
+            if text.endswith("+"):
+                return int(text[:-1]), None
+            if "-" in text:
+                low, high = (int(part) for part in text.split("-"))
+                return min(low, high), max(low, high)
+            return int(text), int(text)
+        except ValueError:
+            return None
+
+    # Условие поиска клиента по полю (sql, params). Полный телефон и паспорт
+    # ищутся точно по нормализованным столбцам - как бы их ни записали, -
+    # часть значения ищется подстрокой.
+    @staticmethod
+    def client_condition(search_field, search_text):
+        if search_field == "ФИО":
+            return match_condition("ClientsSearch", "name", search_text)
+        if search_field == "Контакт":
+            if contacts.is_full_phone(search_text):
+                return "contact_digits = ?", (contacts.phone(search_text),)
+            return match_condition("ClientsSearch", "contact", search_text)
+        condition, params = match_condition("ClientsSearch", "passport", search_text)
+        return f"(passport_norm = ? OR {condition})", (contacts.passport(search_text),) + params
 
     def reset_search(self):
         self.search_entry.delete(0, tk.END)
@@ -499,9 +714,9 @@ class Clients(ttk.Frame):
         self.add_window.resizable(False, False)
         
         # Ограничения длины для полей ввода
-        max_fio_length = 100
-        max_contact_length = 50
-        max_passport_length = 20
+        max_fio_length = contacts.MAX_NAME_LENGTH
+        max_contact_length = contacts.MAX_CONTACT_LENGTH
+        max_passport_length = contacts.MAX_PASSPORT_LENGTH
         max_birthdate_length = 10  # ДД.ММ.ГГГГ - 10 символов
         
         # Функции валидации
@@ -555,28 +770,15 @@ class Clients(ttk.Frame):
             "Дата рождения": self.birthdate_entry.get().strip()
         }
         
-        errors = []
-        
-        # Проверка заполненности полей
-        for field, value in data.items():
-            if not value:
-                errors.append(f"• Поле '{field}' не заполнено")
-        
-        # Проверка максимальной длины
-        if len(data["ФИО"]) > 100:
-            errors.append("• ФИО слишком длинное (максимум 100 символов)")
-        if len(data["Контактные данные"]) > 50:
-            errors.append("• Контактные данные слишком длинные (максимум 50 символов)")
-        if len(data["Паспортные данные"]) > 20:
-            errors.append("• Паспортные данные слишком длинные (максимум 20 символов)")
+        # Проверка заполненности полей и максимальной длины
+        errors = contacts.validate(data)
         
         # Проверка формата даты
         if data["Дата рождения"]:
             try:
                 birthdate = datetime.strptime(data["Дата рождения"], "%d.%m.%Y")
-                # Проверка возраста
-                age = (datetime.now() - birthdate).days / 365
-                if age < 18:
+                # Проверка возраста (полных лет)
+                if age(birthdate) < 18:
                     if not messagebox.askyesno("Подтверждение", 
                                             "Клиент младше 18 лет. Вы уверены, что хотите добавить этого клиента?"):
                         return
@@ -594,32 +796,39 @@ class Clients(ttk.Frame):
             messagebox.showerror("Ошибка ввода данных", error_message)
             return
         
-        # Проверка уникальности паспорта
+        # Паспорт клиента из черного списка (например, заведенного повторно)
+        if self.master.blacklist.passport_listed(data["Паспортные данные"]):
+            messagebox.showerror("Ошибка", "Клиент с такими паспортными данными находится в черном списке")
+            return
+        
+        # Проверка уникальности паспорта (по индексу нормализованного номера)
+        passport_norm = contacts.passport(data["Паспортные данные"])
         try:
-            conn = sqlite3.connect(get_db_path())
-            cursor = conn.cursor()
-            cursor.execute("SELECT id FROM Clients WHERE passport = ?", (data["Паспортные данные"],))
-            if cursor.fetchone():
+            with db.transaction() as cursor:
+                cursor.execute("SELECT id FROM Clients WHERE passport_norm = ?", (passport_norm,))
+                duplicate = cursor.fetchone() is not None
+                
+                # Добавление клиента
+                if not duplicate:
+                    cursor.execute(
+                        """INSERT INTO Clients (name, contact, passport, birthdate, contact_digits, passport_norm)
+                           VALUES (?, ?, ?, ?, ?, ?)""",
+                        (data["ФИО"], data["Контактные данные"], data["Паспортные данные"], to_db(birthdate),
+                         contacts.phone(data["Контактные данные"]), passport_norm)
+                    )
+                    client_id = cursor.lastrowid
+            
+            if duplicate:
                 messagebox.showerror("Ошибка", "Клиент с такими паспортными данными уже существует")
-                conn.close()
                 return
-                
-            # Добавление клиента
-            cursor.execute(
-                "INSERT INTO Clients (name, contact, passport, birthdate) VALUES (?, ?, ?, ?)",
-                (data["ФИО"], data["Контактные данные"], data["Паспортные данные"], data["Дата рождения"])
-            )
-            conn.commit()
-            conn.close()
             
+            self.master.client_names.add(client_id, data["ФИО"])
             messagebox.showinfo("Успех", "Клиент успешно добавлен")
             self.refresh_data()
             self.add_window.destroy()
             
         except sqlite3.Error as e:
             messagebox.showerror("Ошибка базы данных", f"Не удалось добавить клиента: {str(e)}")
-            if conn:
-                conn.close()
 
         
         
@@ -637,9 +846,9 @@ class Clients(ttk.Frame):
         self.edit_window.resizable(False, False)
         
         # Ограничения длины для полей ввода
-        max_fio_length = 100
-        max_contact_length = 50
-        max_passport_length = 20
+        max_fio_length = contacts.MAX_NAME_LENGTH
+        max_contact_length = contacts.MAX_CONTACT_LENGTH
+        max_passport_length = contacts.MAX_PASSPORT_LENGTH
         max_birthdate_length = 10
         
         # Функции валидации
@@ -698,25 +907,41 @@ class Clients(ttk.Frame):
         if not all([fio, contact, passport, birthdate]):
             messagebox.showerror("Ошибка", "Все поля должны быть заполнены")
             return
+
+        try:
+            birthdate = to_db(birthdate)
+        except ValueError:
+            messagebox.showerror("Ошибка", "Некорректный формат даты. Используйте ДД.ММ.ГГГГ")
+            return
             
+        passport_norm = contacts.passport(passport)
         try:
-            conn = sqlite3.connect(get_db_path())
-            cursor = conn.cursor()
-            cursor.execute("UPDATE Clients SET name=?, contact=?, passport=?, birthdate=? WHERE id=?",
-                          (fio, contact, passport, birthdate, client_id))
-            conn.commit()
-            conn.close()
+            with db.transaction() as cursor:
+                # У повторов паспорта из старых данных нормализованного паспорта
+                # нет (см. миграцию 7). Пока паспорт не изменен, он остается
+                # пустым, иначе такого клиента нельзя было бы изменить
+                cursor.execute("SELECT passport, passport_norm FROM Clients WHERE id=?", (client_id,))
+                current = cursor.fetchone()
+                duplicate = (current is not None and current[1] is None
+                             and passport_norm is not None and contacts.passport(current[0]) == passport_norm)
+                cursor.execute("""UPDATE Clients SET name=?, contact=?, passport=?, birthdate=?,
+                                  contact_digits=?, passport_norm=? WHERE id=?""",
+                              (fio, contact, passport, birthdate,
+                               contacts.phone(contact), None if duplicate else passport_norm, client_id))
+            self.master.reload_blacklist()
+            self.master.client_names.add(client_id, fio)
             self.refresh_data()
             self.edit_window.destroy()
-            messagebox.showinfo("Успех", "Данные клиента успешно обновлены")
+            message = "Данные клиента успешно обновлены"
+            if duplicate:
+                message += ("\n\nТакой же паспорт указан у другого клиента. "
+                            "Объедините их в окне \"Дубликаты\"")
+            messagebox.showinfo("Успех", message)
+        except sqlite3.IntegrityError:
+            messagebox.showerror("Ошибка", "Клиент с такими паспортными данными уже существует.\n"
+                                           "Если это один человек, объедините клиентов в окне \"Дубликаты\"")
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось обновить данные: {str(e)}")
-            
-        try:
-            datetime.strptime(birthdate, "%d.%m.%Y")
-        except ValueError:
-            messagebox.showerror("Ошибка", "Некорректный формат даты. Используйте ДД.ММ.ГГГГ")
-            return
 
     def delete_client(self):
         if not self.selected_item:
@@ -728,16 +953,125 @@ class Clients(ttk.Frame):
         
         if messagebox.askyesno("Подтверждение", f"Вы действительно хотите удалить клиента {client_name}?"):
             try:
-                conn = sqlite3.connect(get_db_path())
-                cursor = conn.cursor()
-                cursor.execute("DELETE FROM Clients WHERE id=?", (client_id,))
-                conn.commit()
-                conn.close()
+                with db.transaction() as cursor:
+                    cursor.execute("DELETE FROM Clients WHERE id=?", (client_id,))
+                self.master.reload_blacklist()
+                self.master.client_names.remove(client_id)
                 self.refresh_data()
                 messagebox.showinfo("Успех", "Клиент успешно удален")
             except Exception as e:
                 messagebox.showerror("Ошибка", f"Не удалось удалить клиента: {str(e)}")
 
+    # Загрузка клиентов из CSV или XLSX в фоне. Ход импорта показывается
+    # в строке под таблицей, итог - в отдельном сообщении.
+    def import_clients(self):
+        file_path = filedialog.askopenfilename(
+            title="Импорт клиентов",
+            filetypes=[("Таблицы", "*.csv *.xlsx"), ("CSV", "*.csv"), ("Excel", "*.xlsx")])
+        if not file_path:
+            return
+        self.import_progress = (0, 0)
+        self.importing = True
+        self.worker.submit(importer.import_clients, file_path, None, self.set_import_progress,
+                           on_done=self.import_done, on_error=self.import_failed,
+                           widget=self, key="clients.import")
+        self.show_import_progress()
+
+    # Вызывается из фонового потока - только запоминает значения
+    def set_import_progress(self, processed, rejected):
+        self.import_progress = (processed, rejected)
+
+    def show_import_progress(self):
+        if not self.importing:
+            return
+        processed, rejected = self.import_progress
+        self.count_label.config(text=f"Импорт: обработано строк {processed}, отклонено {rejected}")
+        self.after(200, self.show_import_progress)
+
+    def import_done(self, result):
+        self.importing = False
+        imported, rejected, reject_path = result
+        message = f"Добавлено клиентов: {imported}\nОтклонено строк: {rejected}"
+        if reject_path:
+            message += f"\n\nОтклоненные строки с причинами сохранены в файл:\n{reject_path}"
+        self.master.client_names.invalidate()
+        messagebox.showinfo("Импорт клиентов", message)
+        self.refresh_data()
+
+    def import_failed(self, e):
+        self.importing = False
+        self.display_data()
+        if isinstance(e, optional.MissingDependency):
+            messagebox.showerror("Ошибка", str(e))
+        else:
+            messagebox.showerror("Ошибка", f"Не удалось импортировать клиентов: {str(e)}")
+
+    # Окно поиска и объединения повторно заведенных клиентов
+    def open_duplicates_window(self):
+        self.duplicates_window = tk.Toplevel(self)
+        self.duplicates_window.title("Возможные дубликаты клиентов")
+        self.duplicates_window.geometry("800x400")
+
+        self.duplicates_label = ttk.Label(self.duplicates_window, text="Поиск дубликатов...")
+        self.duplicates_label.pack(anchor='w', padx=5, pady=5)
+
+        columns = ("Оценка", "ID", "Клиент", "ID дубликата", "Дубликат", "Совпадения")
+        self.duplicates_tree = VirtualTreeview(self.duplicates_window, columns=columns, show="headings",
+                                               key=lambda row: f"{row[1]}-{row[3]}")
+        for col in columns:
+            self.duplicates_tree.heading(col, text=col)
+        for col in ("Оценка", "ID", "ID дубликата"):
+            self.duplicates_tree.column(col, width=70, stretch=False, anchor='center')
+        self.duplicates_tree.pack(expand=True, fill='both', padx=5, pady=5)
+
+        button_frame = ttk.Frame(self.duplicates_window)
+        button_frame.pack(fill='x', padx=5, pady=5)
+        ttk.Button(button_frame, text="Оставить клиента",
+                   command=lambda: self.merge_duplicates(keep_first=True)).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Оставить дубликат",
+                   command=lambda: self.merge_duplicates(keep_first=False)).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Обновить", command=self.load_duplicates).pack(side='right', padx=5)
+
+        self.load_duplicates()
+
+    def load_duplicates(self):
+        self.duplicates_label.config(text="Поиск дубликатов...")
+        self.worker.submit(dedup.find_duplicates, on_done=self.display_duplicates,
+                           widget=self.duplicates_window, key="clients.duplicates")
+
+    def display_duplicates(self, pairs):
+        self.duplicates_tree.set_rows(pairs)
+        self.duplicates_label.config(text=f"Найдено пар: {len(pairs)}")
+
+    # Объединение выбранной пары: записи второго клиента переходят к первому
+    # (или наоборот), после чего второй удаляется
+    def merge_duplicates(self, keep_first=True):
+        selected = self.duplicates_tree.selection()
+        if not selected:
+            messagebox.showwarning("Предупреждение", "Выберите пару клиентов", parent=self.duplicates_window)
+            return
+        _, first_id, first_name, second_id, second_name, _ = self.duplicates_tree.item(selected[0])['values']
+        keep_id, keep_name, removed_id, removed_name = (first_id, first_name, second_id, second_name) if keep_first \
+            else (second_id, second_name, first_id, first_name)
+
+        if not messagebox.askyesno("Подтверждение",
+                                   f"Брони, платежи и черный список клиента {removed_name} (ID {removed_id}) "
+                                   f"перейдут к клиенту {keep_name} (ID {keep_id}), "
+                                   f"а запись {removed_name} будет удалена. Продолжить?",
+                                   parent=self.duplicates_window):
+            return
+        try:
+            dedup.merge(keep_id, removed_id)
+        except (ValueError, sqlite3.Error) as e:
+            messagebox.showerror("Ошибка", f"Не удалось объединить клиентов: {str(e)}", parent=self.duplicates_window)
+            return
+        self.master.reload_blacklist()
+        self.master.client_names.remove(removed_id)
+
+        pairs = [pair for pair in self.duplicates_tree.rows() if removed_id not in (pair[1], pair[3])]
+        self.display_duplicates(pairs)
+        self.refresh_data()
+
     def add_to_blacklist(self):
         if not self.selected_item:
             messagebox.showwarning("Предупреждение", "Выберите клиента для добавления в черный список")
@@ -773,19 +1107,18 @@ class Clients(ttk.Frame):
             return
             
         try:
-            conn = sqlite3.connect(get_db_path())
-            cursor = conn.cursor()
+            with db.transaction() as cursor:
+                cursor.execute("SELECT 1 FROM Blacklist WHERE client_id=?", (client_id,))
+                already_listed = cursor.fetchone() is not None
+                
+                if not already_listed:
+                    cursor.execute("INSERT INTO Blacklist (client_id, reason) VALUES (?, ?)", (client_id, reason))
             
-            cursor.execute("SELECT 1 FROM Blacklist WHERE client_id=?", (client_id,))
-            if cursor.fetchone():
+            if already_listed:
                 messagebox.showerror("Ошибка", "Этот клиент уже в черном списке")
-                conn.close()
                 return
-                
-            cursor.execute("INSERT INTO Blacklist (client_id, reason) VALUES (?, ?)", (client_id, reason))
-            conn.commit()
-            conn.close()
             
+            self.master.reload_blacklist()
             self.blacklist_window.destroy()
             self.refresh_data()
             messagebox.showinfo("Успех", "Клиент добавлен в черный список")
@@ -803,12 +1136,10 @@ class Clients(ttk.Frame):
         if messagebox.askyesno("Подтверждение", 
                              f"Вы действительно хотите удалить клиента {client_name} из черного списка?"):
             try:
-                conn = sqlite3.connect(get_db_path())
-                cursor = conn.cursor()
-                cursor.execute("DELETE FROM Blacklist WHERE client_id=?", (client_id,))
-                conn.commit()
-                conn.close()
+                with db.transaction() as cursor:
+                    cursor.execute("DELETE FROM Blacklist WHERE client_id=?", (client_id,))
                 
+                self.master.reload_blacklist()
                 self.load_blacklist()
                 messagebox.showinfo("Успех", "Клиент удален из черного списка")
             except Exception as e:
@@ -823,9 +1154,13 @@ class Rent(ttk.Frame):
         self.style.configure('Rent.TFrame', background='#f5f5f5')
         self.configure(style='Rent.TFrame')
         self.place(relx=0.3, y=0, relwidth=0.7, relheight=1)
+        self.availability = AvailabilityIndex(db)
+        self.worker = parent.worker
         self.create_widgets()
         self.selected_item = None
         self.selected_clients = []
+        self.rooms = []
+        self.reservations = []
         self.fetch_data()
 
     def create_widgets(self):
@@ -850,6 +1185,7 @@ class Rent(ttk.Frame):
         
         self.search_entry = ttk.Entry(search_frame, width=30)
         self.search_entry.pack(side='left', padx=5, expand=True, fill='x')
+        LiveSearch(self.search_entry, self.search_rooms)
         
         ttk.Button(search_frame, text="Найти", command=self.search_rooms, style='Rent.TButton').pack(side='left', padx=5)
         ttk.Button(search_frame, text="Сброс", command=self.reset_search, style='Rent.TButton').pack(side='left', padx=5)
@@ -868,7 +1204,7 @@ class Rent(ttk.Frame):
         self.client_search_entry.bind('<KeyRelease>', self.filter_clients)
         
         ttk.Label(client_frame, text="Выбрать клиента:", style='Rent.TLabel').pack(side='left', padx=5)
-        self.client_combobox = ttk.Combobox(client_frame, width=25)
+        self.client_combobox = EntryCombobox(client_frame, search=self.master.client_names.match, width=25)
         self.client_combobox.pack(side='left', padx=5, pady=2)
         
         ttk.Button(client_frame, text="Добавить", command=self.add_client_to_booking,
@@ -908,8 +1244,8 @@ class Rent(ttk.Frame):
         tree_frame = ttk.Frame(main_frame, style='Rent.TFrame')
         tree_frame.pack(fill='both', expand=True, pady=5)
         
-        self.rooms_tree = ttk.Treeview(tree_frame, columns=("ID", "Номер", "Мест", "Класс", "Цена", "Корпус", "Статус"), 
-                                     show="headings", height=8)
+        self.rooms_tree = VirtualTreeview(tree_frame, columns=("ID", "Номер", "Мест", "Класс", "Цена", "Корпус", "Статус"), 
+                                          show="headings", height=8, key=lambda row: row[0])
         
         for col in ("ID", "Номер", "Мест", "Класс", "Цена", "Корпус", "Статус"):
             self.rooms_tree.heading(col, text=col)
@@ -937,9 +1273,10 @@ class Rent(ttk.Frame):
         reserv_tree_frame = ttk.Frame(main_frame, style='Rent.TFrame')
         reserv_tree_frame.pack(fill='both', expand=True, pady=(10, 0))
         
-        self.reservations_tree = ttk.Treeview(reserv_tree_frame, 
-                                            columns=("ID", "Номер", "Клиенты", "Заезд", "Выезд", "Сумма"), 
-                                            show="headings", height=5)
+        self.reservations_tree = VirtualTreeview(reserv_tree_frame, 
+                                                 columns=("ID", "Номер", "Клиенты", "Заезд", "Выезд", "Сумма"), 
+                                                 show="headings", height=5,
+                                                 key=lambda row: row[0], display=self.reservation_values)
         
         for col in ("ID", "Номер", "Клиенты", "Заезд", "Выезд", "Сумма"):
             self.reservations_tree.heading(col, text=col)
@@ -965,6 +1302,7 @@ class Rent(ttk.Frame):
         
         self.reserv_search_entry = ttk.Entry(reserv_search_frame, width=30)
         self.reserv_search_entry.pack(side='left', padx=5, expand=True, fill='x')
+        LiveSearch(self.reserv_search_entry, self.search_reservations)
         
         ttk.Button(reserv_search_frame, text="Найти", command=self.search_reservations, 
                  style='Rent.TButton').pack(side='left', padx=5)
@@ -973,10 +1311,7 @@ class Rent(ttk.Frame):
     
     # Фильтрация списка клиентов по введенному тексту
     def filter_clients(self, event=None):
-        
-        search_text = self.client_search_entry.get().lower()
-        filtered_clients = [c for c in self.clients if search_text in c[1].lower()]
-        self.client_combobox['values'] = [f"{c[1]} (ID: {c[0]})" for c in filtered_clients]
+        self.client_combobox.set_entries(self.master.client_names.match(self.client_search_entry.get()))
 
     # Поиск бронирований по выбранному критерию
     def search_reservations(self):
@@ -984,48 +1319,34 @@ class Rent(ttk.Frame):
         search_text = self.reserv_search_entry.get().strip()
         
         if not search_text:
-            self.fetch_reservations()
-            self.display_reservations()
+            self.load_reservations()
             return
             
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        
-        query = """
-            SELECT r.id, rm.room_number, c.name, r.checkin_date, r.checkout_date, r.total_price
-            FROM Reservations r
-            JOIN Rooms rm ON r.room_id = rm.id
-            JOIN Clients c ON r.client_id = c.id
-            WHERE 1=1
-        """
-        
         if search_field == "Номер":
-            query += " AND rm.room_number LIKE ?"
+            condition, params = match_condition("BookingsSearch", "room_number", search_text,
+                                                key="b.id", fallback="rm.room_number LIKE ?")
         elif search_field == "Клиент":
-            query += " AND c.name LIKE ?"
+            condition, params = match_condition("BookingsSearch", "guests", search_text, key="b.id", fallback="""EXISTS (
+                SELECT 1 FROM BookingGuests sg JOIN Clients sc ON sg.client_id = sc.id
+                WHERE sg.booking_id = b.id AND sc.name LIKE ?
+            )""")
         elif search_field == "Дата заезда":
-            query += " AND r.checkin_date LIKE ?"
+            condition, params = search_condition("b.checkin_date", search_text)
+        else:
+            self.load_reservations()
+            return
             
-        cursor.execute(query, (f"%{search_text}%",))
-        self.reservations = cursor.fetchall()
-        conn.close()
-        
-        self.display_reservations()
+        self.load_reservations(condition, params)
         
     # Сброс поиска бронирований
     def reset_reserv_search(self):
         self.reserv_search_entry.delete(0, tk.END)
-        self.fetch_reservations()
-        self.display_reservations()
+        self.load_reservations()
 
-    # Загрузка клиентов с возможностью поиска
+    # Загрузка (обновление) индекса ФИО клиентов и списка выбора клиента
     def fetch_clients(self):
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, name FROM Clients ORDER BY name")
-        self.clients = cursor.fetchall()
-        self.client_combobox['values'] = [f"{c[1]} (ID: {c[0]})" for c in self.clients]
-        conn.close()
+        self.worker.submit(self.master.client_names.refresh,
+                           on_done=self.filter_clients, widget=self, key="rent.clients")
         
     # Загрузка всех необходимых данных
     def fetch_data(self):
@@ -1033,8 +1354,7 @@ class Rent(ttk.Frame):
         self.fetch_clients()
         self.fetch_rooms()
         self.update_rooms_table()
-        self.fetch_reservations()
-        self.display_reservations()
+        self.load_reservations()
 
     # Поиск номеров по выбранному критерию
     def search_rooms(self):
@@ -1045,9 +1365,6 @@ class Rent(ttk.Frame):
             self.update_rooms_table()
             return
             
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        
         query = """
             SELECT r.id, r.room_number, r.places, rc.class_name, r.price, b.building_name, r.status
             FROM Rooms r
@@ -1056,8 +1373,11 @@ class Rent(ttk.Frame):
             WHERE 1=1
         """
         
+        params = (f"%{search_text}%",)
         if search_field == "Номер":
-            query += " AND r.room_number LIKE ?"
+            condition, params = match_condition("RoomsSearch", "room_number", search_text,
+                                                key="r.id", fallback="r.room_number LIKE ?")
+            query += f" AND {condition}"
         elif search_field == "Класс":
             query += " AND rc.class_name LIKE ?"
         elif search_field == "Корпус":
@@ -1065,40 +1385,26 @@ class Rent(ttk.Frame):
         elif search_field == "Статус":
             query += " AND r.status LIKE ?"
             
-        cursor.execute(query, (f"%{search_text}%",))
-        self.rooms = cursor.fetchall()
-        conn.close()
-        
-        self.display_filtered_rooms()
+        self.worker.submit(db.fetchall, query, params,
+                           on_done=self.display_filtered_rooms, widget=self, key="rent.rooms", cancellable=True)
         
     # Отображение отфильтрованных номеров
-    def display_filtered_rooms(self):
-        for row in self.rooms_tree.get_children():
-            self.rooms_tree.delete(row)
-        
-        for room in self.rooms:
-            self.rooms_tree.insert("", "end", values=room)
+    def display_filtered_rooms(self, rooms):
+        self.rooms = rooms
+        self.rooms_tree.set_rows(self.rooms)
             
     # Сброс поиска
     def reset_search(self):
         self.search_entry.delete(0, tk.END)
         self.update_rooms_table()
     
-    def fetch_clients(self):
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, name FROM Clients")
-        self.clients = cursor.fetchall()
-        self.client_combobox['values'] = [f"{c[1]} (ID: {c[0]})" for c in self.clients]
-        conn.close()
-
     def fetch_rooms(self):
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        cursor.execute("SELECT DISTINCT class_name FROM RoomClasses")
-        self.classes = [row[0] for row in cursor.fetchall()]
+        self.worker.submit(db.fetchall, "SELECT DISTINCT class_name FROM RoomClasses",
+                           on_done=self.display_classes, widget=self, key="rent.classes")
+
+    def display_classes(self, rows):
+        self.classes = [row[0] for row in rows]
         self.class_combobox['values'] = self.classes
-        conn.close()
 
     def update_rooms_table(self, event=None):
         class_name = self.class_combobox.get()
@@ -1121,63 +1427,68 @@ class Rent(ttk.Frame):
             query += " AND r.places = ?"
             params.append(places)
         
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        self.rooms = cursor.fetchall()
+        period = None
+        if self.checkin_date.get() and self.checkout_date.get():
+            try:
+                period = (parse_ui(self.checkin_date.get()), parse_ui(self.checkout_date.get()))
+            except ValueError:
+                period = ()
+        
+        self.worker.submit(self.fetch_rooms_state, query, params, period,
+                           on_done=self.display_rooms, widget=self, key="rent.rooms")
+
+    # Номера по фильтру и множество свободных на период (выполняется в фоне).
+    # Свободные на выбранные даты номера определяются по индексу занятости
+    # за один проход, без отдельного запроса для каждого номера. Здесь же
+    # обновляется черный список в памяти, по которому проверяются гости брони
+    def fetch_rooms_state(self, query, params, period):
+        self.master.blacklist.refresh()
+        rooms = db.fetchall(query, params)
+        free_rooms = None
+        if period:
+            self.availability.refresh()
+            free_rooms = self.availability.free_rooms([room[0] for room in rooms], *period)
+        elif period is not None:
+            # Даты введены с ошибкой - номера показываются свободными
+            free_rooms = {room[0] for room in rooms}
+        return rooms, free_rooms
+
+    def display_rooms(self, state):
+        self.rooms, free_rooms = state
         
         # обновление таблицы
-        for row in self.rooms_tree.get_children():
-            self.rooms_tree.delete(row)
-        
+        rows = []
         for room in self.rooms:
             room_id, room_number, places, class_name, price, building_name, status = room
             
             # Проверка статуса номера
             if status in ["Требуется ремонт", "Требуется клининг"]:
                 status_text = f"Недоступен ({status})"
-            else:
+            elif free_rooms is not None:
                 # Проверка бронирования только если статус не "недоступен"
-                if self.checkin_date.get() and self.checkout_date.get():
-                    try:
-                        checkin = datetime.strptime(self.checkin_date.get(), "%d.%m.%Y").date()
-                        checkout = datetime.strptime(self.checkout_date.get(), "%d.%m.%Y").date()
-                        
-                        cursor.execute("""
-                            SELECT 1 FROM Reservations 
-                            WHERE room_id = ? 
-                            AND (
-                                (checkin_date <= ? AND checkout_date > ?) 
-                                OR (checkin_date < ? AND checkout_date >= ?)
-                                OR (checkin_date >= ? AND checkout_date <= ?)
-                            )
-                        """, (room_id, checkin, checkin, checkout, checkout, checkin, checkout))
-                        
-                        if cursor.fetchone():
-                            status_text = "Занят"
-                        else:
-                            status_text = "Свободен"
-                    except ValueError:
-                        status_text = "Свободен"
-                else:
-                    status_text = status
+                status_text = "Свободен" if room_id in free_rooms else "Занят"
+            else:
+                status_text = status
             
-            self.rooms_tree.insert("", "end", values=(room_id, room_number, places, class_name, 
-                                                price, building_name, status_text))
-        
-        conn.close()
+            rows.append((room_id, room_number, places, class_name, price, building_name, status_text))
+        self.rooms_tree.set_rows(rows)
 
     def add_client_to_booking(self):
-        client_str = self.client_combobox.get()
-        if not client_str:
-            messagebox.showwarning("Предупреждение", "Выберите клиента")
+        client = self.client_combobox.selected()
+        if client is None:
+            messagebox.showwarning("Предупреждение", "Выберите клиента из списка")
             return
             
-        if client_str in self.selected_clients:
+        if client in self.selected_clients:
             messagebox.showwarning("Предупреждение", "Этот клиент уже добавлен")
             return
-            
-        self.selected_clients.append(client_str)
+
+        # Клиента из черного списка нельзя добавить в бронь
+        if self.master.blacklist.contains(client[0]):
+            messagebox.showwarning("Предупреждение", "Этот клиент находится в черном списке")
+            return
+
+        self.selected_clients.append(client)
         self.update_selected_clients_list()
         
         self.check_reservation_button_state()
@@ -1196,7 +1507,7 @@ class Rent(ttk.Frame):
     def update_selected_clients_list(self):
         self.selected_clients_listbox.delete(0, tk.END)
         for client in self.selected_clients:
-            self.selected_clients_listbox.insert(tk.END, client)
+            self.selected_clients_listbox.insert(tk.END, self.client_combobox.label(client))
 
     def check_reservation_button_state(self):
         if not self.selected_item:
@@ -1258,8 +1569,8 @@ class Rent(ttk.Frame):
         
         try:
             # Парсинг даты
-            checkin = datetime.strptime(self.checkin_date.get(), "%d.%m.%Y").date()
-            checkout = datetime.strptime(self.checkout_date.get(), "%d.%m.%Y").date()
+            checkin = parse_ui(self.checkin_date.get())
+            checkout = parse_ui(self.checkout_date.get())
             
             # корректность дат
             if checkout <= checkin:
@@ -1271,133 +1582,126 @@ class Rent(ttk.Frame):
                 messagebox.showerror("Ошибка", "Дата заезда не может быть в прошлом")
                 return
                 
-            conn = sqlite3.connect(get_db_path())
-            cursor = conn.cursor()
+            # Проверка доступности, расчет суммы и создание брони выполняются в одной транзакции
+            blacklisted = []
+            guests = []
+            booking_id = None
+            try:
+                with db.transaction() as cursor:
+                    # Проверка доступности номера на выбранные даты по таблице RoomNights
+                    cursor.execute("""
+                        SELECT 1 FROM RoomNights
+                        WHERE room_id = ? AND night >= ? AND night < ?
+                        LIMIT 1
+                    """, (room_id, to_db(checkin), to_db(checkout)))
+                    already_booked = cursor.fetchone() is not None
+                    
+                    if not already_booked:
+                        # Отбор гостей брони
+                        for client in self.selected_clients:
+                            # проверка клиента, что он не находится в черном списке
+                            if self.master.blacklist.contains(client[0]):
+                                blacklisted.append(client)
+                                continue
+                            
+                            guests.append(client[0])
+                        
+                        if guests:
+                            # Получение цены номера
+                            cursor.execute("SELECT price FROM Rooms WHERE id=?", (room_id,))
+                            price = cursor.fetchone()[0]
+                            
+                            # Рассчет суммы бронирования
+                            days = (checkout - checkin).days
+                            total = days * price
+                            
+                            # Одна бронь на проживание и по строке на каждого гостя
+                            cursor.execute("""
+                                INSERT INTO Bookings (room_id, checkin_date, checkout_date, total_price)
+                                VALUES (?, ?, ?, ?)
+                            """, (room_id, to_db(checkin), to_db(checkout), total))
+                            booking_id = cursor.lastrowid
+                            cursor.executemany(
+                                "INSERT OR IGNORE INTO BookingGuests (booking_id, client_id) VALUES (?, ?)",
+                                [(booking_id, client_id) for client_id in guests]
+                            )
+                            
+                            # Обновление статуса номера на "Занят"
+                            cursor.execute("UPDATE Rooms SET status='Занят' WHERE id=?", (room_id,))
+            except sqlite3.IntegrityError:
+                # Ночи номера успели занять с другого рабочего места:
+                # бд отклонила бронь, транзакция откатена
+                already_booked = True
+                booking_id = None
             
-            # Проверка доступности номера на выбранные даты
-            cursor.execute("""
-                SELECT 1 FROM Reservations 
-                WHERE room_id = ? 
-                AND (
-                    (checkin_date <= ? AND checkout_date > ?) 
-                    OR (checkin_date < ? AND checkout_date >= ?)
-                    OR (checkin_date >= ? AND checkout_date <= ?)
-                )
-            """, (room_id, checkin, checkin, checkout, checkout, checkin, checkout))
+            # Индекс занятости пополняется только после фиксации транзакции
+            if booking_id is not None:
+                self.availability.add(booking_id, room_id, checkin, checkout)
             
-            if cursor.fetchone():
+            if already_booked:
                 messagebox.showerror("Ошибка", f"Номер {room_number} уже забронирован на выбранные даты")
-                conn.close()
                 return
-                
-            # Получение цены номера
-            cursor.execute("SELECT price FROM Rooms WHERE id=?", (room_id,))
-            price = cursor.fetchone()[0]
-            
-            # Рассчет суммы бронирования
-            days = (checkout - checkin).days
-            total = days * price
             
-            # Создание брони для каждого клиента
-            success_count = 0
-            for client_str in self.selected_clients:
-                try:
-                    # получение ID клиента из строки вида "Имя (ID: 123)"
-                    client_id = int(client_str.split("(ID: ")[1][:-1])
-                    
-                    # проверка клиента, что он не находится в черном списке
-                    cursor.execute("SELECT 1 FROM Blacklist WHERE client_id=?", (client_id,))
-                    if cursor.fetchone():
-                        messagebox.showwarning("Предупреждение", 
-                                            f"Клиент {client_str} находится в черном списке и не может быть заселен")
-                        continue
-                    
-                    # Добавление бронирования
-                    cursor.execute("""
-                        INSERT INTO Reservations (room_id, client_id, checkin_date, checkout_date, total_price)
-                        VALUES (?, ?, ?, ?, ?)
-                    """, (room_id, client_id, checkin, checkout, total))
-                    success_count += 1
-                    
-                except Exception as e:
-                    messagebox.showerror("Ошибка", f"Не удалось создать бронь для клиента {client_str}: {str(e)}")
-                    continue
+            for client in blacklisted:
+                messagebox.showwarning("Предупреждение", 
+                                    f"Клиент {self.client_combobox.label(client)} находится в черном списке "
+                                    "и не может быть заселен")
             
-            if success_count > 0:
-                conn.commit()
+            if booking_id is not None:
                 messagebox.showinfo("Успех", 
-                                f"Создано {success_count} бронирований номера {room_number} на сумму {total:.2f} руб.")
+                                f"Создано бронирование №{booking_id} номера {room_number} "
+                                f"(гостей: {len(guests)}) на сумму {total:.2f} руб.")
                 
                 # Обновление данных
                 self.selected_clients = []
                 self.update_selected_clients_list()
                 self.update_rooms_table()
-                self.fetch_reservations()
-                self.display_reservations()
-                
-                # Обновление статуса номера на "Занят"
-                cursor.execute("UPDATE Rooms SET status='Занят' WHERE id=?", (room_id,))
-                conn.commit()
+                self.load_reservations()
                 
             else:
-                messagebox.showwarning("Предупреждение", "Не удалось создать ни одного бронирования")
-                
-            conn.close()
+                messagebox.showwarning("Предупреждение", "Не удалось создать бронирование")
             
         except ValueError:
             messagebox.showerror("Ошибка", "Некорректный формат даты (используйте ДД.ММ.ГГГГ)")
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось создать бронирование: {str(e)}")
-            if conn:
-                conn.close()
 
-    def fetch_reservations(self):
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT r.id, rm.room_number, c.name, r.checkin_date, r.checkout_date, r.total_price
-            FROM Reservations r
-            JOIN Rooms rm ON r.room_id = rm.id
-            JOIN Clients c ON r.client_id = c.id
-            ORDER BY r.room_id, r.checkin_date, r.checkout_date
-        """)
-        self.reservations = cursor.fetchall()
-        conn.close()
-
-    def display_reservations(self):
-        for row in self.reservations_tree.get_children():
-            self.reservations_tree.delete(row)
-        
-        # Группировка брони по номерам и датам
-        reservations_grouped = {}
-        for res in self.reservations:
-            room_id, room_number, client_name, checkin_date, checkout_date, total_price = res
-            key = (room_id, room_number, checkin_date, checkout_date, total_price)
-            
-            if key not in reservations_grouped:
-                reservations_grouped[key] = []
-            reservations_grouped[key].append(client_name)
-        
-        # Отображение сгруппированных данных
-        for key, clients in reservations_grouped.items():
-            room_id, room_number, checkin_date, checkout_date, total_price = key
-            clients_str = ", ".join(clients)
-            
-            # Определение статуса брони
-            today = datetime.now().date()
-            checkin = datetime.strptime(checkin_date, "%Y-%m-%d").date()
-            checkout = datetime.strptime(checkout_date, "%Y-%m-%d").date()
-            
-            if checkout < today:
-                status = "Завершено"
-            elif checkin > today:
-                status = "Предстоящее"
-            else:
-                status = "Активное"
-            
-            self.reservations_tree.insert("", "end", 
-                                        values=(room_id, room_number, clients_str, 
-                                               checkin_date, checkout_date, f"{total_price:.2f}", status))
+    # Загрузка броней в фоне; таблица обновляется по готовности
+    def load_reservations(self, condition="1=1", params=()):
+        self.worker.submit(self.fetch_reservations, condition, params,
+                           on_done=self.display_reservations, widget=self, key="rent.reservations",
+                           cancellable=True)
+
+    # Загрузка броней: одна строка на проживание, гости перечислены через запятую
+    def fetch_reservations(self, condition="1=1", params=()):
+        return db.fetchall(f"""
+            SELECT b.id, rm.room_number, 
+                   (SELECT group_concat(c.name, ', ') FROM BookingGuests g
+                    JOIN Clients c ON g.client_id = c.id
+                    WHERE g.booking_id = b.id) as guests,
+                   b.checkin_date, b.checkout_date, b.total_price,
+                   CASE 
+                       WHEN b.checkout_date < date('now', 'localtime') THEN 'Завершено'
+                       WHEN b.checkin_date > date('now', 'localtime') THEN 'Предстоящее'
+                       ELSE 'Активное'
+                   END as status
+            FROM Bookings b
+            JOIN Rooms rm ON b.room_id = rm.id
+            WHERE {condition}
+            ORDER BY b.room_id, b.checkin_date, b.checkout_date
+        """, params)
+
+    def display_reservations(self, reservations=None):
+        if reservations is not None:
+            self.reservations = reservations
+        self.reservations_tree.set_rows(self.reservations)
+
+    # Значения строки брони для таблицы
+    @staticmethod
+    def reservation_values(row):
+        booking_id, room_number, guests, checkin_date, checkout_date, total_price, status = row
+        return (booking_id, room_number, guests or "",
+                to_ui(checkin_date), to_ui(checkout_date), f"{total_price:.2f}", status)
 
     def delete_reservation(self):
         if not self.reservations_tree.selection():
@@ -1405,36 +1709,25 @@ class Rent(ttk.Frame):
             return
 
         selected_reservation = self.reservations_tree.item(self.reservations_tree.selection()[0])['values']
-        reservation_id = selected_reservation[0]
+        booking_id = selected_reservation[0]
 
         if messagebox.askyesno("Подтверждение", 
                              f"Вы действительно хотите удалить бронь номера {selected_reservation[1]}?"):
-            conn = None
             try:
-                conn = sqlite3.connect(get_db_path())
-                cursor = conn.cursor()
-                
-                # Удаление бронирования
-                cursor.execute("DELETE FROM Reservations WHERE id=?", (reservation_id,))
+                # Удаление бронирования (гости и ночи номера удаляются триггером)
+                with db.transaction() as cursor:
+                    cursor.execute("DELETE FROM Bookings WHERE id=?", (booking_id,))
+                self.availability.remove(booking_id)
                 
-                conn.commit()
                 messagebox.showinfo("Успех", "Бронь успешно удалена")
-                self.fetch_reservations()
-                self.display_reservations()
+                self.load_reservations()
                 self.update_rooms_table()  # Обновление статуса номеров
             except Exception as e:
                 messagebox.showerror("Ошибка", f"Не удалось удалить бронь: {str(e)}")
-            finally:
-                if conn:
-                    conn.close()
 
 
     def refresh_data(self):
-        self.fetch_clients()
-        self.fetch_rooms()
-        self.update_rooms_table()
-        self.fetch_reservations()
-        self.display_reservations()
+        self.fetch_data()
 
 
 # --- класс, описывающий создание фрейма НОМЕРНОЙ ФОНД ---
@@ -1444,10 +1737,11 @@ class Room(ttk.Frame):
         testLbl = ttk.Label(self, background='#35A7FF')
         testLbl.pack(expand=True, fill='both')
         self.place(relx=0.3, y=0, relwidth=0.7, relheight=1)
+        self.worker = parent.worker
         self.create_widgets()
-        self.fetch_data()
-        self.display_data()
         self.selected_item = None
+        self.rows = []
+        self.refresh_data()
 
     def create_widgets(self):
         # cоздаем notebook для вкладок
@@ -1478,6 +1772,7 @@ class Room(ttk.Frame):
         
         self.search_entry = ttk.Entry(search_frame)
         self.search_entry.pack(side='left', padx=5, expand=True, fill='x')
+        LiveSearch(self.search_entry, self.search_rooms)
         
         ttk.Button(search_frame, text="Найти", command=self.search_rooms).pack(side='left', padx=5)
         ttk.Button(search_frame, text="Сброс", command=self.reset_search).pack(side='left', padx=5)
@@ -1501,7 +1796,8 @@ class Room(ttk.Frame):
         
         # Таблица номеров
         self.columns = ("ID", "Номер", "Мест", "Класс", "Цена", "Этаж", "Корпус", "Опции", "Статус")
-        self.tree = ttk.Treeview(self.rooms_tab, columns=self.columns, show="headings")
+        self.tree = VirtualTreeview(self.rooms_tab, columns=self.columns, show="headings",
+                                    key=lambda row: row[0])
         
         for col in self.columns:
             self.tree.heading(col, text=col)
@@ -1535,7 +1831,8 @@ class Room(ttk.Frame):
             ttk.Label(frame, text=f"Номера со статусом: {status}", font=('Arial', 10, 'bold')).pack()
             
             # Таблица номеров
-            tree = ttk.Treeview(frame, columns=("ID", "Номер", "Класс", "Корпус"), show="headings")
+            tree = VirtualTreeview(frame, columns=("ID", "Номер", "Класс", "Корпус"), show="headings",
+                                   key=lambda row: row[0])
             for col in ("ID", "Номер", "Класс", "Корпус"):
                 tree.heading(col, text=col)
                 tree.column(col, anchor='c')
@@ -1546,50 +1843,47 @@ class Room(ttk.Frame):
     def on_tree_select(self, event):
         self.selected_item = self.tree.selection()[0] if self.tree.selection() else None
 
-    def fetch_data(self):
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        cursor.execute("""
+    def fetch_data(self, condition="1=1", params=()):
+        return db.fetchall(f"""
             SELECT r.id, r.room_number, r.places, rc.class_name, r.price, r.floor, 
                    b.building_name, GROUP_CONCAT(ro.option_name, ', '), r.status
             FROM Rooms r
             LEFT JOIN RoomClasses rc ON r.class_id = rc.id
             LEFT JOIN Buildings b ON r.building_id = b.id
             LEFT JOIN RoomOptions ro ON ro.room_id = r.id
+            WHERE {condition}
             GROUP BY r.id
-        """)
-        self.rows = cursor.fetchall()
-        conn.close()
-
-    def display_data(self):
-        for row in self.tree.get_children():
-            self.tree.delete(row)
-        
-        for row in self.status_frames.values():
-            if isinstance(row, ttk.Treeview):
-                for item in row.get_children():
-                    row.delete(item)
-        
-        status_trees = {
-            "Свободен": self.status_frames["Свободен_tree"],
-            "Требуется клининг": self.status_frames["Требуется клининг_tree"],
-            "Требуется ремонт": self.status_frames["Требуется ремонт_tree"],
-            "Занят": self.status_frames["Занят_tree"]
+        """, params)
+
+    # Загрузка номеров в фоне; таблицы обновляются по готовности
+    def load_data(self, condition="1=1", params=()):
+        self.worker.submit(self.fetch_data, condition, params,
+                           on_done=self.display_data, widget=self, key="room.rows", cancellable=True)
+
+    def display_data(self, rows=None):
+        if rows is not None:
+            self.rows = rows
+        self.tree.set_rows(self.rows)
+        
+        status_rows = {
+            "Свободен": [],
+            "Требуется клининг": [],
+            "Требуется ремонт": [],
+            "Занят": []
         }
         
         for room in self.rows:
             room_id, room_number, places, class_name, price, floor, building_name, options, status = room
-            self.tree.insert("", "end", values=room)
             
             # Добавление номера в соответствующую таблицу статусов
-            if status in status_trees:
-                status_trees[status].insert("", "end", values=(
-                    room_id, room_number, class_name, building_name
-                ))
+            if status in status_rows:
+                status_rows[status].append((room_id, room_number, class_name, building_name))
+        
+        for status, rows in status_rows.items():
+            self.status_frames[status + "_tree"].set_rows(rows)
 
     def refresh_data(self):
-        self.fetch_data()
-        self.display_data()
+        self.load_data()
 
     def search_rooms(self):
         search_field = self.search_field.get()
@@ -1599,78 +1893,41 @@ class Room(ttk.Frame):
             self.refresh_data()
             return
             
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        
         if search_field == "Номер":
-            cursor.execute("""
-                SELECT r.id, r.room_number, r.places, rc.class_name, r.price, r.floor, 
-                       b.building_name, GROUP_CONCAT(ro.option_name, ', '), r.status
-                FROM Rooms r
-                LEFT JOIN RoomClasses rc ON r.class_id = rc.id
-                LEFT JOIN Buildings b ON r.building_id = b.id
-                LEFT JOIN RoomOptions ro ON ro.room_id = r.id
-                WHERE r.room_number LIKE ?
-                GROUP BY r.id
-            """, (f"%{search_text}%",))
+            self.load_data(*match_condition("RoomsSearch", "room_number", search_text,
+                                            key="r.id", fallback="r.room_number LIKE ?"))
         elif search_field == "Класс":
-            cursor.execute("""
-                SELECT r.id, r.room_number, r.places, rc.class_name, r.price, r.floor, 
-                       b.building_name, GROUP_CONCAT(ro.option_name, ', '), r.status
-                FROM Rooms r
-                LEFT JOIN RoomClasses rc ON r.class_id = rc.id
-                LEFT JOIN Buildings b ON r.building_id = b.id
-                LEFT JOIN RoomOptions ro ON ro.room_id = r.id
-                WHERE rc.class_name LIKE ?
-                GROUP BY r.id
-            """, (f"%{search_text}%",))
+            self.load_data("rc.class_name LIKE ?", (f"%{search_text}%",))
         elif search_field == "Корпус":
-            cursor.execute("""
-                SELECT r.id, r.room_number, r.places, rc.class_name, r.price, r.floor, 
-                       b.building_name, GROUP_CONCAT(ro.option_name, ', '), r.status
-                FROM Rooms r
-                LEFT JOIN RoomClasses rc ON r.class_id = rc.id
-                LEFT JOIN Buildings b ON r.building_id = b.id
-                LEFT JOIN RoomOptions ro ON ro.room_id = r.id
-                WHERE b.building_name LIKE ?
-                GROUP BY r.id
-            """, (f"%{search_text}%",))
+            self.load_data("b.building_name LIKE ?", (f"%{search_text}%",))
         elif search_field == "Этаж":
-            cursor.execute("""
-                SELECT r.id, r.room_number, r.places, rc.class_name, r.price, r.floor, 
-                       b.building_name, GROUP_CONCAT(ro.option_name, ', '), r.status
-                FROM Rooms r
-                LEFT JOIN RoomClasses rc ON r.class_id = rc.id
-                LEFT JOIN Buildings b ON r.building_id = b.id
-                LEFT JOIN RoomOptions ro ON ro.room_id = r.id
-                WHERE r.floor = ?
-                GROUP BY r.id
-            """, (search_text,))
-            
-        self.rows = cursor.fetchall()
-        conn.close()
-        self.display_data()
+            self.load_data("r.floor = ?", (search_text,))
+        else:
+            self.display_data([])
 
     def reset_search(self):
         self.search_entry.delete(0, tk.END)
         self.refresh_data()
 
+    # Списки для формы номера загружаются в фоне, окно открывается по готовности
     def open_add_room_window(self):
+        self.worker.submit(self.fetch_room_lists, on_done=self.show_add_room_window,
+                           widget=self, key="room.form")
+    
+    # Классы, корпуса и опции номеров (выполняется в фоне)
+    def fetch_room_lists(self):
+        classes = db.fetchall("SELECT id, class_name FROM RoomClasses")
+        buildings = db.fetchall("SELECT id, building_name FROM Buildings")
+        options_list = [row[0] for row in db.fetchall("SELECT DISTINCT option_name FROM RoomOptionsList")]
+        return classes, buildings, options_list
+    
+    def show_add_room_window(self, lists):
+        self.classes, self.buildings, self.options_list = lists
+        
         self.add_window = tk.Toplevel(self)
         self.add_window.title("Добавить новый номер")
         self.add_window.geometry("500x500")
         
-        # Получение списка классов и корпусов
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, class_name FROM RoomClasses")
-        self.classes = cursor.fetchall()
-        cursor.execute("SELECT id, building_name FROM Buildings")
-        self.buildings = cursor.fetchall()
-        cursor.execute("SELECT DISTINCT option_name FROM RoomOptionsList")
-        self.options_list = [row[0] for row in cursor.fetchall()]
-        conn.close()
-        
         # Поля формы
         main_frame = ttk.Frame(self.add_window, padding=10)
         main_frame.pack(fill='both', expand=True)
@@ -1746,43 +2003,35 @@ class Room(ttk.Frame):
             messagebox.showerror("Ошибка", "Количество мест, цена и этаж должны быть числами")
             return
         
-        conn = None
         try:
-            conn = sqlite3.connect(get_db_path())
-            cursor = conn.cursor()
-            
-            # Получение ID класса и корпуса
-            cursor.execute("SELECT id FROM RoomClasses WHERE class_name=?", (class_name,))
-            class_id = cursor.fetchone()[0]
-            
-            cursor.execute("SELECT id FROM Buildings WHERE building_name=?", (building_name,))
-            building_id = cursor.fetchone()[0]
-            
-            # Добавление номера
-            cursor.execute("""
-                INSERT INTO Rooms (room_number, places, class_id, price, floor, building_id, status) 
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (room_number, places, class_id, price, floor, building_id, status))
-            room_id = cursor.lastrowid
-            
-            # Добавляем выбранные опции
-            for option, var in self.options_vars.items():
-                if var.get() == 1:
-                    cursor.execute("""
-                        INSERT INTO RoomOptions (room_id, option_name) 
-                        VALUES (?, ?)
-                    """, (room_id, option))
+            with db.transaction() as cursor:
+                # Получение ID класса и корпуса
+                cursor.execute("SELECT id FROM RoomClasses WHERE class_name=?", (class_name,))
+                class_id = cursor.fetchone()[0]
+                
+                cursor.execute("SELECT id FROM Buildings WHERE building_name=?", (building_name,))
+                building_id = cursor.fetchone()[0]
+                
+                # Добавление номера
+                cursor.execute("""
+                    INSERT INTO Rooms (room_number, places, class_id, price, floor, building_id, status) 
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, (room_number, places, class_id, price, floor, building_id, status))
+                room_id = cursor.lastrowid
+                
+                # Добавляем выбранные опции
+                for option, var in self.options_vars.items():
+                    if var.get() == 1:
+                        cursor.execute("""
+                            INSERT INTO RoomOptions (room_id, option_name) 
+                            VALUES (?, ?)
+                        """, (room_id, option))
             
-            conn.commit()
-            conn.close()
             self.refresh_data()
             self.add_window.destroy()
             messagebox.showinfo("Успех", "Номер успешно добавлен")
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось добавить номер: {str(e)}")
-        finally:
-            if conn:
-                conn.close()
 
     def open_edit_room_window(self):
         if not self.selected_item:
@@ -1792,13 +2041,13 @@ class Room(ttk.Frame):
         # Получаение данных выбранного номера
         room_data = self.tree.item(self.selected_item)['values']
         room_id = room_data[0]
-        
-        # Получение полных данных о номере из БД
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        
+        self.worker.submit(self.fetch_room_for_edit, room_id, on_done=self.show_edit_room_window,
+                           widget=self, key="room.form")
+    
+    # Полные данные номера и списки для формы (выполняется в фоне)
+    def fetch_room_for_edit(self, room_id):
         # Основные данные номера
-        cursor.execute("""
+        room_info = db.fetchone("""
             SELECT r.id, r.room_number, r.places, r.price, r.floor, r.status,
                 rc.id, rc.class_name, b.id, b.building_name
             FROM Rooms r
@@ -1806,23 +2055,17 @@ class Room(ttk.Frame):
             JOIN Buildings b ON r.building_id = b.id
             WHERE r.id = ?
         """, (room_id,))
-        room_info = cursor.fetchone()
         
         # Опции номера
-        cursor.execute("SELECT option_name FROM RoomOptions WHERE room_id = ?", (room_id,))
-        room_options = [row[0] for row in cursor.fetchall()]
-        
-        # Списки для комбобоксов
-        cursor.execute("SELECT id, class_name FROM RoomClasses")
-        classes = cursor.fetchall()
-        
-        cursor.execute("SELECT id, building_name FROM Buildings")
-        buildings = cursor.fetchall()
-        
-        cursor.execute("SELECT DISTINCT option_name FROM RoomOptionsList")
-        options_list = [row[0] for row in cursor.fetchall()]
-        
-        conn.close()
+        room_options = [row[0] for row in db.fetchall("SELECT option_name FROM RoomOptions WHERE room_id = ?", (room_id,))]
+        return room_id, room_info, room_options, self.fetch_room_lists()
+    
+    def show_edit_room_window(self, data):
+        room_id, room_info, room_options, (classes, buildings, options_list) = data
+        if room_info is None:
+            messagebox.showwarning("Предупреждение", "Номер не найден - возможно, он уже удален")
+            self.refresh_data()
+            return
         
         # окно редактирования
         self.edit_window = tk.Toplevel(self)
@@ -1911,46 +2154,38 @@ class Room(ttk.Frame):
             messagebox.showerror("Ошибка", "Количество мест, цена и этаж должны быть числами")
             return
         
-        conn = None
         try:
-            conn = sqlite3.connect(get_db_path())
-            cursor = conn.cursor()
-            
-            # Получение ID класса и корпуса
-            cursor.execute("SELECT id FROM RoomClasses WHERE class_name=?", (class_name,))
-            class_id = cursor.fetchone()[0]
-            
-            cursor.execute("SELECT id FROM Buildings WHERE building_name=?", (building_name,))
-            building_id = cursor.fetchone()[0]
-            
-            # Обновление основные данные номера
-            cursor.execute("""
-                UPDATE Rooms 
-                SET room_number=?, places=?, class_id=?, price=?, floor=?, building_id=?, status=?
-                WHERE id=?
-            """, (room_number, places, class_id, price, floor, building_id, status, self.editing_room_id))
-            
-            # Обновление опций номера
-            cursor.execute("DELETE FROM RoomOptions WHERE room_id=?", (self.editing_room_id,))
-            
-            # добавление выбранных опций
-            for option, var in self.edit_options_vars.items():
-                if var.get() == 1:
-                    cursor.execute("""
-                        INSERT INTO RoomOptions (room_id, option_name)
-                        VALUES (?, ?)
-                    """, (self.editing_room_id, option))
-            
-            conn.commit()
+            with db.transaction() as cursor:
+                # Получение ID класса и корпуса
+                cursor.execute("SELECT id FROM RoomClasses WHERE class_name=?", (class_name,))
+                class_id = cursor.fetchone()[0]
+                
+                cursor.execute("SELECT id FROM Buildings WHERE building_name=?", (building_name,))
+                building_id = cursor.fetchone()[0]
+                
+                # Обновление основные данные номера
+                cursor.execute("""
+                    UPDATE Rooms 
+                    SET room_number=?, places=?, class_id=?, price=?, floor=?, building_id=?, status=?
+                    WHERE id=?
+                """, (room_number, places, class_id, price, floor, building_id, status, self.editing_room_id))
+                
+                # Обновление опций номера
+                cursor.execute("DELETE FROM RoomOptions WHERE room_id=?", (self.editing_room_id,))
+                
+                # добавление выбранных опций
+                for option, var in self.edit_options_vars.items():
+                    if var.get() == 1:
+                        cursor.execute("""
+                            INSERT INTO RoomOptions (room_id, option_name)
+                            VALUES (?, ?)
+                        """, (self.editing_room_id, option))
             
             self.refresh_data()
             self.edit_window.destroy()
             messagebox.showinfo("Успех", "Данные номера успешно обновлены")
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось обновить данные номера: {str(e)}")
-        finally:
-            if conn:
-                conn.close()
 
     def delete_room(self):
         if not self.selected_item:
@@ -1963,35 +2198,23 @@ class Room(ttk.Frame):
         
         # проверка есть ли активные бронирования для этого номера
         try:
-            conn = sqlite3.connect(get_db_path())
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT 1 FROM Reservations 
-                WHERE room_id=? AND checkout_date >= date('now')
-            """, (room_id,))
-            
-            if cursor.fetchone():
+            if db.fetchone("""
+                SELECT 1 FROM Bookings 
+                WHERE room_id=? AND checkout_date >= date('now', 'localtime')
+            """, (room_id,)):
                 messagebox.showerror("Ошибка", "Нельзя удалить номер с активными бронированиями")
-                conn.close()
                 return
                 
             if messagebox.askyesno("Подтверждение", 
                                 f"Вы действительно хотите удалить номер {room_number}?\nЭто действие нельзя отменить."):
-                cursor.execute("DELETE FROM RoomOptions WHERE room_id=?", (room_id,))
-                cursor.execute("DELETE FROM Rooms WHERE id=?", (room_id,))
-                
-                conn.commit()
-                conn.close()
+                with db.transaction() as cursor:
+                    cursor.execute("DELETE FROM RoomOptions WHERE room_id=?", (room_id,))
+                    cursor.execute("DELETE FROM Rooms WHERE id=?", (room_id,))
                 
                 self.refresh_data()
                 messagebox.showinfo("Успех", "Номер успешно удален")
-            else:
-                conn.close()
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось удалить номер: {str(e)}")
-        finally:
-            if conn:
-                conn.close()
 
     def open_change_status_window(self):
         if not self.selected_item:
@@ -2026,11 +2249,8 @@ class Room(ttk.Frame):
             return
             
         try:
-            conn = sqlite3.connect(get_db_path())
-            cursor = conn.cursor()
-            cursor.execute("UPDATE Rooms SET status=? WHERE id=?", (new_status, room_id))
-            conn.commit()
-            conn.close()
+            with db.transaction() as cursor:
+                cursor.execute("UPDATE Rooms SET status=? WHERE id=?", (new_status, room_id))
             
             self.status_window.destroy()
             self.refresh_data()
@@ -2040,6 +2260,15 @@ class Room(ttk.Frame):
 
 # --- Класс, описывающий создание меню в левой части окна ---
 class Menu(ttk.Frame):
+    SEARCH_KINDS = {"client": "Клиент", "room": "Номер", "booking": "Бронь", "finance": "Финансы"}
+    # Где открывать найденное: раздел, вкладка, таблица
+    SEARCH_TARGETS = {
+        "client": ("clients", "clients_tab", "tree"),
+        "room": ("room", "rooms_tab", "tree"),
+        "booking": ("rent", None, "reservations_tree"),
+        "finance": ("report", "finance_tab", "finance_tree"),
+    }
+
     def __init__(self, parent):
         super().__init__(parent)
         self.configure(style='Menu.TFrame')
@@ -2069,6 +2298,12 @@ class Menu(ttk.Frame):
         self.buttonMenu7 = ttk.Button(self, text='Отчеты', command=self.show_report)
         self.buttonLogout = ttk.Button(self, text='Выход', command=self.logout, state='disabled')
 
+        # Поиск по всем разделам
+        self.search_frame = ttk.Frame(self, style='Menu.TFrame')
+        self.search_entry = ttk.Entry(self.search_frame)
+        self.search_entry.pack(side='left', fill='x', expand=True)
+        self.search_entry.bind('<Return>', self.search_all)
+        ttk.Button(self.search_frame, text='Найти', width=6, command=self.search_all).pack(side='left', padx=(5, 0))
 
        # Фрейм для даты и времени
         datetime_frame = tk.Frame(self, bg='#38618C', bd=0)
@@ -2120,6 +2355,7 @@ class Menu(ttk.Frame):
         self.buttonMenu7.place_forget()
         self.buttonPayment.place_forget()
         self.buttonLogout.place_forget()
+        self.search_frame.place_forget()
         self.logged_in = False
         self.buttonLogout.config(state='disabled')
 
@@ -2133,9 +2369,70 @@ class Menu(ttk.Frame):
         self.buttonPayment.place(relx=0.27, rely=0.7, relwidth=0.45, height=40)
         self.buttonMenu6.place_forget()
         self.buttonLogout.place(relx=0.27, rely=0.8, relwidth=0.45, height=40)
+        self.search_frame.place(relx=0.1, rely=0.855, relwidth=0.8, height=30)
         self.buttonLogout.config(state='normal')
         self.logged_in = True
     
+    # Поиск строки сразу по клиентам, номерам, броням и финансам
+    def search_all(self, event=None):
+        text = self.search_entry.get().strip()
+        if len(text) < MIN_LENGTH:
+            messagebox.showinfo("Поиск", f"Введите не меньше {MIN_LENGTH} символов")
+            return
+        self.master.worker.submit(global_search, text,
+                                  on_done=lambda rows: self.show_search_results(text, rows),
+                                  widget=self, key="menu.search")
+
+    # Окно с результатами поиска; двойной щелчок открывает найденное в разделе
+    def show_search_results(self, text, rows):
+        if not rows:
+            messagebox.showinfo("Поиск", f"По запросу «{text}» ничего не найдено")
+            return
+        results_window = tk.Toplevel(self)
+        results_window.title(f"Поиск: {text}")
+        results_window.geometry("700x400")
+
+        tree = ttk.Treeview(results_window, columns=("Тип", "Найдено", "Подробности"), show="headings")
+        tree.heading("Тип", text="Тип")
+        tree.heading("Найдено", text="Найдено")
+        tree.heading("Подробности", text="Подробности")
+        tree.column("Тип", width=90, stretch=False)
+        tree.pack(expand=True, fill='both', padx=5, pady=5)
+
+        found = {}
+        for kind, ref, title, details in rows:
+            iid = tree.insert("", "end", values=(self.SEARCH_KINDS[kind], title, details))
+            found[iid] = (kind, ref)
+
+        def open_selected(event):
+            selected = tree.selection()
+            if selected:
+                self.open_search_result(*found[selected[0]])
+
+        tree.bind('<Double-1>', open_selected)
+        tree.bind('<Return>', open_selected)
+
+    # Открывает раздел с найденной строкой и выделяет ее
+    def open_search_result(self, kind, ref):
+        section, tab, tree_name = self.SEARCH_TARGETS[kind]
+        frame = self.master.frame(section)
+        frame.tkraise()
+        if tab is not None:
+            frame.notebook.select(getattr(frame, tab))
+        # Клиенты загружаются страницами - найденный может быть не загружен
+        if kind == "client" and not getattr(frame, tree_name).exists(ref):
+            frame.load_data("id = ?", (ref,))
+        self.select_search_result(getattr(frame, tree_name), ref)
+
+    # Строка может появиться после фоновой загрузки раздела, поэтому
+    # выделение несколько раз повторяется с интервалом 100 мс
+    def select_search_result(self, tree, ref, attempts=20):
+        if tree.exists(ref):
+            tree.selection_set(ref)
+            tree.see(ref)
+        elif attempts:
+            self.after(100, self.select_search_result, tree, ref, attempts - 1)
+
     # Показывает кнопку администрирования для суперпользователя
     def show_admin_button(self):
         
@@ -2155,11 +2452,7 @@ class Menu(ttk.Frame):
         tree.pack(expand=True, fill='both', padx=5, pady=5)
         
         # Загрузка пользователей
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, name FROM Users")
-        users = cursor.fetchall()
-        conn.close()
+        users = db.fetchall("SELECT id, name FROM Users")
         
         for user in users:
             tree.insert("", "end", values=user)
@@ -2195,11 +2488,8 @@ class Menu(ttk.Frame):
                 return
                 
             try:
-                conn = sqlite3.connect(get_db_path())
-                cursor = conn.cursor()
-                cursor.execute("INSERT INTO Users (name, password) VALUES (?, ?)", (username, password))
-                conn.commit()
-                conn.close()
+                with db.transaction() as cursor:
+                    cursor.execute("INSERT INTO Users (name, password) VALUES (?, ?)", (username, password))
                 
                 # Обновляем таблицу
                 tree.insert("", "end", values=(cursor.lastrowid, username))
@@ -2228,11 +2518,8 @@ class Menu(ttk.Frame):
             
         if messagebox.askyesno("Подтверждение", f"Удалить пользователя {username}?"):
             try:
-                conn = sqlite3.connect(get_db_path())
-                cursor = conn.cursor()
-                cursor.execute("DELETE FROM Users WHERE id=?", (user_id,))
-                conn.commit()
-                conn.close()
+                with db.transaction() as cursor:
+                    cursor.execute("DELETE FROM Users WHERE id=?", (user_id,))
                 
                 tree.delete(tree.selection()[0])
                 messagebox.showinfo("Успех", "Пользователь удален")
@@ -2265,11 +2552,8 @@ class Menu(ttk.Frame):
                 return
                 
             try:
-                conn = sqlite3.connect(get_db_path())
-                cursor = conn.cursor()
-                cursor.execute("UPDATE Users SET password=? WHERE id=?", (password, user_id))
-                conn.commit()
-                conn.close()
+                with db.transaction() as cursor:
+                    cursor.execute("UPDATE Users SET password=? WHERE id=?", (password, user_id))
                 
                 change_window.destroy()
                 messagebox.showinfo("Успех", "Пароль изменен")
@@ -2290,63 +2574,45 @@ class Menu(ttk.Frame):
         self.buttonMenu6.place(relx=0.27, rely=0.8, relwidth=0.45, height=40)  # Показываем кнопку входа
         messagebox.showinfo("Выход", "Вы успешно вышли из системы")
 
-    def set_spravka_frame(self, spravka_frame):
-        self.spravka_frame = spravka_frame
 
     def show_spravka(self):
-        self.spravka_frame.tkraise()
+        self.master.show_frame("spravka")
 
-    def set_payment_frame(self, payment_frame):
-        self.payment_frame = payment_frame
     
     def show_payment(self):
-        self.payment_frame.tkraise()
+        self.master.show_frame("payment")
 
-    def set_about_frame(self, about_frame):
-        self.about_frame = about_frame
 
     def show_about(self):
-        self.about_frame.tkraise()
+        self.master.show_frame("about")
 
 
-    def set_clients_frame(self, clients_frame):
-        self.clients_frame = clients_frame
 
     def show_clients(self):
-        self.clients_frame.tkraise()
+        self.master.show_frame("clients")
 
 
-    def set_rent_frame(self, rent_frame):
-        self.rent_frame = rent_frame
 
     def show_rent(self):
-        self.rent_frame.tkraise()
+        self.master.show_frame("rent")
 
 
-    def set_room_frame(self, room_frame):
-        self.room_frame = room_frame
 
     def show_room(self):
-        self.room_frame.tkraise()
+        self.master.show_frame("room")
 
 
-    def set_login_frame(self, login_frame):
-        self.login_frame = login_frame
 
     def show_login(self):
-        self.login_frame.tkraise()
+        self.master.show_frame("login")
 
-    def set_report_frame(self, report_frame):
-        self.report_frame = report_frame
     
     def show_report(self):
-        self.report_frame.tkraise()
+        self.master.show_frame("report")
         
-    def set_admin_frame(self, admin_frame):
-        self.admin_frame = admin_frame
     
     def show_admin_panel(self):
-        self.admin_frame.tkraise()
+        self.master.show_frame("admin")
 
 # --- Класс, описывающий создание фрейма АВТОРИЗАЦИЯ ---
 class Login(ttk.Frame):
@@ -2414,11 +2680,7 @@ class Login(ttk.Frame):
             self.login_status.config(text='Введите логин и пароль', foreground='red')
             return
             
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM Users WHERE name = ? AND password = ?;', (username, password))
-        user = cursor.fetchone()
-        conn.close()
+        user = db.fetchone('SELECT * FROM Users WHERE name = ? AND password = ?;', (username, password))
 
         if user:
             self.login_status.config(text='Успешный вход', foreground='green')
@@ -2428,7 +2690,7 @@ class Login(ttk.Frame):
             if username.lower() == "root":
                 self.master.menu.show_admin_button()
                 
-            self.master.clients.tkraise()
+            self.master.show_frame("clients")
         else:
             self.login_status.config(text='Ошибка входа: неверный логин или пароль', foreground='red')
 
@@ -2438,6 +2700,7 @@ class Spravka(ttk.Frame):
     def __init__(self, parent):
         super().__init__(parent)
         self.parent = parent
+        self.worker = parent.worker
         testLbl = ttk.Label(self, background='#35A7FF')
         testLbl.pack(expand=True, fill='both')
         self.place(relx=0.3, y=0, relwidth=0.7, relheight=1)
@@ -2465,7 +2728,8 @@ class Spravka(ttk.Frame):
     
     def create_classes_tab(self):
         # Таблица классов
-        self.classes_tree = ttk.Treeview(self.classes_tab, columns=("ID", "Класс", "Описание"), show="headings")
+        self.classes_tree = VirtualTreeview(self.classes_tab, columns=("ID", "Класс", "Описание"), show="headings",
+                                            key=lambda row: row[0])
         for col in ("ID", "Класс", "Описание"):
             self.classes_tree.heading(col, text=col)
         self.classes_tree.pack(expand=True, fill='both', padx=5, pady=5)
@@ -2487,18 +2751,13 @@ class Spravka(ttk.Frame):
         self.refresh_classes()
     
     def refresh_classes(self):
+        self.worker.submit(db.fetchall, "SELECT id, class_name, description FROM RoomClasses",
+                           on_done=self.display_classes, widget=self, key="spravka.classes")
+
+    def display_classes(self, classes):
+        self.classes = classes
         
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, class_name, description FROM RoomClasses")
-        self.classes = cursor.fetchall()
-        conn.close()
-        
-        for row in self.classes_tree.get_children():
-            self.classes_tree.delete(row)
-        
-        for cls in self.classes:
-            self.classes_tree.insert("", "end", values=cls)
+        self.classes_tree.set_rows(self.classes)
     
     def open_add_class_window(self):
         self.add_class_window = tk.Toplevel(self)
@@ -2523,11 +2782,8 @@ class Spravka(ttk.Frame):
             return
             
         try:
-            conn = sqlite3.connect(get_db_path())
-            cursor = conn.cursor()
-            cursor.execute("INSERT INTO RoomClasses (class_name, description) VALUES (?, ?)", (name, desc))
-            conn.commit()
-            conn.close()
+            with db.transaction() as cursor:
+                cursor.execute("INSERT INTO RoomClasses (class_name, description) VALUES (?, ?)", (name, desc))
             
             self.refresh_classes()
             self.add_class_window.destroy()
@@ -2543,11 +2799,7 @@ class Spravka(ttk.Frame):
         class_id = self.classes_tree.item(self.classes_tree.selection()[0])['values'][0]
         
         # Получаем данные выбранного класса
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, class_name, description FROM RoomClasses WHERE id=?", (class_id,))
-        class_data = cursor.fetchone()
-        conn.close()
+        class_data = db.fetchone("SELECT id, class_name, description FROM RoomClasses WHERE id=?", (class_id,))
         
         # Создаем окно редактирования
         self.edit_class_window = tk.Toplevel(self)
@@ -2576,15 +2828,12 @@ class Spravka(ttk.Frame):
             return
             
         try:
-            conn = sqlite3.connect(get_db_path())
-            cursor = conn.cursor()
-            cursor.execute("""
-                UPDATE RoomClasses 
-                SET class_name=?, description=? 
-                WHERE id=?
-            """, (name, desc, self.editing_class_id))
-            conn.commit()
-            conn.close()
+            with db.transaction() as cursor:
+                cursor.execute("""
+                    UPDATE RoomClasses 
+                    SET class_name=?, description=? 
+                    WHERE id=?
+                """, (name, desc, self.editing_class_id))
             
             self.refresh_classes()
             self.edit_class_window.destroy()
@@ -2602,31 +2851,24 @@ class Spravka(ttk.Frame):
         
         # Проверяем, есть ли номера этого класса
         try:
-            conn = sqlite3.connect(get_db_path())
-            cursor = conn.cursor()
-            cursor.execute("SELECT 1 FROM Rooms WHERE class_id=?", (class_id,))
-            
-            if cursor.fetchone():
+            if db.fetchone("SELECT 1 FROM Rooms WHERE class_id=?", (class_id,)):
                 messagebox.showerror("Ошибка", "Нельзя удалить класс, к которому привязаны номера")
-                conn.close()
                 return
                 
             if messagebox.askyesno("Подтверждение", 
                                 f"Вы действительно хотите удалить класс {class_name}?\nЭто действие нельзя отменить."):
-                cursor.execute("DELETE FROM RoomClasses WHERE id=?", (class_id,))
-                conn.commit()
-                conn.close()
+                with db.transaction() as cursor:
+                    cursor.execute("DELETE FROM RoomClasses WHERE id=?", (class_id,))
                 
                 self.refresh_classes()
                 messagebox.showinfo("Успех", "Класс успешно удален")
-            else:
-                conn.close()
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось удалить класс: {str(e)}")
 
     def create_buildings_tab(self):
         # Таблица корпусов
-        self.buildings_tree = ttk.Treeview(self.buildings_tab, columns=("ID", "Корпус", "Описание"), show="headings")
+        self.buildings_tree = VirtualTreeview(self.buildings_tab, columns=("ID", "Корпус", "Описание"), show="headings",
+                                              key=lambda row: row[0])
         for col in ("ID", "Корпус", "Описание"):
             self.buildings_tree.heading(col, text=col)
         self.buildings_tree.pack(expand=True, fill='both', padx=5, pady=5)
@@ -2647,17 +2889,13 @@ class Spravka(ttk.Frame):
         self.refresh_buildings()
 
     def refresh_buildings(self):
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, building_name, description FROM Buildings")
-        self.buildings = cursor.fetchall()
-        conn.close()
-        
-        for row in self.buildings_tree.get_children():
-            self.buildings_tree.delete(row)
+        self.worker.submit(db.fetchall, "SELECT id, building_name, description FROM Buildings",
+                           on_done=self.display_buildings, widget=self, key="spravka.buildings")
+
+    def display_buildings(self, buildings):
+        self.buildings = buildings
         
-        for building in self.buildings:
-            self.buildings_tree.insert("", "end", values=building)
+        self.buildings_tree.set_rows(self.buildings)
 
     def open_add_building_window(self):
         self.add_building_window = tk.Toplevel(self)
@@ -2682,11 +2920,8 @@ class Spravka(ttk.Frame):
             return
             
         try:
-            conn = sqlite3.connect(get_db_path())
-            cursor = conn.cursor()
-            cursor.execute("INSERT INTO Buildings (building_name, description) VALUES (?, ?)", (name, desc))
-            conn.commit()
-            conn.close()
+            with db.transaction() as cursor:
+                cursor.execute("INSERT INTO Buildings (building_name, description) VALUES (?, ?)", (name, desc))
             
             self.refresh_buildings()
             self.add_building_window.destroy()
@@ -2701,11 +2936,7 @@ class Spravka(ttk.Frame):
         
         building_id = self.buildings_tree.item(self.buildings_tree.selection()[0])['values'][0]
         
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, building_name, description FROM Buildings WHERE id=?", (building_id,))
-        building_data = cursor.fetchone()
-        conn.close()
+        building_data = db.fetchone("SELECT id, building_name, description FROM Buildings WHERE id=?", (building_id,))
         
         self.edit_building_window = tk.Toplevel(self)
         self.edit_building_window.title("Редактировать корпус")
@@ -2733,15 +2964,12 @@ class Spravka(ttk.Frame):
             return
             
         try:
-            conn = sqlite3.connect(get_db_path())
-            cursor = conn.cursor()
-            cursor.execute("""
-                UPDATE Buildings 
-                SET building_name=?, description=? 
-                WHERE id=?
-            """, (name, desc, self.editing_building_id))
-            conn.commit()
-            conn.close()
+            with db.transaction() as cursor:
+                cursor.execute("""
+                    UPDATE Buildings 
+                    SET building_name=?, description=? 
+                    WHERE id=?
+                """, (name, desc, self.editing_building_id))
             
             self.refresh_buildings()
             self.edit_building_window.destroy()
@@ -2759,31 +2987,24 @@ class Spravka(ttk.Frame):
         
         # Проверяем, есть ли номера в этом корпусе
         try:
-            conn = sqlite3.connect(get_db_path())
-            cursor = conn.cursor()
-            cursor.execute("SELECT 1 FROM Rooms WHERE building_id=?", (building_id,))
-            
-            if cursor.fetchone():
+            if db.fetchone("SELECT 1 FROM Rooms WHERE building_id=?", (building_id,)):
                 messagebox.showerror("Ошибка", "Нельзя удалить корпус, в котором есть номера")
-                conn.close()
                 return
                 
             if messagebox.askyesno("Подтверждение", 
                                 f"Вы действительно хотите удалить корпус {building_name}?\nЭто действие нельзя отменить."):
-                cursor.execute("DELETE FROM Buildings WHERE id=?", (building_id,))
-                conn.commit()
-                conn.close()
+                with db.transaction() as cursor:
+                    cursor.execute("DELETE FROM Buildings WHERE id=?", (building_id,))
                 
                 self.refresh_buildings()
                 messagebox.showinfo("Успех", "Корпус успешно удален")
-            else:
-                conn.close()
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось удалить корпус: {str(e)}")
 
     def create_options_tab(self):
         # Таблица опций
-        self.options_tree = ttk.Treeview(self.options_tab, columns=("ID", "Опция"), show="headings")
+        self.options_tree = VirtualTreeview(self.options_tab, columns=("ID", "Опция"), show="headings",
+                                            key=lambda row: row[0])
         for col in ("ID", "Опция"):
             self.options_tree.heading(col, text=col)
         self.options_tree.pack(expand=True, fill='both', padx=5, pady=5)
@@ -2803,17 +3024,13 @@ class Spravka(ttk.Frame):
         self.refresh_options()
 
     def refresh_options(self):
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, option_name FROM RoomOptionsList")
-        self.options = cursor.fetchall()
-        conn.close()
-        
-        for row in self.options_tree.get_children():
-            self.options_tree.delete(row)
+        self.worker.submit(db.fetchall, "SELECT id, option_name FROM RoomOptionsList",
+                           on_done=self.display_options, widget=self, key="spravka.options")
+
+    def display_options(self, options):
+        self.options = options
         
-        for option in self.options:
-            self.options_tree.insert("", "end", values=option)
+        self.options_tree.set_rows(self.options)
 
     def open_add_option_window(self):
         self.add_option_window = tk.Toplevel(self)
@@ -2834,11 +3051,8 @@ class Spravka(ttk.Frame):
             return
             
         try:
-            conn = sqlite3.connect(get_db_path())
-            cursor = conn.cursor()
-            cursor.execute("INSERT INTO RoomOptionsList (option_name) VALUES (?)", (name,))
-            conn.commit()
-            conn.close()
+            with db.transaction() as cursor:
+                cursor.execute("INSERT INTO RoomOptionsList (option_name) VALUES (?)", (name,))
             
             self.refresh_options()
             self.add_option_window.destroy()
@@ -2858,35 +3072,31 @@ class Spravka(ttk.Frame):
         
         # проверяем, используется ли опция в каких-либо номерах
         try:
-            conn = sqlite3.connect(get_db_path())
-            cursor = conn.cursor()
-            cursor.execute("SELECT 1 FROM RoomOptions WHERE option_name=?", (option_name,))
-            
-            if cursor.fetchone():
+            if db.fetchone("SELECT 1 FROM RoomOptions WHERE option_name=?", (option_name,)):
                 messagebox.showerror("Ошибка", "Нельзя удалить опцию, которая используется в номерах")
-                conn.close()
                 return
                 
             if messagebox.askyesno("Подтверждение", 
                                 f"Вы действительно хотите удалить опцию {option_name}?\nЭто действие нельзя отменить."):
-                cursor.execute("DELETE FROM RoomOptionsList WHERE id=?", (option_id,))
-                conn.commit()
-                conn.close()
+                with db.transaction() as cursor:
+                    cursor.execute("DELETE FROM RoomOptionsList WHERE id=?", (option_id,))
                 
                 self.refresh_options()
                 messagebox.showinfo("Успех", "Опция успешно удалена")
-            else:
-                conn.close()
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось удалить опцию: {str(e)}")
 
 # --- Класс, описывающий создание фрейма ОТЧЕТЫ ---
 class Report(ttk.Frame):
+    # Предельное время запроса отчета (с): дольше отчет не занимает бд
+    REPORT_TIMEOUT = 60
+    
     def __init__(self, parent):
         super().__init__(parent)
         testLbl = ttk.Label(self, background='#35A7FF')
         testLbl.pack(expand=True, fill='both')
         self.place(relx=0.3, y=0, relwidth=0.7, relheight=1)
+        self.worker = parent.worker
         self.create_widgets()
         
     def create_widgets(self):
@@ -2905,8 +3115,13 @@ class Report(ttk.Frame):
         
         ttk.Button(button_frame, text="Экспорт в Excel", command=self.export_current_tab_to_excel).pack(side='left', padx=5)
         ttk.Button(button_frame, text="Экспорт в Word", command=self.export_current_tab_to_word).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Отменить", command=self.cancel_tasks).pack(side='left', padx=5)
         ttk.Button(button_frame, text="Очистить финансовые данные", command=self.clear_financial_data).pack(side='right', padx=5)
     
+    # Прерывание выполняемых запросов отчетов и экспорта
+    def cancel_tasks(self):
+        self.worker.cancel(self)
+    
     def create_finance_tab(self):
         # Фрейм для поиска
         search_frame = ttk.Frame(self.finance_tab)
@@ -2922,6 +3137,7 @@ class Report(ttk.Frame):
         
         self.finance_search_entry = ttk.Entry(search_frame)
         self.finance_search_entry.pack(side='left', padx=5, expand=True, fill='x')
+        LiveSearch(self.finance_search_entry, lambda: self.search_finance(quiet=True))
         
         ttk.Button(search_frame, text="Найти", command=self.search_finance).pack(side='left', padx=5)
         ttk.Button(search_frame, text="Сброс", command=self.reset_finance_search).pack(side='left', padx=5)
@@ -2940,10 +3156,12 @@ class Report(ttk.Frame):
         ttk.Button(control_frame, text="Изменить", command=self.open_edit_finance_window).pack(side='left', padx=5)
 
         # Таблица для финансового отчета
-        self.finance_tree = ttk.Treeview(
+        self.finance_tree = VirtualTreeview(
             self.finance_tab, 
             columns=("ID", "Тип", "Сумма", "Дата", "Описание"), 
-            show="headings"
+            show="headings",
+            key=lambda row: row[0],
+            display=self.finance_values
         )
         
         # Настройка колонок
@@ -2980,7 +3198,8 @@ class Report(ttk.Frame):
         self.generate_finance_report()
     
     # Поиск финансовых записей
-    def search_finance(self):
+    # quiet - поиск по мере ввода: недописанная сумма не вызывает ошибки
+    def search_finance(self, quiet=False):
         search_field = self.finance_search_field.get()
         search_text = self.finance_search_entry.get().strip()
         
@@ -2988,44 +3207,44 @@ class Report(ttk.Frame):
             self.generate_finance_report()
             return
             
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        
         query = "SELECT id, type, amount, date, description FROM Finances WHERE 1=1"
+        params = ()
         
         if search_field == "Тип":
             query += " AND type LIKE ?"
-            search_text = f"%{search_text.lower()}%"
+            params = (f"%{search_text.lower()}%",)
         elif search_field == "Сумма":
             try:
                 search_num = float(search_text)
                 query += " AND amount = ?"
-                search_text = search_num
+                params = (search_num,)
             except ValueError:
-                messagebox.showerror("Ошибка", "Введите число для поиска по сумме")
+                if not quiet:
+                    messagebox.showerror("Ошибка", "Введите число для поиска по сумме")
                 return
         elif search_field == "Дата":
-            query += " AND date LIKE ?"
-            search_text = f"%{search_text}%"
+            condition, params = search_condition("date", search_text)
+            query += f" AND {condition}"
         elif search_field == "Описание":
-            query += " AND description LIKE ?"
-            search_text = f"%{search_text}%"
-            
-        cursor.execute(query, (search_text,))
-        finance_data = cursor.fetchall()
-        conn.close()
+            condition, params = match_condition("FinancesSearch", "description", search_text)
+            query += f" AND {condition}"
         
-        # Обновляем таблицу
-        for row in self.finance_tree.get_children():
-            self.finance_tree.delete(row)
-        
-        for row in finance_data:
-            item_id, type_, amount, date, description = row
-            type_text = "Расход" if type_ == "expense" else "Доход"
-            self.finance_tree.insert(
-                "", "end", 
-                values=(item_id, type_text, f"{amount:.2f} руб.", date, description)
-            )
+        query += " ORDER BY date DESC"
+            
+        self.worker.submit(db.chunks, query, params,
+                           on_chunk=self.display_finance_rows, on_done=self.display_finance_rows,
+                           widget=self, key="report.finance", timeout=self.REPORT_TIMEOUT)
+    
+    # Заполняет таблицу финансовых операций
+    def display_finance_rows(self, finance_data):
+        self.finance_tree.set_rows(finance_data)
+
+    # Значения финансовой записи для таблицы
+    @staticmethod
+    def finance_values(row):
+        item_id, type_, amount, date, description = row
+        type_text = "Расход" if type_ == "expense" else "Доход"
+        return (item_id, type_text, f"{amount:.2f} руб.", to_ui(date), description)
     
     # Сброс поиска финансовых записей
     def reset_finance_search(self):
@@ -3039,17 +3258,12 @@ class Report(ttk.Frame):
             return
         
         try:
-            conn = sqlite3.connect(get_db_path())
-            cursor = conn.cursor()
-            
-            # Удаляем все финансовые записи
-            cursor.execute("DELETE FROM Finances")
-            
-            # Удаляем все платежи
-            cursor.execute("DELETE FROM Payments")
-            
-            conn.commit()
-            conn.close()
+            with db.transaction() as cursor:
+                # Удаляем все финансовые записи
+                cursor.execute("DELETE FROM Finances")
+                
+                # Удаляем все платежи
+                cursor.execute("DELETE FROM Payments")
             
             # Обновляем отчеты
             self.generate_finance_report()
@@ -3100,17 +3314,14 @@ class Report(ttk.Frame):
                 raise ValueError("Сумма должна быть положительной")
             
             # Проверяем корректность даты
-            datetime.strptime(date, "%d.%m.%Y")
+            date = to_db(date)
             
             # Добавляем запись в базу данных
-            conn = sqlite3.connect(get_db_path())
-            cursor = conn.cursor()
-            cursor.execute(
-                "INSERT INTO Finances (type, amount, date, description) VALUES (?, ?, ?, ?)",
-                ("expense", amount, date, description)
-            )
-            conn.commit()
-            conn.close()
+            with db.transaction() as cursor:
+                cursor.execute(
+                    "INSERT INTO Finances (type, amount, date, description) VALUES (?, ?, ?, ?)",
+                    ("expense", amount, date, description)
+                )
             
             messagebox.showinfo("Успех", "Расход успешно добавлен")
             self.expense_window.destroy()
@@ -3123,38 +3334,30 @@ class Report(ttk.Frame):
     
     # Генерирует финансовый отчет
     def generate_finance_report(self):
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        
+        self.worker.submit(self.fetch_finance_report,
+                           on_done=self.display_finance_report, widget=self, key="report.finance",
+                           cancellable=True, timeout=self.REPORT_TIMEOUT)
+
+    def fetch_finance_report(self):
         # Получаем доходы (из платежей)
-        cursor.execute("SELECT SUM(amount) FROM Finances WHERE type='income'")
-        total_income = cursor.fetchone()[0] or 0
+        total_income = db.scalar("SELECT SUM(amount) FROM Finances WHERE type='income'") or 0
         
         # Получаем расходы
-        cursor.execute("SELECT SUM(amount) FROM Finances WHERE type='expense'")
-        total_expense = cursor.fetchone()[0] or 0
+        total_expense = db.scalar("SELECT SUM(amount) FROM Finances WHERE type='expense'") or 0
         
         # Получаем все финансовые операции
-        cursor.execute("""
+        finance_data = db.fetchall("""
             SELECT id, type, amount, date, description 
             FROM Finances 
             ORDER BY date DESC
         """)
-        finance_data = cursor.fetchall()
-        
-        conn.close()
+        return total_income, total_expense, finance_data
+
+    def display_finance_report(self, report):
+        total_income, total_expense, finance_data = report
         
         # Обновляем таблицу
-        for row in self.finance_tree.get_children():
-            self.finance_tree.delete(row)
-        
-        for row in finance_data:
-            item_id, type_, amount, date, description = row
-            type_text = "Расход" if type_ == "expense" else "Доход"
-            self.finance_tree.insert(
-                "", "end", 
-                values=(item_id, type_text, f"{amount:.2f} руб.", date, description)
-            )
+        self.display_finance_rows(finance_data)
         
         # Обновляем итоговые значения
         self.income_label.config(text=f"{total_income:.2f} руб.")
@@ -3171,11 +3374,8 @@ class Report(ttk.Frame):
         
         if messagebox.askyesno("Подтверждение", "Вы действительно хотите удалить эту запись?"):
             try:
-                conn = sqlite3.connect(get_db_path())
-                cursor = conn.cursor()
-                cursor.execute("DELETE FROM Finances WHERE id=?", (record_id,))
-                conn.commit()
-                conn.close()
+                with db.transaction() as cursor:
+                    cursor.execute("DELETE FROM Finances WHERE id=?", (record_id,))
                 
                 self.generate_finance_report()
                 messagebox.showinfo("Успех", "Запись успешно удалена")
@@ -3233,21 +3433,18 @@ class Report(ttk.Frame):
             
         try:
             amount = float(amount)
-            datetime.strptime(date, "%d.%m.%Y")  # Проверка формата даты
+            date = to_db(date)  # Проверка формата даты
         except ValueError:
             messagebox.showerror("Ошибка", "Некорректные данные (сумма должна быть числом, дата в формате ДД.ММ.ГГГГ)")
             return
             
         try:
-            conn = sqlite3.connect(get_db_path())
-            cursor = conn.cursor()
-            cursor.execute("""
-                UPDATE Finances 
-                SET type=?, amount=?, date=?, description=?
-                WHERE id=?
-            """, (record_type, amount, date, description, record_id))
-            conn.commit()
-            conn.close()
+            with db.transaction() as cursor:
+                cursor.execute("""
+                    UPDATE Finances 
+                    SET type=?, amount=?, date=?, description=?
+                    WHERE id=?
+                """, (record_type, amount, date, description, record_id))
             
             self.edit_finance_window.destroy()
             self.generate_finance_report()
@@ -3265,49 +3462,32 @@ class Report(ttk.Frame):
             self.generate_top_clients_report()
             return
             
-        # Получаем все данные
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT 
-                c.id, 
-                c.name, 
-                COALESCE((SELECT SUM(p.amount) FROM Payments p 
-                        JOIN Reservations r ON p.reservation_id = r.id 
-                        WHERE r.client_id = c.id), 0) +
-                COALESCE((SELECT SUM(f.amount) 
-                        FROM Finances f 
-                        WHERE f.type='income' 
-                        AND f.description LIKE '%Ручное добавление клиента ID:' || c.id || '%'), 0) as total_spent
-            FROM Clients c
-            GROUP BY c.id
-            HAVING total_spent > 0
-        """)
-        
-        all_clients = cursor.fetchall()
-        conn.close()
-        
-        # Фильтруем результаты
-        filtered_clients = []
-        for row in all_clients:
-            client_id, client_name, total_spent = row
-            
-            if search_field == "Клиент" and search_text in client_name.lower():
-                filtered_clients.append(row)
-            elif search_field == "Сумма":
-                try:
-                    search_amount = float(search_text)
-                    if abs(total_spent - search_amount) < 0.01:  # Сравнение с учетом округления
-                        filtered_clients.append(row)
-                except ValueError:
-                    pass
+        # Фильтрует все данные по готовности
+        def show(all_clients):
+            filtered_clients = []
+            for row in all_clients:
+                client_id, client_name, total_spent = row
+                
+                if search_field == "Клиент" and search_text in client_name.lower():
+                    filtered_clients.append(row)
+                elif search_field == "Сумма":
+                    try:
+                        search_amount = float(search_text)
+                        if abs(total_spent - search_amount) < 0.01:  # Сравнение с учетом округления
+                            filtered_clients.append(row)
+                    except ValueError:
+                        pass
+            self.display_client_totals(filtered_clients)
         
-        # Обновляем таблицу
+        self.worker.submit(self.fetch_client_totals, on_done=show, widget=self, key="report.clients",
+                           timeout=self.REPORT_TIMEOUT)
+    
+    # Заполняет таблицу клиентов отчета
+    def display_client_totals(self, rows):
         for row in self.clients_tree.get_children():
             self.clients_tree.delete(row)
         
-        for row in filtered_clients:
+        for row in rows:
             client_id, client_name, total_spent = row
             self.clients_tree.insert("", "end", values=(client_id, client_name, f"{total_spent:.2f} руб."))
     
@@ -3324,22 +3504,17 @@ class Report(ttk.Frame):
         client_name = self.clients_tree.item(self.clients_tree.selection()[0])['values'][0]
         
         # Получаем ID клиента из имени
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        cursor.execute("SELECT id FROM Clients WHERE name=?", (client_name,))
-        client_id = cursor.fetchone()[0]
+        client_id = db.scalar("SELECT id FROM Clients WHERE name=?", (client_name,))
         
         # Получаем все платежи клиента
-        cursor.execute("""
-            SELECT p.id, r.room_id, rm.room_number, p.amount, p.payment_date
+        payments = db.fetchall("""
+            SELECT p.id, b.room_id, rm.room_number, p.amount, p.payment_date
             FROM Payments p
-            JOIN Reservations r ON p.reservation_id = r.id
-            JOIN Rooms rm ON r.room_id = rm.id
-            WHERE r.client_id=?
+            JOIN Bookings b ON p.booking_id = b.id
+            JOIN Rooms rm ON b.room_id = rm.id
+            WHERE p.client_id=?
             ORDER BY p.payment_date DESC
         """, (client_id,))
-        payments = cursor.fetchall()
-        conn.close()
         
         # Создаем окно с детализацией
         details_window = tk.Toplevel(self)
@@ -3353,7 +3528,7 @@ class Report(ttk.Frame):
             tree.column(col, width=100, anchor='center')
         
         for payment in payments:
-            tree.insert("", "end", values=(payment[0], payment[2], f"{payment[3]:.2f} руб.", payment[4]))
+            tree.insert("", "end", values=(payment[0], payment[2], f"{payment[3]:.2f} руб.", to_ui(payment[4])))
         
         tree.pack(expand=True, fill='both', padx=5, pady=5)
         
@@ -3369,19 +3544,15 @@ class Report(ttk.Frame):
         room_number = self.rooms_tree.item(self.rooms_tree.selection()[0])['values'][0]
         
         # Получаем все платежи по номеру
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        cursor.execute("""
+        payments = db.fetchall("""
             SELECT p.id, c.name, p.amount, p.payment_date
             FROM Payments p
-            JOIN Reservations r ON p.reservation_id = r.id
-            JOIN Rooms rm ON r.room_id = rm.id
-            JOIN Clients c ON r.client_id = c.id
+            JOIN Bookings b ON p.booking_id = b.id
+            JOIN Rooms rm ON b.room_id = rm.id
+            JOIN Clients c ON p.client_id = c.id
             WHERE rm.room_number=?
             ORDER BY p.payment_date DESC
         """, (room_number,))
-        payments = cursor.fetchall()
-        conn.close()
         
         # Создаем окно с детализацией
         details_window = tk.Toplevel(self)
@@ -3395,7 +3566,7 @@ class Report(ttk.Frame):
             tree.column(col, width=100, anchor='center')
         
         for payment in payments:
-            tree.insert("", "end", values=(payment[0], payment[1], f"{payment[2]:.2f} руб.", payment[3]))
+            tree.insert("", "end", values=(payment[0], payment[1], f"{payment[2]:.2f} руб.", to_ui(payment[3])))
         
         tree.pack(expand=True, fill='both', padx=5, pady=5)
         
@@ -3413,20 +3584,12 @@ class Report(ttk.Frame):
         
         if messagebox.askyesno("Подтверждение", "Вы действительно хотите удалить этот платеж?"):
             try:
-                conn = sqlite3.connect(get_db_path())
-                cursor = conn.cursor()
-                
-                # Удаляем платеж
-                cursor.execute("DELETE FROM Payments WHERE id=?", (payment_id,))
-                
-                # Удаляем соответствующую запись о доходе
-                cursor.execute("""
-                    DELETE FROM Finances 
-                    WHERE type='income' AND description LIKE ?
-                """, (f"%Оплата бронирования №{payment_id}%",))
-                
-                conn.commit()
-                conn.close()
+                with db.transaction() as cursor:
+                    # Удаляем платеж
+                    cursor.execute("DELETE FROM Payments WHERE id=?", (payment_id,))
+                    
+                    # Удаляем соответствующую запись о доходе
+                    cursor.execute("DELETE FROM Finances WHERE payment_id=?", (payment_id,))
                 
                 # Обновляем данные
                 window.destroy()
@@ -3438,64 +3601,79 @@ class Report(ttk.Frame):
             except Exception as e:
                 messagebox.showerror("Ошибка", f"Не удалось удалить платеж: {str(e)}")
 
+    # Суммы по клиентам: оплаты броней и ручные добавления в отчет.
+    # Берутся готовыми из ClientStats (по индексу суммы).
+    # limit=-1 - без ограничения количества строк
+    def fetch_client_totals(self, limit=-1):
+        return db.fetchall("""
+            SELECT c.id, c.name, s.spent as total_spent
+            FROM ClientStats s
+            JOIN Clients c ON c.id = s.client_id
+            WHERE s.spent > 0
+            ORDER BY s.spent DESC
+            LIMIT ?
+        """, (limit,))
+
+    # Доходы по номерам: оплаты броней (исключая тестовые) и ручные добавления в отчет
+    def fetch_room_totals(self, limit=-1):
+        return db.fetchall("""
+            WITH income(room_id, amount) AS (
+                SELECT b.room_id, p.amount
+                FROM Payments p
+                JOIN Bookings b ON b.id = p.booking_id
+                WHERE p.client_id != 1  -- Исключаем тестовые бронирования
+                UNION ALL
+                SELECT room_id, amount FROM Finances
+                WHERE type='income' AND room_id IS NOT NULL AND payment_id IS NULL
+            )
+            SELECT r.id, r.room_number, SUM(i.amount) as total_income
+            FROM income i
+            JOIN Rooms r ON r.id = i.room_id
+            GROUP BY r.id
+            ORDER BY total_income DESC
+            LIMIT ?
+        """, (limit,))
+
     # Генерирует отчет о лучших клиентах (включая ручные добавления)
     def generate_top_clients_report(self):
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        
+        self.worker.submit(self.fetch_top_clients,
+                           on_done=self.display_top_clients, widget=self, key="report.clients",
+                           timeout=self.REPORT_TIMEOUT)
+
+    def fetch_top_clients(self):
         # Основной запрос: клиенты с бронированиями и ручными добавками
-        cursor.execute("""
-            SELECT 
-                c.id, 
-                c.name, 
-                COALESCE((SELECT SUM(p.amount) FROM Payments p 
-                        JOIN Reservations r ON p.reservation_id = r.id 
-                        WHERE r.client_id = c.id), 0) +
-                COALESCE((SELECT SUM(f.amount) 
-                        FROM Finances f 
-                        WHERE f.type='income' 
-                        AND f.description LIKE '%Ручное добавление клиента ID:' || c.id || '%'), 0) as total_spent
-            FROM Clients c
-            GROUP BY c.id
-            HAVING total_spent > 0
-            ORDER BY total_spent DESC
-            LIMIT 10
-        """)
-        
-        # Очищаем таблицу
-        for row in self.clients_tree.get_children():
-            self.clients_tree.delete(row)
-        
-        # Добавляем клиентов из основного запроса
-        for row in cursor.fetchall():
-            client_id, client_name, total_spent = row
-            self.clients_tree.insert("", "end", values=(client_id, client_name, f"{total_spent:.2f} руб."))
+        top_clients = self.fetch_client_totals(10)
         
         # Отдельный запрос для клиентов без бронирований
-        cursor.execute("""
+        manual_clients = db.fetchall("""
             SELECT 
                 c.id as client_id,
                 c.name as client_name,
                 SUM(f.amount) as total_spent
             FROM Finances f
-            JOIN Clients c ON f.description LIKE '%Ручное добавление клиента ID:' || c.id || '%'
-            WHERE f.type='income'
+            JOIN Clients c ON c.id = f.client_id
+            WHERE f.type='income' AND f.payment_id IS NULL
             AND NOT EXISTS (
-                SELECT 1 FROM Reservations r WHERE r.client_id = c.id
+                SELECT 1 FROM BookingGuests g WHERE g.client_id = c.id
             )
             GROUP BY c.id
             HAVING total_spent > 0
             ORDER BY total_spent DESC
         """)
+        return top_clients, manual_clients
+
+    def display_top_clients(self, report):
+        top_clients, manual_clients = report
+        
+        # Клиенты из основного запроса
+        self.display_client_totals(top_clients)
         
         # Добавляем клиентов без бронирований, но с ручными платежами
-        for row in cursor.fetchall():
+        for row in manual_clients:
             client_id, client_name, total_spent = row
             # проверка, нет ли уже этого клиента в таблице
             if not any(self.clients_tree.item(item)['values'][0] == client_id for item in self.clients_tree.get_children()):
                 self.clients_tree.insert("", "end", values=(client_id, client_name, f"{total_spent:.2f} руб."))
-        
-        conn.close()
 
     # Поиск номеров в отчете
     def search_rooms_report(self):
@@ -3506,45 +3684,25 @@ class Report(ttk.Frame):
             self.generate_top_rooms_report()
             return
             
-        # Получаем все данные
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT r.id, r.room_number, SUM(p.amount) as total_income
-            FROM Rooms r
-            JOIN Reservations res ON r.id = res.room_id
-            JOIN Payments p ON res.id = p.reservation_id
-            WHERE res.client_id != 1  -- Исключаем тестовые бронирования
-            GROUP BY r.id
-            ORDER BY total_income DESC
-        """)
-        
-        all_rooms = cursor.fetchall()
-        conn.close()
-        
-        # Фильтруем результаты
-        filtered_rooms = []
-        for row in all_rooms:
-            room_id, room_number, total_income = row
-            
-            if search_field == "Номер" and search_text in room_number.lower():
-                filtered_rooms.append(row)
-            elif search_field == "Доход":
-                try:
-                    search_amount = float(search_text)
-                    if abs(total_income - search_amount) < 0.01:  # Сравнение с учетом округления
-                        filtered_rooms.append(row)
-                except ValueError:
-                    pass
-        
-        # Обновляем таблицу
-        for row in self.rooms_tree.get_children():
-            self.rooms_tree.delete(row)
+        # Фильтрует все данные по готовности
+        def show(all_rooms):
+            filtered_rooms = []
+            for row in all_rooms:
+                room_id, room_number, total_income = row
+                
+                if search_field == "Номер" and search_text in room_number.lower():
+                    filtered_rooms.append(row)
+                elif search_field == "Доход":
+                    try:
+                        search_amount = float(search_text)
+                        if abs(total_income - search_amount) < 0.01:  # Сравнение с учетом округления
+                            filtered_rooms.append(row)
+                    except ValueError:
+                        pass
+            self.display_room_totals(filtered_rooms)
         
-        for row in filtered_rooms:
-            room_id, room_number, total_income = row
-            self.rooms_tree.insert("", "end", values=(room_id, room_number, f"{total_income:.2f} руб."))
+        self.worker.submit(self.fetch_room_totals, on_done=show, widget=self, key="report.rooms",
+                           timeout=self.REPORT_TIMEOUT)
     
     # Сброс поиска номеров
     def reset_rooms_search(self):
@@ -3553,30 +3711,18 @@ class Report(ttk.Frame):
     
     # Генерирует отчет о лучших номерах (исключая тестовые бронирования)
     def generate_top_rooms_report(self):
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT r.id, r.room_number, SUM(p.amount) as total_income
-            FROM Rooms r
-            JOIN Reservations res ON r.id = res.room_id
-            JOIN Payments p ON res.id = p.reservation_id
-            WHERE res.client_id != 1  -- Исключаем тестовые бронирования
-            GROUP BY r.id
-            ORDER BY total_income DESC
-            LIMIT 10
-        """)
-        
-        # Очищаем таблицу
+        self.worker.submit(self.fetch_room_totals, 10,
+                           on_done=self.display_room_totals, widget=self, key="report.rooms",
+                           timeout=self.REPORT_TIMEOUT)
+    
+    # Заполняет таблицу номеров отчета
+    def display_room_totals(self, rows):
         for row in self.rooms_tree.get_children():
             self.rooms_tree.delete(row)
         
-        # Заполняем данными
-        for row in cursor.fetchall():
+        for row in rows:
             room_id, room_number, total_income = row
             self.rooms_tree.insert("", "end", values=(room_id, room_number, f"{total_income:.2f} руб."))
-        
-        conn.close()
     
     # Окно для добавления клиента в отчет
     def open_add_client_window(self):
@@ -3584,16 +3730,12 @@ class Report(ttk.Frame):
         self.add_client_window.title("Добавить клиента")
         self.add_client_window.geometry("400x200")
         
-        # Получаем список клиентов из базы
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, name FROM Clients ORDER BY name")
-        clients = cursor.fetchall()
-        conn.close()
-        
         ttk.Label(self.add_client_window, text="Клиент:").pack(pady=5)
-        self.client_combobox = ttk.Combobox(self.add_client_window, values=[f"{c[1]} (ID: {c[0]})" for c in clients])
+        self.client_combobox = EntryCombobox(self.add_client_window, search=self.master.client_names.match)
         self.client_combobox.pack(pady=5)
+        # Список клиентов - из индекса ФИО, обновленного в фоне
+        self.worker.submit(self.master.client_names.refresh, on_done=self.client_combobox.refilter,
+                           key="report.client_names")
         
         ttk.Label(self.add_client_window, text="Сумма:").pack(pady=5)
         self.client_amount_entry = ttk.Entry(self.add_client_window)
@@ -3603,15 +3745,15 @@ class Report(ttk.Frame):
     
     # Добавляет клиента в отчет и сразу обновляет список
     def add_client_to_report(self):
-        client_str = self.client_combobox.get()
+        client = self.client_combobox.selected()
         amount = self.client_amount_entry.get()
         
-        if not all([client_str, amount]):
-            messagebox.showerror("Ошибка", "Заполните все поля")
+        if client is None or not amount:
+            messagebox.showerror("Ошибка", "Выберите клиента из списка и укажите сумму")
             return
             
         try:
-            client_id = int(client_str.split("(ID: ")[1][:-1])
+            client_id = client[0]
             amount = float(amount)
             
             if amount <= 0:
@@ -3619,25 +3761,21 @@ class Report(ttk.Frame):
                 return
                 
             # Добавляем платеж в базу
-            conn = sqlite3.connect(get_db_path())
-            cursor = conn.cursor()
-            
-            # 1. Добавляем запись в Finances
-            cursor.execute("""
-                INSERT INTO Finances (type, amount, date, description)
-                VALUES ('income', ?, date('now'), ?)
-            """, (amount, f"Ручное добавление клиента ID: {client_id}"))
+            with db.transaction() as cursor:
+                # 1. Проверяем, что клиент существует
+                cursor.execute("SELECT name FROM Clients WHERE id=?", (client_id,))
+                client_exists = cursor.fetchone() is not None
+                
+                # 2. Добавляем запись в Finances
+                if client_exists:
+                    cursor.execute("""
+                        INSERT INTO Finances (type, amount, date, description, client_id)
+                        VALUES ('income', ?, date('now', 'localtime'), ?, ?)
+                    """, (amount, f"Ручное добавление клиента ID: {client_id}", client_id))
             
-            # 2. Проверяем, что клиент существует
-            cursor.execute("SELECT name FROM Clients WHERE id=?", (client_id,))
-            if not cursor.fetchone():
+            if not client_exists:
                 messagebox.showerror("Ошибка", "Клиент с таким ID не найден")
-                conn.rollback()
-                conn.close()
                 return
-                
-            conn.commit()
-            conn.close()
             
             # 3. Обновляем список клиентов
             self.generate_top_clients_report()
@@ -3650,9 +3788,6 @@ class Report(ttk.Frame):
             messagebox.showerror("Ошибка", "Введите корректные данные (числа)")
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось добавить клиента: {str(e)}")
-            if 'conn' in locals():
-                conn.rollback()
-                conn.close()
 
     # Удаляет клиента из отчета (удаляет связанные платежи)
     def delete_client(self):
@@ -3665,16 +3800,11 @@ class Report(ttk.Frame):
         
         if messagebox.askyesno("Подтверждение", f"Удалить все платежи клиента {client_name} из отчета?"):
             try:
-                conn = sqlite3.connect(get_db_path())
-                cursor = conn.cursor()
-                
-                cursor.execute("""
-                    DELETE FROM Finances 
-                    WHERE description LIKE ? AND type='income'
-                """, (f"%Ручное добавление клиента ID: {client_id}%",))
-                
-                conn.commit()
-                conn.close()
+                with db.transaction() as cursor:
+                    cursor.execute("""
+                        DELETE FROM Finances 
+                        WHERE client_id=? AND payment_id IS NULL AND type='income'
+                    """, (client_id,))
                 
                 self.generate_top_clients_report()
                 messagebox.showinfo("Успех", "Платежи клиента удалены из отчета")
@@ -3682,19 +3812,16 @@ class Report(ttk.Frame):
             except Exception as e:
                 messagebox.showerror("Ошибка", f"Не удалось удалить платежи: {str(e)}")
     
-    # Окно для добавления номера в отчет
+    # Окно для добавления номера в отчет (список номеров загружается в фоне)
     def open_add_room_window(self):
+        self.worker.submit(db.fetchall, "SELECT id, room_number FROM Rooms ORDER BY room_number",
+                           on_done=self.show_add_room_window, widget=self, key="report.room_list")
+    
+    def show_add_room_window(self, rooms):
         self.add_room_window = tk.Toplevel(self)
         self.add_room_window.title("Добавить номер")
         self.add_room_window.geometry("400x200")
         
-        # Получаем список номеров из базы
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, room_number FROM Rooms ORDER BY room_number")
-        rooms = cursor.fetchall()
-        conn.close()
-        
         ttk.Label(self.add_room_window, text="Номер:").pack(pady=5)
         self.room_combobox = ttk.Combobox(self.add_room_window, values=[f"{r[1]} (ID: {r[0]})" for r in rooms])
         self.room_combobox.pack(pady=5)
@@ -3719,16 +3846,11 @@ class Report(ttk.Frame):
             amount = float(amount)
             
             # Добавляем платеж в базу
-            conn = sqlite3.connect(get_db_path())
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                INSERT INTO Finances (type, amount, date, description)
-                VALUES ('income', ?, date('now'), ?)
-            """, (amount, f"Ручное добавление номера ID: {room_id} в отчет"))
-            
-            conn.commit()
-            conn.close()
+            with db.transaction() as cursor:
+                cursor.execute("""
+                    INSERT INTO Finances (type, amount, date, description, room_id)
+                    VALUES ('income', ?, date('now', 'localtime'), ?, ?)
+                """, (amount, f"Ручное добавление номера ID: {room_id} в отчет", room_id))
             
             self.add_room_window.destroy()
             self.generate_top_rooms_report()
@@ -3748,16 +3870,11 @@ class Report(ttk.Frame):
         
         if messagebox.askyesno("Подтверждение", f"Удалить все платежи номера {room_number} из отчета?"):
             try:
-                conn = sqlite3.connect(get_db_path())
-                cursor = conn.cursor()
-                
-                cursor.execute("""
-                    DELETE FROM Finances 
-                    WHERE description LIKE ? AND type='income'
-                """, (f"%Ручное добавление номера ID: {room_id}%",))
-
-                conn.commit()
-                conn.close()
+                with db.transaction() as cursor:
+                    cursor.execute("""
+                        DELETE FROM Finances 
+                        WHERE room_id=? AND payment_id IS NULL AND type='income'
+                    """, (room_id,))
                 
                 self.generate_top_rooms_report()
                 messagebox.showinfo("Успех", "Платежи номера удалены из отчета")
@@ -3800,58 +3917,74 @@ class Report(ttk.Frame):
         if not file_path:  # Пользователь отменил сохранение
             return
         
-        try:
-            wb = openpyxl.Workbook()
-            ws = wb.active
-            ws.title = report_type
-            
-            # Добавляем заголовки
-            ws.append(headers)
-            
-            # Добавляем данные
-            for row in data:
-                ws.append(row)
-            
-            # итоговые суммы для финансового отчета
-            if report_type == "Финансы":
-                # Рассчитываем суммы
-                total_income = sum(float(row[2].split()[0]) for row in data if row[1] == "Доход")
-                total_expense = sum(float(row[2].split()[0]) for row in data if row[1] == "Расход")
-                profit = total_income - total_expense
-                
-                # Добавляем итоги
-                ws.append([])  # Пустая строка
-                ws.append(["Общий доход:", f"{total_income:.2f} руб."])
-                ws.append(["Общий расход:", f"{total_expense:.2f} руб."])
-                ws.append(["Прибыль:", f"{profit:.2f} руб."])
-            
-            # Настраиваем стиль
-            header_font = openpyxl.styles.Font(bold=True)
-            for cell in ws[1]:
-                cell.font = header_font
-            
-            # Автоматическая ширина столбцов
-            for column in ws.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = (max_length + 2)
-                ws.column_dimensions[column_letter].width = adjusted_width
-            
-            # Добавляем текущую дату и время
-            now = datetime.now().strftime("%d.%m.%Y %H:%M")
-            ws.cell(row=ws.max_row+2, column=1, value=f"Отчет сгенерирован {now}")
-            
-            wb.save(file_path)
-            messagebox.showinfo("Успех", f"Отчет успешно сохранен в файл:\n{file_path}")
-        except Exception as e:
+        # Файл формируется и сохраняется в фоне
+        self.worker.submit(
+            self.write_excel, file_path, report_type, headers, data,
+            on_done=lambda _: messagebox.showinfo("Успех", f"Отчет успешно сохранен в файл:\n{file_path}"),
+            on_error=self.export_failed,
+            widget=self)
+
+    # Ошибка экспорта; об отсутствии библиотеки и отмене сообщается отдельно
+    def export_failed(self, e):
+        if isinstance(e, QueryCancelled):
+            messagebox.showinfo("Экспорт", "Экспорт отменен, файл не сохранен")
+        elif isinstance(e, optional.MissingDependency):
+            messagebox.showerror("Ошибка", str(e))
+        else:
             messagebox.showerror("Ошибка", f"Не удалось сохранить файл: {str(e)}")
 
+    # Формирование и сохранение файла Excel (выполняется в фоне)
+    def write_excel(self, file_path, report_type, headers, data):
+        openpyxl = optional.openpyxl()
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.title = report_type
+        
+        # Добавляем заголовки
+        ws.append(headers)
+        
+        # Добавляем данные
+        for row in data:
+            db.check()
+            ws.append(row)
+        
+        # итоговые суммы для финансового отчета
+        if report_type == "Финансы":
+            # Рассчитываем суммы
+            total_income = sum(float(row[2].split()[0]) for row in data if row[1] == "Доход")
+            total_expense = sum(float(row[2].split()[0]) for row in data if row[1] == "Расход")
+            profit = total_income - total_expense
+            
+            # Добавляем итоги
+            ws.append([])  # Пустая строка
+            ws.append(["Общий доход:", f"{total_income:.2f} руб."])
+            ws.append(["Общий расход:", f"{total_expense:.2f} руб."])
+            ws.append(["Прибыль:", f"{profit:.2f} руб."])
+        
+        # Настраиваем стиль
+        header_font = openpyxl.styles.Font(bold=True)
+        for cell in ws[1]:
+            cell.font = header_font
+        
+        # Автоматическая ширина столбцов
+        for column in ws.columns:
+            max_length = 0
+            column_letter = column[0].column_letter
+            for cell in column:
+                try:
+                    if len(str(cell.value)) > max_length:
+                        max_length = len(str(cell.value))
+                except:
+                    pass
+            adjusted_width = (max_length + 2)
+            ws.column_dimensions[column_letter].width = adjusted_width
+        
+        # Добавляем текущую дату и время
+        now = datetime.now().strftime("%d.%m.%Y %H:%M")
+        ws.cell(row=ws.max_row+2, column=1, value=f"Отчет сгенерирован {now}")
+        
+        wb.save(file_path)
+
     # Экспортирует отчет в Word
     def export_to_word(self, report_type):
         if report_type == "Финансы":
@@ -3878,50 +4011,53 @@ class Report(ttk.Frame):
         if not file_path: 
             return
         
-        try:
-            from docx import Document
-            from docx.shared import Pt
-            
-            doc = Document()
-            
-            # Добавляем заголовок
-            doc.add_heading(f'Отчет: {report_type}', level=1)
-            
-            # Добавляем таблицу
-            table = doc.add_table(rows=1, cols=len(headers))
-            hdr_cells = table.rows[0].cells
-            for i, header in enumerate(headers):
-                hdr_cells[i].text = header
-            
-            # Добавляем данные
-            for row in data:
-                row_cells = table.add_row().cells
-                for i, value in enumerate(row[1:] if report_type != "Финансы" else row):  # Для финансов показываем все колонки
-                    row_cells[i].text = str(value)
-            
-            # Добавляем итоговые суммы для финансового отчета
-            if report_type == "Финансы":
-                # Рассчитываем суммы
-                total_income = sum(float(row[2].split()[0]) for row in data if row[1] == "Доход")
-                total_expense = sum(float(row[2].split()[0]) for row in data if row[1] == "Расход")
-                profit = total_income - total_expense
-                
-                # Добавляем итоги
-                doc.add_paragraph()
-                doc.add_paragraph(f"Общий доход: {total_income:.2f} руб.")
-                doc.add_paragraph(f"Общий расход: {total_expense:.2f} руб.")
-                doc.add_paragraph(f"Прибыль: {profit:.2f} руб.")
-            
-            # Добавляем дату и время
-            now = datetime.now().strftime("%d.%m.%Y %H:%M")
-            doc.add_paragraph(f"Отчет сгенерирован {now}")
+        # Файл формируется и сохраняется в фоне
+        self.worker.submit(
+            self.write_word, file_path, report_type, headers, data,
+            on_done=lambda _: messagebox.showinfo("Успех", f"Отчет успешно сохранен в файл:\n{file_path}"),
+            on_error=self.export_failed,
+            widget=self)
+
+    # Формирование и сохранение документа Word (выполняется в фоне)
+    def write_word(self, file_path, report_type, headers, data):
+        docx = optional.docx()
+        
+        doc = docx.Document()
+        
+        # Добавляем заголовок
+        doc.add_heading(f'Отчет: {report_type}', level=1)
+        
+        # Добавляем таблицу
+        table = doc.add_table(rows=1, cols=len(headers))
+        hdr_cells = table.rows[0].cells
+        for i, header in enumerate(headers):
+            hdr_cells[i].text = header
+        
+        # Добавляем данные
+        for row in data:
+            db.check()
+            row_cells = table.add_row().cells
+            for i, value in enumerate(row[1:] if report_type != "Финансы" else row):  # Для финансов показываем все колонки
+                row_cells[i].text = str(value)
+        
+        # Добавляем итоговые суммы для финансового отчета
+        if report_type == "Финансы":
+            # Рассчитываем суммы
+            total_income = sum(float(row[2].split()[0]) for row in data if row[1] == "Доход")
+            total_expense = sum(float(row[2].split()[0]) for row in data if row[1] == "Расход")
+            profit = total_income - total_expense
             
-            doc.save(file_path)
-            messagebox.showinfo("Успех", f"Отчет успешно сохранен в файл:\n{file_path}")
-        except ImportError:
-            messagebox.showerror("Ошибка", "Для экспорта в Word требуется установить библиотеку python-docx")
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Не удалось сохранить файл: {str(e)}")
+            # Добавляем итоги
+            doc.add_paragraph()
+            doc.add_paragraph(f"Общий доход: {total_income:.2f} руб.")
+            doc.add_paragraph(f"Общий расход: {total_expense:.2f} руб.")
+            doc.add_paragraph(f"Прибыль: {profit:.2f} руб.")
+        
+        # Добавляем дату и время
+        now = datetime.now().strftime("%d.%m.%Y %H:%M")
+        doc.add_paragraph(f"Отчет сгенерирован {now}")
+        
+        doc.save(file_path)
 
 # --- Класс, описывающий создание фрейма ОПЛАТА ---
 class Payment(ttk.Frame):
@@ -3930,6 +4066,8 @@ class Payment(ttk.Frame):
         testLbl = ttk.Label(self)
         testLbl.pack(expand=True, fill='both')
         self.place(relx=0.3, y=0, relwidth=0.7, relheight=1)
+        self.worker = parent.worker
+        self.reservations = []
         self.create_widgets()
         self.fetch_clients()
         self.fetch_reservations()
@@ -3941,7 +4079,7 @@ class Payment(ttk.Frame):
         
         # Выбор клиента
         ttk.Label(main_frame, text="Клиент:").grid(row=0, column=0, padx=5, pady=5, sticky='e')
-        self.client_combobox = ttk.Combobox(main_frame, state='readonly')
+        self.client_combobox = EntryCombobox(main_frame, search=self.master.client_names.match)
         self.client_combobox.grid(row=0, column=1, padx=5, pady=5, sticky='ew')
         self.client_combobox.bind('<<ComboboxSelected>>', self.update_reservations)
         
@@ -3983,42 +4121,38 @@ class Payment(ttk.Frame):
         main_frame.columnconfigure(1, weight=1)
         self.reservation_info.columnconfigure(1, weight=1)
 
+    # Список выбора клиента - первые совпадения из индекса ФИО (поиск при вводе)
     def fetch_clients(self):
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, name FROM Clients ORDER BY name")
-        self.clients = cursor.fetchall()
-        self.client_combobox['values'] = [f"{c[1]} (ID: {c[0]})" for c in self.clients]
-        conn.close()
+        self.worker.submit(self.master.client_names.refresh,
+                           on_done=self.client_combobox.refilter, widget=self, key="payment.clients")
 
+    # Неоплаченные и текущие брони; список броней клиента строится из них при выборе клиента
     def fetch_reservations(self):
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT r.id, r.client_id, r.room_id, rm.room_number, 
-                   r.checkin_date, r.checkout_date, r.total_price
-            FROM Reservations r
-            JOIN Rooms rm ON r.room_id = rm.id
-            WHERE r.checkout_date >= date('now')
-            ORDER BY r.checkin_date
-        """)
-        self.reservations = cursor.fetchall()
-        conn.close()
+        self.worker.submit(db.fetchall, """
+            SELECT b.id, g.client_id, b.room_id, rm.room_number, 
+                   b.checkin_date, b.checkout_date, b.total_price
+            FROM Bookings b
+            JOIN BookingGuests g ON g.booking_id = b.id
+            JOIN Rooms rm ON b.room_id = rm.id
+            WHERE b.checkout_date >= date('now', 'localtime')
+            ORDER BY b.checkin_date
+        """, on_done=self.set_reservations, widget=self, key="payment.reservations")
+
+    def set_reservations(self, reservations):
+        self.reservations = reservations
 
     def update_reservations(self, event):
-        if not self.client_combobox.get():
+        client = self.client_combobox.selected()
+        if client is None:
             return
-            
-        # Получаем ID клиента
-        client_str = self.client_combobox.get()
-        client_id = int(client_str.split("(ID: ")[1][:-1])
+        client_id = client[0]
         
         # Фильтруем бронирования для этого клиента
         client_reservations = [r for r in self.reservations if r[1] == client_id]
         
         # Обновляем комбобокс бронирований
         self.reservation_combobox['values'] = [
-            f"№{r[3]} с {r[4]} по {r[5]} (ID: {r[0]})" 
+            f"№{r[3]} с {to_ui(r[4])} по {to_ui(r[5])} (ID: {r[0]})" 
             for r in client_reservations
         ]
         
@@ -4040,7 +4174,7 @@ class Payment(ttk.Frame):
         
         # Обновляем информацию
         self.room_label.config(text=f"{reservation[3]} (ID: {reservation[2]})")
-        self.dates_label.config(text=f"{reservation[4]} - {reservation[5]}")
+        self.dates_label.config(text=f"{to_ui(reservation[4])} - {to_ui(reservation[5])}")
         self.amount_label.config(text=f"{reservation[6]:.2f} руб.")
         self.payment_entry.delete(0, tk.END)
         self.payment_entry.insert(0, str(reservation[6]))
@@ -4053,12 +4187,8 @@ class Payment(ttk.Frame):
         reservation_id = self.reservations_tree.item(self.selected_reservation)['values'][0]
         
         # Проверяем, не оплачена ли уже бронь
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        cursor.execute("SELECT 1 FROM Payments WHERE reservation_id=?", (reservation_id,))
-        if cursor.fetchone():
+        if db.fetchone("SELECT 1 FROM Payments WHERE booking_id=?", (reservation_id,)):
             messagebox.showwarning("Предупреждение", "Это бронирование уже оплачено")
-            conn.close()
             return
 
     def generate_receipt(self):
@@ -4074,9 +4204,14 @@ class Payment(ttk.Frame):
             messagebox.showerror("Ошибка", "Введите корректную сумму")
             return
             
-        # Получаем ID бронирования
+        # Получаем ID бронирования и плательщика
         res_str = self.reservation_combobox.get()
         res_id = int(res_str.split("(ID: ")[1][:-1])
+        client = self.client_combobox.selected()
+        if client is None:
+            messagebox.showerror("Ошибка", "Выберите клиента из списка")
+            return
+        client_id = client[0]
         
         # Получаем данные бронирования
         reservation = next(r for r in self.reservations if r[0] == res_id)
@@ -4087,7 +4222,7 @@ class Payment(ttk.Frame):
         ----------------------------
         Клиент: {self.client_combobox.get()}
         Номер: {reservation[3]}
-        Период: {reservation[4]} - {reservation[5]}
+        Период: {to_ui(reservation[4])} - {to_ui(reservation[5])}
         Сумма к оплате: {reservation[6]:.2f} руб.
         Оплачено: {amount:.2f} руб.
         Дата оплаты: {datetime.now().strftime("%d.%m.%Y %H:%M")}
@@ -4099,29 +4234,27 @@ class Payment(ttk.Frame):
         
         # Записываем платеж в базу данных
         try:
-            conn = sqlite3.connect(get_db_path())
-            cursor = conn.cursor()
-            
-            # Добавляем платеж
-            cursor.execute("""
-                INSERT INTO Payments (reservation_id, amount, payment_date)
-                VALUES (?, ?, ?)
-            """, (res_id, amount, datetime.now().strftime("%Y-%m-%d")))
-            
-            # Добавляем доход в таблицу Finances
-            cursor.execute("""
-                INSERT INTO Finances (type, amount, date, description)
-                VALUES (?, ?, ?, ?)
-            """, ("income", amount, datetime.now().strftime("%Y-%m-%d"), 
-                f"Оплата бронирования №{res_id}"))
-            
-            conn.commit()
-            conn.close()
+            with db.transaction() as cursor:
+                # Добавляем платеж
+                cursor.execute("""
+                    INSERT INTO Payments (booking_id, client_id, amount, payment_date)
+                    VALUES (?, ?, ?, ?)
+                """, (res_id, client_id, amount, today_db()))
+                payment_id = cursor.lastrowid
+                
+                # Добавляем доход в таблицу Finances со ссылками на платеж, бронь, клиента и номер
+                cursor.execute("""
+                    INSERT INTO Finances (type, amount, date, description, 
+                                          payment_id, booking_id, client_id, room_id)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, ("income", amount, today_db(), 
+                    f"Оплата бронирования №{res_id}", payment_id, res_id, client_id, reservation[2]))
             
             messagebox.showinfo("Успех", "Платеж успешно зарегистрирован")
             
-            # Обновляем отчеты
-            self.master.report.generate_finance_report()
+            # Обновляем отчеты, если они уже открывались
+            if "report" in self.master.frames:
+                self.master.frames["report"].generate_finance_report()
             
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось сохранить платеж: {str(e)}")
@@ -4143,9 +4276,8 @@ class AdminPanel(ttk.Frame):
         testLbl = ttk.Label(self, background='#35A7FF')
         testLbl.pack(expand=True, fill='both')
         self.place(relx=0.3, y=0, relwidth=0.7, relheight=1)
+        self.worker = parent.worker
         self.create_widgets()
-        self.backup_running = False
-        self.start_backup_scheduler()
         
     def create_widgets(self):
         # Основной контейнер
@@ -4169,10 +4301,11 @@ class AdminPanel(ttk.Frame):
     def create_users_tab(self):
         # Таблица пользователей
         # Таблица пользователей
-        self.users_tree = ttk.Treeview(
+        self.users_tree = VirtualTreeview(
             self.users_tab, 
             columns=("ID", "Логин"), 
-            show="headings"
+            show="headings",
+            key=lambda row: row[0]
         )
         self.users_tree.heading("ID", text="ID")
         self.users_tree.heading("Логин", text="Логин")
@@ -4195,20 +4328,11 @@ class AdminPanel(ttk.Frame):
     
     # Загружает список пользователей из базы данных
     def load_users(self):
-        conn = sqlite3.connect(get_db_path())
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT id, name FROM Users ORDER BY id")
-        users = cursor.fetchall()
-        conn.close()
-        
-        # Очищаем таблицу
-        for row in self.users_tree.get_children():
-            self.users_tree.delete(row)
-        
-        # Заполняем данными
-        for user in users:
-            self.users_tree.insert("", "end", values=user)
+        self.worker.submit(db.fetchall, "SELECT id, name FROM Users ORDER BY id",
+                           on_done=self.display_users, widget=self, key="admin.users")
+    
+    def display_users(self, users):
+        self.users_tree.set_rows(users)
     
     # Открывает окно для добавления нового пользователя
     def open_add_user_window(self):
@@ -4236,28 +4360,25 @@ class AdminPanel(ttk.Frame):
             return
             
         try:
-            conn = sqlite3.connect(get_db_path())
-            cursor = conn.cursor()
+            with db.transaction() as cursor:
+                # Проверяем, существует ли уже пользователь с таким логином
+                cursor.execute("SELECT id FROM Users WHERE name=?", (username,))
+                user_exists = cursor.fetchone() is not None
+                
+                # Добавляем нового пользователя
+                if not user_exists:
+                    cursor.execute("INSERT INTO Users (name, password) VALUES (?, ?)", (username, password))
             
-            # Проверяем, существует ли уже пользователь с таким логином
-            cursor.execute("SELECT id FROM Users WHERE name=?", (username,))
-            if cursor.fetchone():
+            if user_exists:
                 messagebox.showerror("Ошибка", "Пользователь с таким логином уже существует")
                 return
             
-            # Добавляем нового пользователя
-            cursor.execute("INSERT INTO Users (name, password) VALUES (?, ?)", (username, password))
-            conn.commit()
-            
             messagebox.showinfo("Успех", "Пользователь успешно добавлен")
             self.add_user_window.destroy()
             self.load_users()
             
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось добавить пользователя: {str(e)}")
-        finally:
-            if 'conn' in locals():
-                conn.close()
     
     # Открывает окно для изменения пароля пользователя
     def open_change_password_window(self):
@@ -4303,20 +4424,14 @@ class AdminPanel(ttk.Frame):
             return
             
         try:
-            conn = sqlite3.connect(get_db_path())
-            cursor = conn.cursor()
-            
-            cursor.execute("UPDATE Users SET password=? WHERE id=?", (new_pass, self.changing_user_id))
-            conn.commit()
+            with db.transaction() as cursor:
+                cursor.execute("UPDATE Users SET password=? WHERE id=?", (new_pass, self.changing_user_id))
             
             messagebox.showinfo("Успех", "Пароль успешно изменен")
             self.change_pass_window.destroy()
             
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось изменить пароль: {str(e)}")
-        finally:
-            if 'conn' in locals():
-                conn.close()
     
     # Удаляет выбранного пользователя
     def delete_user(self):
@@ -4336,20 +4451,14 @@ class AdminPanel(ttk.Frame):
             return
             
         try:
-            conn = sqlite3.connect(get_db_path())
-            cursor = conn.cursor()
-            
-            cursor.execute("DELETE FROM Users WHERE id=?", (user_id,))
-            conn.commit()
+            with db.transaction() as cursor:
+                cursor.execute("DELETE FROM Users WHERE id=?", (user_id,))
             
             messagebox.showinfo("Успех", "Пользователь успешно удален")
             self.load_users()
             
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось удалить пользователя: {str(e)}")
-        finally:
-            if 'conn' in locals():
-                conn.close()
     
     def create_backup_tab(self):
         # Информация о последнем бэкапе
@@ -4387,12 +4496,6 @@ class AdminPanel(ttk.Frame):
         # Загружаем историю бэкапов
         self.load_backup_history()
     
-    # Запускает планировщик автоматического резервного копирования
-    def start_backup_scheduler(self):
-        if not self.backup_running:
-            self.backup_running = True
-            self.schedule_backup()
-    
     # Планирует следующее резервное копирование
     def schedule_backup(self):
         # Запускаем бэкап через час (3600000 мс)
@@ -4401,33 +4504,30 @@ class AdminPanel(ttk.Frame):
         
     # Создает автоматическую резервную копию
     def create_backup_auto(self):
-        try:
-            self.backup_status_label.config(text="Статус: создание резервной копии...")
-            self.update()
-            
-            backup_dir = "D:/backups"
-            if not os.path.exists(backup_dir):
-                os.makedirs(backup_dir)
-            
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_path = os.path.join(backup_dir, f"hotel_backup_{timestamp}.db")
-            
-            if self.backup_database('hotel.db', backup_path):
-                self.last_backup_label.config(text=f"Последнее резервное копирование: {datetime.now().strftime('%d.%m.%Y %H:%M:%S')}")
-                self.backup_status_label.config(text="Статус: успешно завершено")
-                self.backup_tree.insert("", "end", values=(
-                    datetime.now().strftime("%d.%m.%Y %H:%M:%S"),
-                    backup_path,
-                    "Успешно"
-                ))
-            else:
-                raise Exception("Не удалось создать резервную копию")
-                
-            self.schedule_backup()
-            
-        except Exception as e:
-            self.backup_status_label.config(text=f"Статус: ошибка ({str(e)}), повтор через 2 минуты")
-            self.after(120000, self.create_backup_auto)
+        self.backup_status_label.config(text="Статус: создание резервной копии...")
+        
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        backup_path = os.path.join("D:/backups", f"hotel_backup_{timestamp}.db")
+        
+        self.worker.submit(self.backup_database, get_db_path(), backup_path,
+                           on_done=lambda _: self.backup_auto_done(backup_path),
+                           on_error=self.backup_auto_failed, widget=self)
+    
+    def backup_auto_done(self, backup_path):
+        self.last_backup_label.config(text=f"Последнее резервное копирование: {datetime.now().strftime('%d.%m.%Y %H:%M:%S')}")
+        self.backup_status_label.config(text="Статус: успешно завершено")
+        self.backup_tree.insert("", "end", values=(
+            datetime.now().strftime("%d.%m.%Y %H:%M:%S"),
+            backup_path,
+            "Успешно"
+        ))
+        messagebox.showinfo("Успех", f"Резервная копия успешно создана:\n{backup_path}")
+        self.schedule_backup()
+    
+    def backup_auto_failed(self, e):
+        messagebox.showerror("Ошибка", f"Не удалось создать резервную копию:\n{str(e)}")
+        self.backup_status_label.config(text=f"Статус: ошибка ({str(e)}), повтор через 2 минуты")
+        self.after(120000, self.create_backup_auto)
     
     # Проверяет, является ли файл валидной SQLite базой 
     def is_valid_backup(self, file_path):
@@ -4440,97 +4540,85 @@ class AdminPanel(ttk.Frame):
             return False
     
     def create_backup_manual(self):
-        try:
-            # Обновляем статус в интерфейсе
-            self.backup_status_label.config(text="Статус: создание резервной копии...")
-            self.update()  # Принудительно обновляем интерфейс
-            
-            # Создаем папку для бэкапов, если ее нет
-            backup_dir = "D:/backups"
-            if not os.path.exists(backup_dir):
-                os.makedirs(backup_dir)
-            
-            # Формируем имя файла с датой и временем
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_path = os.path.join(backup_dir, f"hotel_manual_backup_{timestamp}.db")
-            
-            # Подключаемся к исходной и целевой базам
-            source_conn = sqlite3.connect(get_db_path())
-            target_conn = sqlite3.connect(backup_path)
-            
-            # Выполняем резервное копирование
-            source_conn.backup(target_conn)
-            
-            # Закрываем соединения
-            source_conn.close()
-            target_conn.close()
-            
-            # Обновляем интерфейс
-            self.last_backup_label.config(
-                text=f"Последнее резервное копирование: {datetime.now().strftime('%d.%m.%Y %H:%M:%S')}"
-            )
-            #self.backup_status_label.config(text="Статус: успешно завершено")
-            
-            is_valid = self.is_valid_backup(backup_path)
-            status = "Успешно (ручной)" if is_valid else "Ошибка (ручной)"
-            
-            self.backup_tree.insert("", "end", values=(
-                datetime.now().strftime("%d.%m.%Y %H:%M:%S"),
-                backup_path,
-                status
-            ))
-            
-            messagebox.showinfo(
-                "Успех", 
-                f"Резервная копия успешно создана:\n{backup_path}"
-            )
-            
-            
-            
-        except Exception as e:
-            # В случае ошибки сразу пишем "Ошибка"
-            self.backup_tree.insert("", "end", values=(
-                datetime.now().strftime("%d.%m.%Y %H:%M:%S"),
-                backup_path,
-                "Ошибка (ручной)"
-            ))
-            
-            # Если соединения были открыты - закрываем их
-            if 'target_conn' in locals():
-                target_conn.close()
-            if 'source_conn' in locals():
-                source_conn.close()
+        # Обновляем статус в интерфейсе; копирование идет в фоне
+        self.backup_status_label.config(text="Статус: создание резервной копии...")
+        
+        # Формируем имя файла с датой и временем
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        backup_path = os.path.join("D:/backups", f"hotel_manual_backup_{timestamp}.db")
+        
+        self.worker.submit(self.backup_manual, backup_path,
+                           on_done=lambda is_valid: self.backup_manual_done(backup_path, is_valid),
+                           on_error=lambda e: self.backup_manual_failed(backup_path),
+                           widget=self)
+    
+    # Копирование рабочей бд и проверка копии (выполняется в фоне)
+    def backup_manual(self, backup_path):
+        self.backup_database(get_db_path(), backup_path)
+        return self.is_valid_backup(backup_path)
     
+    def backup_manual_done(self, backup_path, is_valid):
+        # Обновляем интерфейс
+        self.last_backup_label.config(
+            text=f"Последнее резервное копирование: {datetime.now().strftime('%d.%m.%Y %H:%M:%S')}"
+        )
+        
+        status = "Успешно (ручной)" if is_valid else "Ошибка (ручной)"
+        
+        self.backup_tree.insert("", "end", values=(
+            datetime.now().strftime("%d.%m.%Y %H:%M:%S"),
+            backup_path,
+            status
+        ))
+        
+        messagebox.showinfo(
+            "Успех", 
+            f"Резервная копия успешно создана:\n{backup_path}"
+        )
+    
+    def backup_manual_failed(self, backup_path):
+        # В случае ошибки сразу пишем "Ошибка"
+        self.backup_tree.insert("", "end", values=(
+            datetime.now().strftime("%d.%m.%Y %H:%M:%S"),
+            backup_path,
+            "Ошибка (ручной)"
+        ))
+    
+    # Копирование бд в файл target_db; папка для бэкапов создается при необходимости.
+    # Выполняется в фоновом потоке, поэтому ошибки не показываются здесь,
+    # а передаются вызывающему коду.
     def backup_database(self, source_db, target_db):
-        try:
-            
+        os.makedirs(os.path.dirname(target_db), exist_ok=True)
+        
+        # Для рабочей базы используется соединение бд текущего потока
+        if source_db == db.path:
+            source_conn = db.connection()
+        else:
             source_conn = sqlite3.connect(source_db)
-            target_conn = sqlite3.connect(target_db)
+        target_conn = sqlite3.connect(target_db)
+        try:
             source_conn.backup(target_conn)
-            
-            messagebox.showinfo("Успех", f"Резервная копия успешно создана:\n{target_db}")
-            return True
-            
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Не удалось создать резервную копию:\n{str(e)}")
-            return False
-            
         finally:
             # закрываем соединения
-            if 'target_conn' in locals():
-                target_conn.close()
-            if 'source_conn' in locals():
+            target_conn.close()
+            if source_conn is not db.connection():
                 source_conn.close()
     
     # Загружает историю резервных копий
     def load_backup_history(self):
+        self.worker.submit(self.fetch_backup_history,
+                           on_done=self.display_backup_history, widget=self, key="admin.backups")
+    
+    # Список последних бэкапов с проверкой целостности (выполняется в фоне)
+    def fetch_backup_history(self):
         backup_dir = "D:/backups"
         if not os.path.exists(backup_dir):
-            return
+            return []
             
         backup_files = glob.glob(os.path.join(backup_dir, "hotel_*.db"))
         backup_files.sort(key=os.path.getmtime, reverse=True)
         
+        history = []
         for file_path in backup_files[:20]:  # Первые 20 файлов
             mtime = os.path.getmtime(file_path)
             date_str = datetime.fromtimestamp(mtime).strftime("%d.%m.%Y %H:%M:%S")
@@ -4547,7 +4635,12 @@ class AdminPanel(ttk.Frame):
             else:
                 status = "Успешно (авто)" if is_valid else "Ошибка (авто)"
             
-            self.backup_tree.insert("", "end", values=(date_str, file_path, status))
+            history.append((date_str, file_path, status))
+        return history
+    
+    def display_backup_history(self, history):
+        for values in history:
+            self.backup_tree.insert("", "end", values=values)
 
 # --- Класс, описывающий создание фрейма О ПРОГРАММЕ ---
 class About(ttk.Frame):
@@ -4579,6 +4672,22 @@ class About(ttk.Frame):
                  justify='center').pack()
         
 
+# Фреймы разделов по именам, создаются App.frame() при первом открытии
+FRAMES = {
+    "login": Login,
+    "clients": Clients,
+    "rent": Rent,
+    "room": Room,
+    "spravka": Spravka,
+    "report": Report,
+    "payment": Payment,
+    "admin": AdminPanel,
+    "about": About,
+}
+
+
 # Создание экземпляра класса
 if __name__ == "__main__":
+    logging.basicConfig(format="%(message)s",
+                        level=logging.DEBUG if os.environ.get("HOTEL_DEBUG") else logging.WARNING)
     App('АРМ Космос', (1200, 800))
\ No newline at end of file
@@ -0,0 +1,712 @@
+import sqlite3
+
+from dates import normalize
+import contacts
+
+
+# --- Ошибка применения миграций ---
+class MigrationError(Exception):
+    pass
+
+
+# Выполнение SQL-скрипта по одной инструкции.
+# executescript() не подходит: он фиксирует открытую транзакцию.
+def _run_script(cursor, script):
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            cursor.execute(statement)
+            statement = ""
+    if statement.strip():
+        cursor.execute(statement)
+
+
+# --- Миграция 1: исходная схема бд и индексы под частые условия выборок ---
+def _m001_baseline(cursor):
+    _run_script(cursor, """
+        CREATE TABLE IF NOT EXISTS "Users" (
+            "id"	INTEGER,
+            "name"	TEXT,
+            "password"	TEXT,
+            PRIMARY KEY("id" AUTOINCREMENT)
+        );
+        CREATE TABLE IF NOT EXISTS "Clients" (
+            "id"	INTEGER UNIQUE,
+            "name"	TEXT,
+            "contact"	INTEGER,
+            "passport"	INTEGER,
+            "birthdate"	TEXT,
+            PRIMARY KEY("id" AUTOINCREMENT)
+        );
+        CREATE TABLE IF NOT EXISTS "RoomClasses" (
+            "id"	INTEGER,
+            "class_name"	TEXT NOT NULL,
+            "description"	TEXT,
+            PRIMARY KEY("id" AUTOINCREMENT)
+        );
+        CREATE TABLE IF NOT EXISTS "Buildings" (
+            "id"	INTEGER,
+            "building_name"	TEXT NOT NULL,
+            "description"	TEXT,
+            PRIMARY KEY("id" AUTOINCREMENT)
+        );
+        CREATE TABLE IF NOT EXISTS "Rooms" (
+            "id"	INTEGER,
+            "room_number"	TEXT NOT NULL,
+            "places"	INTEGER NOT NULL,
+            "class_id"	INTEGER NOT NULL,
+            "price"	INTEGER NOT NULL,
+            "floor"	INTEGER NOT NULL,
+            "building_id"	INTEGER NOT NULL, status TEXT DEFAULT 'Свободен',
+            PRIMARY KEY("id" AUTOINCREMENT),
+            FOREIGN KEY("building_id") REFERENCES "Buildings"("id"),
+            FOREIGN KEY("class_id") REFERENCES "RoomClasses"("id")
+        );
+        CREATE TABLE IF NOT EXISTS "RoomOptionsList" (
+            "id"	INTEGER,
+            "option_name"	TEXT NOT NULL UNIQUE,
+            PRIMARY KEY("id" AUTOINCREMENT)
+        );
+        CREATE TABLE IF NOT EXISTS RoomOptions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            room_id INTEGER NOT NULL,
+            option_name TEXT NOT NULL,
+            FOREIGN KEY (room_id) REFERENCES Rooms(id),
+            UNIQUE (room_id, option_name)
+        );
+        CREATE TABLE IF NOT EXISTS "Reservations" (
+            "id"	INTEGER,
+            "room_id"	INTEGER NOT NULL,
+            "client_id"	INTEGER NOT NULL,
+            "checkin_date"	TEXT NOT NULL,
+            "checkout_date"	TEXT NOT NULL,
+            "total_price"	INTEGER NOT NULL,
+            PRIMARY KEY("id" AUTOINCREMENT),
+            FOREIGN KEY("client_id") REFERENCES "Clients"("id"),
+            FOREIGN KEY("room_id") REFERENCES "Rooms"("id")
+        );
+        CREATE TABLE IF NOT EXISTS Finances (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            type TEXT NOT NULL CHECK (type IN ('income', 'expense')),
+            amount REAL NOT NULL CHECK (amount > 0),
+            date TEXT NOT NULL,
+            description TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE IF NOT EXISTS Blacklist (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            client_id INTEGER NOT NULL,
+            reason TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (client_id) REFERENCES Clients(id) ON DELETE CASCADE
+        );
+        CREATE TABLE IF NOT EXISTS Payments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            reservation_id INTEGER NOT NULL,
+            amount REAL NOT NULL,
+            payment_date TEXT NOT NULL,
+            FOREIGN KEY (reservation_id) REFERENCES Reservations(id)
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_reservations_room_dates
+            ON Reservations(room_id, checkin_date, checkout_date);
+        CREATE INDEX IF NOT EXISTS idx_reservations_client ON Reservations(client_id);
+        CREATE INDEX IF NOT EXISTS idx_payments_reservation ON Payments(reservation_id);
+        CREATE INDEX IF NOT EXISTS idx_blacklist_client ON Blacklist(client_id);
+        CREATE INDEX IF NOT EXISTS idx_clients_passport ON Clients(passport);
+        CREATE INDEX IF NOT EXISTS idx_finances_type_date ON Finances(type, date);
+        CREATE INDEX IF NOT EXISTS idx_room_options_room ON RoomOptions(room_id);
+    """)
+
+
+# --- Миграция 2: посуточная занятость номеров RoomNights ---
+# Каждая ночь номера может принадлежать только одной брони (первичный ключ),
+# поэтому двойное бронирование отклоняется самой бд. Бронь хранится строкой
+# на каждого гостя, ночи занимает первая строка проживания; остальные гости
+# того же номера на те же даты ночей не занимают. Таблица заполняется триггерами.
+_ROOM_NIGHTS_INSERT = """
+    INSERT INTO RoomNights (room_id, night, reservation_id)
+    SELECT NEW.room_id, night, NEW.id
+    FROM (
+        WITH RECURSIVE nights(night) AS (
+            SELECT date(NEW.checkin_date)
+            WHERE date(NEW.checkin_date) < date(NEW.checkout_date)
+            UNION ALL
+            SELECT date(night, '+1 day') FROM nights
+            WHERE date(night, '+1 day') < date(NEW.checkout_date)
+        )
+        SELECT night FROM nights
+    )
+    WHERE NOT EXISTS (
+        SELECT 1 FROM Reservations r
+        WHERE r.id <> NEW.id AND r.room_id = NEW.room_id
+          AND r.checkin_date = NEW.checkin_date AND r.checkout_date = NEW.checkout_date
+    );
+"""
+
+# Ночи удаленной строки передаются другому гостю того же проживания, если он есть
+_ROOM_NIGHTS_RELEASE = """
+    DELETE FROM RoomNights
+    WHERE reservation_id = OLD.id
+      AND NOT EXISTS (
+        SELECT 1 FROM Reservations r
+        WHERE r.id <> OLD.id AND r.room_id = OLD.room_id
+          AND r.checkin_date = OLD.checkin_date AND r.checkout_date = OLD.checkout_date
+      );
+    UPDATE RoomNights
+    SET reservation_id = (
+        SELECT MIN(r.id) FROM Reservations r
+        WHERE r.id <> OLD.id AND r.room_id = OLD.room_id
+          AND r.checkin_date = OLD.checkin_date AND r.checkout_date = OLD.checkout_date
+    )
+    WHERE reservation_id = OLD.id;
+"""
+
+
+def _m002_room_nights(cursor):
+    _run_script(cursor, f"""
+        CREATE TABLE RoomNights (
+            room_id INTEGER NOT NULL,
+            night TEXT NOT NULL,
+            reservation_id INTEGER NOT NULL,
+            PRIMARY KEY (room_id, night)
+        ) WITHOUT ROWID;
+        CREATE INDEX idx_room_nights_reservation ON RoomNights(reservation_id);
+
+        CREATE TRIGGER trg_reservations_nights_insert
+        AFTER INSERT ON Reservations
+        BEGIN
+            {_ROOM_NIGHTS_INSERT}
+        END;
+
+        CREATE TRIGGER trg_reservations_nights_delete
+        AFTER DELETE ON Reservations
+        BEGIN
+            {_ROOM_NIGHTS_RELEASE}
+        END;
+
+        CREATE TRIGGER trg_reservations_nights_update
+        AFTER UPDATE OF room_id, checkin_date, checkout_date ON Reservations
+        BEGIN
+            {_ROOM_NIGHTS_RELEASE}
+            {_ROOM_NIGHTS_INSERT}
+        END;
+    """)
+
+    # Заполнение по существующим броням. Если в старых данных номер уже
+    # забронирован дважды на одну ночь, ночь остается за более ранней бронью.
+    cursor.execute("""
+        INSERT OR IGNORE INTO RoomNights (room_id, night, reservation_id)
+        WITH RECURSIVE nights(room_id, night, reservation_id, checkout) AS (
+            SELECT room_id, date(checkin_date), id, date(checkout_date)
+            FROM Reservations
+            WHERE date(checkin_date) < date(checkout_date)
+            UNION ALL
+            SELECT room_id, date(night, '+1 day'), reservation_id, checkout FROM nights
+            WHERE date(night, '+1 day') < checkout
+        )
+        SELECT room_id, night, reservation_id FROM nights ORDER BY reservation_id, night
+    """)
+
+
+# --- Миграция 3: бронирование как одна строка Bookings + гости BookingGuests ---
+# Строки Reservations одного проживания (номер, даты, сумма) сворачиваются в
+# одну бронь с id самой ранней строки. Платежи получают booking_id и плательщика
+# client_id (клиент строки, по которой был внесен платеж), описания доходов
+# "Оплата бронирования №N" переводятся на номер брони. RoomNights пересобирается
+# по броням, Reservations удаляется.
+_BOOKING_NIGHTS_INSERT = """
+    INSERT INTO RoomNights (room_id, night, booking_id)
+    SELECT NEW.room_id, night, NEW.id
+    FROM (
+        WITH RECURSIVE nights(night) AS (
+            SELECT date(NEW.checkin_date)
+            WHERE date(NEW.checkin_date) < date(NEW.checkout_date)
+            UNION ALL
+            SELECT date(night, '+1 day') FROM nights
+            WHERE date(night, '+1 day') < date(NEW.checkout_date)
+        )
+        SELECT night FROM nights
+    );
+"""
+
+
+def _m003_bookings(cursor):
+    _run_script(cursor, """
+        CREATE TABLE Bookings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            room_id INTEGER NOT NULL,
+            checkin_date TEXT NOT NULL,
+            checkout_date TEXT NOT NULL,
+            total_price INTEGER NOT NULL,
+            FOREIGN KEY (room_id) REFERENCES Rooms(id)
+        );
+        CREATE TABLE BookingGuests (
+            booking_id INTEGER NOT NULL,
+            client_id INTEGER NOT NULL,
+            PRIMARY KEY (booking_id, client_id),
+            FOREIGN KEY (booking_id) REFERENCES Bookings(id) ON DELETE CASCADE,
+            FOREIGN KEY (client_id) REFERENCES Clients(id)
+        ) WITHOUT ROWID;
+
+        CREATE TEMP TABLE booking_map AS
+        SELECT id AS reservation_id,
+               MIN(id) OVER (PARTITION BY room_id, checkin_date, checkout_date, total_price) AS booking_id,
+               client_id
+        FROM Reservations;
+
+        INSERT INTO Bookings (id, room_id, checkin_date, checkout_date, total_price)
+        SELECT r.id, r.room_id, r.checkin_date, r.checkout_date, r.total_price
+        FROM Reservations r
+        JOIN booking_map m ON m.reservation_id = r.id
+        WHERE m.booking_id = r.id
+        ORDER BY r.id;
+
+        INSERT OR IGNORE INTO BookingGuests (booking_id, client_id)
+        SELECT booking_id, client_id FROM booking_map ORDER BY reservation_id;
+
+        -- Новые брони нумеруются после последней строки Reservations
+        DELETE FROM sqlite_sequence WHERE name = 'Bookings';
+        INSERT INTO sqlite_sequence (name, seq)
+        SELECT 'Bookings', MAX(seq) FROM (
+            SELECT seq FROM sqlite_sequence WHERE name = 'Reservations'
+            UNION ALL
+            SELECT COALESCE(MAX(id), 0) FROM Bookings
+        );
+
+        CREATE TABLE Payments_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            booking_id INTEGER NOT NULL,
+            client_id INTEGER,
+            amount REAL NOT NULL,
+            payment_date TEXT NOT NULL,
+            FOREIGN KEY (booking_id) REFERENCES Bookings(id),
+            FOREIGN KEY (client_id) REFERENCES Clients(id)
+        );
+        INSERT INTO Payments_new (id, booking_id, client_id, amount, payment_date)
+        SELECT p.id, COALESCE(m.booking_id, p.reservation_id), m.client_id, p.amount, p.payment_date
+        FROM Payments p
+        LEFT JOIN booking_map m ON m.reservation_id = p.reservation_id;
+        DROP TABLE Payments;
+        ALTER TABLE Payments_new RENAME TO Payments;
+
+        UPDATE Finances
+        SET description = (
+            SELECT 'Оплата бронирования №' || m.booking_id FROM booking_map m
+            WHERE 'Оплата бронирования №' || m.reservation_id = Finances.description
+        )
+        WHERE type = 'income'
+          AND description IN (
+            SELECT 'Оплата бронирования №' || reservation_id FROM booking_map
+            WHERE reservation_id <> booking_id
+          );
+
+        DROP TABLE booking_map;
+        DROP TABLE RoomNights;
+        DROP TABLE Reservations;
+
+        CREATE TABLE RoomNights (
+            room_id INTEGER NOT NULL,
+            night TEXT NOT NULL,
+            booking_id INTEGER NOT NULL,
+            PRIMARY KEY (room_id, night)
+        ) WITHOUT ROWID;
+
+        CREATE INDEX idx_room_nights_booking ON RoomNights(booking_id);
+        CREATE INDEX idx_bookings_room_dates ON Bookings(room_id, checkin_date, checkout_date);
+        CREATE INDEX idx_booking_guests_client ON BookingGuests(client_id);
+        CREATE INDEX idx_payments_booking ON Payments(booking_id);
+        CREATE INDEX idx_payments_client ON Payments(client_id);
+    """)
+
+    # Гости и ночи брони удаляются вместе с ней (внешние ключи в бд не включены)
+    _run_script(cursor, f"""
+        CREATE TRIGGER trg_bookings_nights_insert
+        AFTER INSERT ON Bookings
+        BEGIN
+            {_BOOKING_NIGHTS_INSERT}
+        END;
+
+        CREATE TRIGGER trg_bookings_delete
+        AFTER DELETE ON Bookings
+        BEGIN
+            DELETE FROM RoomNights WHERE booking_id = OLD.id;
+            DELETE FROM BookingGuests WHERE booking_id = OLD.id;
+        END;
+
+        CREATE TRIGGER trg_bookings_nights_update
+        AFTER UPDATE OF room_id, checkin_date, checkout_date ON Bookings
+        BEGIN
+            DELETE FROM RoomNights WHERE booking_id = OLD.id;
+            {_BOOKING_NIGHTS_INSERT}
+        END;
+    """)
+
+    # Заполнение ночей по броням; при двойном бронировании в старых данных
+    # ночь остается за более ранней бронью
+    cursor.execute("""
+        INSERT OR IGNORE INTO RoomNights (room_id, night, booking_id)
+        WITH RECURSIVE nights(room_id, night, booking_id, checkout) AS (
+            SELECT room_id, date(checkin_date), id, date(checkout_date)
+            FROM Bookings
+            WHERE date(checkin_date) < date(checkout_date)
+            UNION ALL
+            SELECT room_id, date(night, '+1 day'), booking_id, checkout FROM nights
+            WHERE date(night, '+1 day') < checkout
+        )
+        SELECT room_id, night, booking_id FROM nights ORDER BY booking_id, night
+    """)
+
+
+# --- Миграция 4: ссылки записей Finances на клиента, номер, платеж и бронь ---
+# Раньше связь определялась только текстом описания ("Ручное добавление
+# клиента ID: N", "Ручное добавление номера ID: N в отчет", "Оплата
+# бронирования №N"); существующие описания разбираются в новые столбцы.
+# Доходы по оплате сопоставляются с платежами по брони, сумме и дате.
+def _m004_finance_links(cursor):
+    _run_script(cursor, """
+        ALTER TABLE Finances ADD COLUMN client_id INTEGER REFERENCES Clients(id);
+        ALTER TABLE Finances ADD COLUMN room_id INTEGER REFERENCES Rooms(id);
+        ALTER TABLE Finances ADD COLUMN payment_id INTEGER REFERENCES Payments(id);
+        ALTER TABLE Finances ADD COLUMN booking_id INTEGER REFERENCES Bookings(id);
+
+        UPDATE Finances
+        SET client_id = CAST(substr(description, length('Ручное добавление клиента ID:') + 1) AS INTEGER)
+        WHERE type = 'income' AND description GLOB 'Ручное добавление клиента ID: [0-9]*';
+
+        UPDATE Finances
+        SET room_id = CAST(substr(description, length('Ручное добавление номера ID:') + 1) AS INTEGER)
+        WHERE type = 'income' AND description GLOB 'Ручное добавление номера ID: [0-9]*';
+
+        CREATE TEMP TABLE finance_payments AS
+        WITH f AS (
+            SELECT id, amount, date,
+                   CAST(substr(description, length('Оплата бронирования №') + 1) AS INTEGER) AS booking_id,
+                   ROW_NUMBER() OVER (PARTITION BY description, amount, date ORDER BY id) AS n
+            FROM Finances
+            WHERE type = 'income' AND description GLOB 'Оплата бронирования №[0-9]*'
+        ),
+        p AS (
+            SELECT id, booking_id, client_id, amount, payment_date,
+                   ROW_NUMBER() OVER (PARTITION BY booking_id, amount, payment_date ORDER BY id) AS n
+            FROM Payments
+        )
+        SELECT f.id AS finance_id, f.booking_id, p.id AS payment_id, p.client_id, b.room_id
+        FROM f
+        LEFT JOIN p ON p.booking_id = f.booking_id AND p.amount = f.amount
+                   AND p.payment_date = f.date AND p.n = f.n
+        LEFT JOIN Bookings b ON b.id = f.booking_id;
+
+        UPDATE Finances
+        SET booking_id = (SELECT booking_id FROM finance_payments WHERE finance_id = Finances.id),
+            payment_id = (SELECT payment_id FROM finance_payments WHERE finance_id = Finances.id),
+            client_id = (SELECT client_id FROM finance_payments WHERE finance_id = Finances.id),
+            room_id = (SELECT room_id FROM finance_payments WHERE finance_id = Finances.id)
+        WHERE id IN (SELECT finance_id FROM finance_payments);
+
+        DROP TABLE finance_payments;
+
+        CREATE INDEX idx_finances_client ON Finances(client_id);
+        CREATE INDEX idx_finances_room ON Finances(room_id);
+        CREATE INDEX idx_finances_payment ON Finances(payment_id);
+        CREATE INDEX idx_finances_booking ON Finances(booking_id);
+    """)
+
+
+# --- Миграция 5: единый формат дат ГГГГ-ММ-ДД во всех таблицах ---
+# Даты рождения клиентов и часть записей финансов хранились как ДД.ММ.ГГГГ,
+# из-за чего сортировка и выборки по периоду были неверными. Нераспознанные
+# значения оставляются без изменений.
+_DATE_COLUMNS = [
+    ("Clients", "birthdate"),
+    ("Finances", "date"),
+    ("Bookings", "checkin_date"),
+    ("Bookings", "checkout_date"),
+    ("Payments", "payment_date"),
+]
+
+
+def _m005_iso_dates(cursor):
+    for table, column in _DATE_COLUMNS:
+        rows = cursor.execute(f"SELECT id, {column} FROM {table} WHERE {column} IS NOT NULL").fetchall()
+        changed = []
+        for row_id, value in rows:
+            iso = normalize(value)
+            if iso is not None and iso != value:
+                changed.append((iso, row_id))
+        cursor.executemany(f"UPDATE {table} SET {column} = ? WHERE id = ?", changed)
+
+    _run_script(cursor, """
+        CREATE INDEX idx_finances_date ON Finances(date);
+        CREATE INDEX idx_payments_date ON Payments(payment_date);
+        CREATE INDEX idx_bookings_checkin ON Bookings(checkin_date);
+        CREATE INDEX idx_clients_birthdate ON Clients(birthdate);
+    """)
+
+
+# Пересчет строки индекса броней: гости и номер комнаты
+_BOOKING_SEARCH_ROW = """
+    INSERT INTO BookingsSearch (rowid, guests, room_number)
+    SELECT b.id,
+           (SELECT group_concat(c.name, ', ') FROM BookingGuests g
+            JOIN Clients c ON c.id = g.client_id WHERE g.booking_id = b.id),
+           rm.room_number
+    FROM Bookings b LEFT JOIN Rooms rm ON rm.id = b.room_id
+"""
+
+
+# --- Миграция 6: полнотекстовый индекс для поиска (FTS5, trigram) ---
+# Клиенты, номера и финансы индексируются как внешнее содержимое своих
+# таблиц; индекс броней хранит имена гостей и номер комнаты. Все таблицы
+# поддерживаются триггерами. Если SQLite собран без FTS5, миграция ничего
+# не создает, и поиск выполняется через LIKE.
+def _m006_search_index(cursor):
+    try:
+        cursor.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x, tokenize='trigram')")
+        cursor.execute("DROP TABLE temp.fts5_probe")
+    except sqlite3.OperationalError:
+        return
+
+    _run_script(cursor, """
+        CREATE VIRTUAL TABLE ClientsSearch USING fts5(
+            name, contact, passport,
+            content='Clients', content_rowid='id', tokenize='trigram');
+        CREATE VIRTUAL TABLE RoomsSearch USING fts5(
+            room_number, content='Rooms', content_rowid='id', tokenize='trigram');
+        CREATE VIRTUAL TABLE FinancesSearch USING fts5(
+            description, content='Finances', content_rowid='id', tokenize='trigram');
+        CREATE VIRTUAL TABLE BookingsSearch USING fts5(guests, room_number, tokenize='trigram');
+
+        INSERT INTO ClientsSearch (ClientsSearch) VALUES ('rebuild');
+        INSERT INTO RoomsSearch (RoomsSearch) VALUES ('rebuild');
+        INSERT INTO FinancesSearch (FinancesSearch) VALUES ('rebuild');
+
+        CREATE TRIGGER clients_search_insert AFTER INSERT ON Clients BEGIN
+            INSERT INTO ClientsSearch (rowid, name, contact, passport)
+            VALUES (new.id, new.name, new.contact, new.passport);
+        END;
+        CREATE TRIGGER clients_search_delete AFTER DELETE ON Clients BEGIN
+            INSERT INTO ClientsSearch (ClientsSearch, rowid, name, contact, passport)
+            VALUES ('delete', old.id, old.name, old.contact, old.passport);
+        END;
+        CREATE TRIGGER clients_search_update AFTER UPDATE OF name, contact, passport ON Clients BEGIN
+            INSERT INTO ClientsSearch (ClientsSearch, rowid, name, contact, passport)
+            VALUES ('delete', old.id, old.name, old.contact, old.passport);
+            INSERT INTO ClientsSearch (rowid, name, contact, passport)
+            VALUES (new.id, new.name, new.contact, new.passport);
+        END;
+
+        CREATE TRIGGER rooms_search_insert AFTER INSERT ON Rooms BEGIN
+            INSERT INTO RoomsSearch (rowid, room_number) VALUES (new.id, new.room_number);
+        END;
+        CREATE TRIGGER rooms_search_delete AFTER DELETE ON Rooms BEGIN
+            INSERT INTO RoomsSearch (RoomsSearch, rowid, room_number)
+            VALUES ('delete', old.id, old.room_number);
+        END;
+        CREATE TRIGGER rooms_search_update AFTER UPDATE OF room_number ON Rooms BEGIN
+            INSERT INTO RoomsSearch (RoomsSearch, rowid, room_number)
+            VALUES ('delete', old.id, old.room_number);
+            INSERT INTO RoomsSearch (rowid, room_number) VALUES (new.id, new.room_number);
+        END;
+
+        CREATE TRIGGER finances_search_insert AFTER INSERT ON Finances BEGIN
+            INSERT INTO FinancesSearch (rowid, description) VALUES (new.id, new.description);
+        END;
+        CREATE TRIGGER finances_search_delete AFTER DELETE ON Finances BEGIN
+            INSERT INTO FinancesSearch (FinancesSearch, rowid, description)
+            VALUES ('delete', old.id, old.description);
+        END;
+        CREATE TRIGGER finances_search_update AFTER UPDATE OF description ON Finances BEGIN
+            INSERT INTO FinancesSearch (FinancesSearch, rowid, description)
+            VALUES ('delete', old.id, old.description);
+            INSERT INTO FinancesSearch (rowid, description) VALUES (new.id, new.description);
+        END;
+    """)
+
+    cursor.execute(_BOOKING_SEARCH_ROW)
+    # Строки индекса броней пересчитываются при изменении брони, ее гостей,
+    # имени гостя или номера комнаты
+    for trigger, event, bookings in (
+        ("bookings_search_insert", "AFTER INSERT ON Bookings", "= new.id"),
+        ("bookings_search_room", "AFTER UPDATE OF room_id ON Bookings", "= new.id"),
+        ("booking_guests_search_insert", "AFTER INSERT ON BookingGuests", "= new.booking_id"),
+        ("booking_guests_search_delete", "AFTER DELETE ON BookingGuests", "= old.booking_id"),
+        ("clients_search_bookings", "AFTER UPDATE OF name ON Clients",
+         "IN (SELECT booking_id FROM BookingGuests WHERE client_id = new.id)"),
+        ("rooms_search_bookings", "AFTER UPDATE OF room_number ON Rooms",
+         "IN (SELECT id FROM Bookings WHERE room_id = new.id)"),
+    ):
+        cursor.execute(f"""
+            CREATE TRIGGER {trigger} {event} BEGIN
+                DELETE FROM BookingsSearch WHERE rowid {bookings};
+                {_BOOKING_SEARCH_ROW} WHERE b.id {bookings};
+            END
+        """)
+    cursor.execute("""
+        CREATE TRIGGER bookings_search_delete AFTER DELETE ON Bookings BEGIN
+            DELETE FROM BookingsSearch WHERE rowid = old.id;
+        END
+    """)
+
+
+# --- Миграция 7: нормализованные телефон и паспорт клиента ---
+# contact_digits и passport_norm заполняются приложением (модуль contacts)
+# и позволяют искать клиента по индексу, как бы ни был записан номер.
+# Паспорт уникален; если в старых данных он повторяется, нормализованное
+# значение получает только первый клиент (остальные - дубликаты).
+def _m007_client_lookup(cursor):
+    _run_script(cursor, """
+        ALTER TABLE Clients ADD COLUMN contact_digits TEXT;
+        ALTER TABLE Clients ADD COLUMN passport_norm TEXT;
+    """)
+    seen = set()
+    rows = []
+    for client_id, contact, passport in cursor.execute(
+            "SELECT id, contact, passport FROM Clients ORDER BY id").fetchall():
+        passport = contacts.passport(passport)
+        if passport in seen:
+            passport = None
+        seen.add(passport)
+        rows.append((contacts.phone(contact), passport, client_id))
+    cursor.executemany("UPDATE Clients SET contact_digits = ?, passport_norm = ? WHERE id = ?", rows)
+    _run_script(cursor, """
+        DROP INDEX IF EXISTS idx_clients_passport;
+        CREATE UNIQUE INDEX idx_clients_passport_norm ON Clients(passport_norm);
+        CREATE INDEX idx_clients_contact_digits ON Clients(contact_digits);
+    """)
+
+
+# --- Миграция 8: итоги по клиентам ClientStats ---
+# Визиты, ночи, сумма броней (billed), оплаты по броням клиента (paid),
+# его собственные платежи и ручные доходы (spent) и дата последнего заезда.
+# Строка клиента пересчитывается триггерами при изменении его броней,
+# платежей и финансовых записей, поэтому карточка клиента и отчет по
+# клиентам читают готовые значения, а не всю историю.
+def _client_stats_row(clients):
+    return f"""
+        INSERT OR REPLACE INTO ClientStats (client_id, visits, nights, billed, paid, spent, last_checkin)
+        SELECT c.id,
+               COUNT(b.id),
+               COALESCE(CAST(SUM(julianday(b.checkout_date) - julianday(b.checkin_date)) AS INTEGER), 0),
+               COALESCE(SUM(b.total_price), 0),
+               (SELECT COALESCE(SUM(p.amount), 0) FROM BookingGuests pg
+                JOIN Payments p ON p.booking_id = pg.booking_id
+                WHERE pg.client_id = c.id),
+               (SELECT COALESCE(SUM(amount), 0) FROM Payments WHERE client_id = c.id)
+               + (SELECT COALESCE(SUM(amount), 0) FROM Finances
+                  WHERE client_id = c.id AND type = 'income' AND payment_id IS NULL),
+               MAX(b.checkin_date)
+        FROM Clients c
+        LEFT JOIN BookingGuests g ON g.client_id = c.id
+        LEFT JOIN Bookings b ON b.id = g.booking_id
+        WHERE c.id {clients}
+        GROUP BY c.id;
+    """
+
+
+def _m008_client_stats(cursor):
+    _run_script(cursor, f"""
+        CREATE TABLE ClientStats (
+            client_id INTEGER PRIMARY KEY,
+            visits INTEGER NOT NULL,
+            nights INTEGER NOT NULL,
+            billed REAL NOT NULL,
+            paid REAL NOT NULL,
+            spent REAL NOT NULL,
+            last_checkin TEXT
+        );
+        {_client_stats_row("IS NOT NULL")}
+        CREATE INDEX idx_client_stats_spent ON ClientStats(spent);
+
+        CREATE TRIGGER client_stats_delete AFTER DELETE ON Clients BEGIN
+            DELETE FROM ClientStats WHERE client_id = old.id;
+        END;
+    """)
+    booking_clients = "SELECT client_id FROM BookingGuests WHERE booking_id"
+    for trigger, event, clients in (
+        ("client_stats_insert", "AFTER INSERT ON Clients", "= new.id"),
+        ("client_stats_booking", "AFTER UPDATE OF checkin_date, checkout_date, total_price ON Bookings",
+         f"IN ({booking_clients} = new.id)"),
+        ("client_stats_guest_insert", "AFTER INSERT ON BookingGuests", "= new.client_id"),
+        ("client_stats_guest_delete", "AFTER DELETE ON BookingGuests", "= old.client_id"),
+        ("client_stats_guest_update", "AFTER UPDATE ON BookingGuests", "IN (old.client_id, new.client_id)"),
+        ("client_stats_payment_insert", "AFTER INSERT ON Payments",
+         f"IN ({booking_clients} = new.booking_id UNION SELECT new.client_id)"),
+        ("client_stats_payment_delete", "AFTER DELETE ON Payments",
+         f"IN ({booking_clients} = old.booking_id UNION SELECT old.client_id)"),
+        ("client_stats_payment_update", "AFTER UPDATE OF booking_id, client_id, amount ON Payments",
+         f"IN ({booking_clients} IN (old.booking_id, new.booking_id) "
+         "UNION SELECT old.client_id UNION SELECT new.client_id)"),
+        ("client_stats_finance_insert", "AFTER INSERT ON Finances", "= new.client_id"),
+        ("client_stats_finance_delete", "AFTER DELETE ON Finances", "= old.client_id"),
+        ("client_stats_finance_update", "AFTER UPDATE OF type, amount, client_id, payment_id ON Finances",
+         "IN (old.client_id, new.client_id)"),
+    ):
+        cursor.execute(f"""
+            CREATE TRIGGER {trigger} {event} BEGIN
+                {_client_stats_row(clients)}
+            END
+        """)
+
+
+# --- Миграция 9: месяц-день и год рождения клиента ---
+# Вычисляемые столбцы из birthdate (ГГГГ-ММ-ДД после миграции 5). В таблице
+# они не хранятся, но индексируются: список дней рождения на ближайшие дни
+# выбирается по индексу birth_month_day, а не просмотром всех клиентов.
+def _m009_birthdays(cursor):
+    _run_script(cursor, """
+        ALTER TABLE Clients ADD COLUMN birth_month_day TEXT
+            GENERATED ALWAYS AS (substr(birthdate, 6, 5)) VIRTUAL;
+        ALTER TABLE Clients ADD COLUMN birth_year INTEGER
+            GENERATED ALWAYS AS (CAST(substr(birthdate, 1, 4) AS INTEGER)) VIRTUAL;
+        CREATE INDEX idx_clients_birth_month_day ON Clients(birth_month_day);
+        CREATE INDEX idx_clients_birth_year ON Clients(birth_year);
+    """)
+
+
+# Список миграций по порядку: номер миграции = позиция в списке + 1.
+# Примененные миграции не изменяются, новые добавляются в конец.
+MIGRATIONS = [
+    _m001_baseline,
+    _m002_room_nights,
+    _m003_bookings,
+    _m004_finance_links,
+    _m005_iso_dates,
+    _m006_search_index,
+    _m007_client_lookup,
+    _m008_client_stats,
+    _m009_birthdays,
+]
+
+
+# Текущая версия схемы бд
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+# --- Приведение схемы бд к актуальной версии ---
+# Каждая миграция выполняется в собственной транзакции вместе с
+# обновлением user_version, поэтому при ошибке бд остается в предыдущей версии.
+def migrate(database):
+    conn = database.connection()
+    current = schema_version(conn)
+    target = len(MIGRATIONS)
+
+    if current > target:
+        raise MigrationError(
+            f"Версия бд ({current}) новее, чем поддерживает приложение ({target})")
+
+    for version in range(current + 1, target + 1):
+        migration = MIGRATIONS[version - 1]
+        try:
+            with database.transaction() as cursor:
+                migration(cursor)
+                cursor.execute(f"PRAGMA user_version = {version}")
+        except sqlite3.Error as e:
+            raise MigrationError(f"Не удалось применить миграцию {version}: {e}") from e
+
+    # Обновление статистики планировщика после изменения схемы
+    if current < target:
+        conn.execute("PRAGMA optimize")
+    return target
@@ -0,0 +1,147 @@
+import threading
+from bisect import bisect_left, insort
+
+from db import CacheVersion
+
+
+# Ключ сравнения ФИО: без учета регистра и различия е/ё
+def _key(name):
+    return ' '.join(str(name or '').casefold().replace('ё', 'е').split())
+
+
+# --- Индекс ФИО клиентов для выпадающих списков ---
+# Загружает (id, ФИО) всех клиентов один раз и находит первые limit
+# совпадений без обращения к бд: сначала ФИО, начинающиеся с текста, затем
+# ФИО, в которых с текста начинается имя или отчество (бинарный поиск по
+# отсортированным ключам), затем остальные вхождения подстроки (поиск в
+# одной строке со всеми ФИО). После собственных изменений клиентов индекс
+# обновляется через add/remove; изменения с других рабочих мест
+# обнаруживаются через db.CacheVersion.
+class ClientNameIndex:
+    LIMIT = 100
+
+    def __init__(self, database):
+        self.database = database
+        self._names = {}       # id -> ФИО
+        self._full = []        # (ключ ФИО, id) по алфавиту
+        self._words = []       # (ключ ФИО со второго слова, id) по алфавиту
+        self._text = None      # ключи _full через '\n', строится по запросу
+        self._starts = []      # начало каждого ключа в _text
+        self.version = CacheVersion(database)
+        self._lock = threading.RLock()
+
+    # Структуры строятся без блокировки (на большой базе - секунды в
+    # фоновом потоке), чтобы поиск в главном потоке не ждал загрузки
+    def load(self):
+        load = self.version.begin()
+        try:
+            names = dict(self.database.fetchall("SELECT id, name FROM Clients"))
+            full = []
+            words = []
+            for client_id, name in names.items():
+                key = _key(name)
+                full.append((key, client_id))
+                words.extend((suffix, client_id) for suffix in self._suffixes(key))
+            full.sort()
+            words.sort()
+        except BaseException:
+            self.version.cancel(load)
+            raise
+        with self._lock:
+            self._names, self._full, self._words = names, full, words
+            self._text = None
+            for client_id, name in self.version.finish(load):
+                if name is None:
+                    self.remove(client_id)
+                else:
+                    self.add(client_id, name)
+
+    # Перезагрузка, если бд изменена другим соединением (или индекс еще не загружен)
+    def refresh(self):
+        if self.version.stale():
+            self.load()
+
+    # Сброс после массовых изменений (импорта): загрузится при следующем refresh
+    def invalidate(self):
+        self.version.reset()
+
+    # Окончания ФИО, начинающиеся со второго и следующих слов
+    @staticmethod
+    def _suffixes(key):
+        i = key.find(' ')
+        while i != -1:
+            yield key[i + 1:]
+            i = key.find(' ', i + 1)
+
+    def add(self, client_id, name):
+        with self._lock:
+            self.remove(client_id)
+            self.version.record((client_id, name))
+            key = _key(name)
+            self._names[client_id] = name
+            insort(self._full, (key, client_id))
+            for suffix in self._suffixes(key):
+                insort(self._words, (suffix, client_id))
+            self._text = None
+
+    def remove(self, client_id):
+        with self._lock:
+            self.version.record((client_id, None))
+            name = self._names.pop(client_id, None)
+            if name is None:
+                return
+            key = _key(name)
+            self._full.pop(bisect_left(self._full, (key, client_id)))
+            for suffix in self._suffixes(key):
+                self._words.pop(bisect_left(self._words, (suffix, client_id)))
+            self._text = None
+
+    def name(self, client_id):
+        with self._lock:
+            return self._names.get(client_id)
+
+    # Ключи, начинающиеся с prefix, из отсортированного списка keys
+    @staticmethod
+    def _prefixed(keys, prefix):
+        i = bisect_left(keys, (prefix,))
+        while i < len(keys) and keys[i][0].startswith(prefix):
+            yield keys[i][1]
+            i += 1
+
+    # Вхождения text в любое место ФИО, в алфавитном порядке
+    def _containing(self, text):
+        if self._text is None:
+            self._starts = []
+            position = 0
+            for key, _ in self._full:
+                self._starts.append(position)
+                position += len(key) + 1
+            self._text = '\n'.join(key for key, _ in self._full)
+        i = self._text.find(text)
+        while i != -1:
+            row = bisect_left(self._starts, i + 1) - 1
+            yield self._full[row][1]
+            # следующий поиск - со следующего ФИО
+            following = row + 1
+            if following >= len(self._starts):
+                break
+            i = self._text.find(text, self._starts[following])
+
+    # Первые limit клиентов (id, ФИО), подходящих под text; пустой text - все по алфавиту
+    def match(self, text, limit=LIMIT):
+        text = _key(text)
+        found = {}
+        with self._lock:
+            if not text:
+                sources = [(client_id for _, client_id in self._full)]
+            else:
+                sources = [self._prefixed(self._full, text), self._prefixed(self._words, text),
+                           self._containing(text)]
+            for source in sources:
+                if len(found) >= limit:
+                    break
+                for client_id in source:
+                    found.setdefault(client_id, self._names[client_id])
+                    if len(found) >= limit:
+                        break
+            return list(found.items())
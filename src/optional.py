@@ -0,0 +1,30 @@
+# --- Загрузка тяжелых необязательных библиотек ---
+# openpyxl и python-docx нужны только для экспорта отчетов и заметно
+# замедляют запуск, поэтому импортируются при первом обращении. Импорты
+# записаны явно (не через importlib), чтобы PyInstaller включал библиотеки
+# в сборку output/main.
+
+
+# Библиотека не установлена; текст ошибки можно показать пользователю
+class MissingDependency(ImportError):
+    def __init__(self, package, purpose):
+        super().__init__(f"Для {purpose} требуется установить библиотеку {package}")
+        self.package = package
+
+
+def openpyxl():
+    try:
+        import openpyxl
+        import openpyxl.styles
+    except ImportError as e:
+        raise MissingDependency("openpyxl", "экспорта в Excel") from e
+    return openpyxl
+
+
+def docx():
+    try:
+        import docx
+        import docx.shared
+    except ImportError as e:
+        raise MissingDependency("python-docx", "экспорта в Word") from e
+    return docx
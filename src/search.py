@@ -0,0 +1,75 @@
+from db import db
+
+
+# --- Полнотекстовый поиск (FTS5, токенизатор trigram) ---
+# Таблицы *Search создаются миграцией 6 и поддерживаются триггерами.
+# Trigram находит подстроку без учета регистра (в том числе кириллицы) по
+# индексу, как LIKE '%текст%', но без полного просмотра таблицы. Запросы
+# короче трех символов индекс не обслуживает - для них остается LIKE.
+MIN_LENGTH = 3
+
+_available = None
+
+
+# Индекс есть, если SQLite собран с FTS5 и миграция создала таблицы
+def available():
+    global _available
+    if _available is None:
+        _available = db.scalar(
+            "SELECT COUNT(*) FROM sqlite_master WHERE name = 'ClientsSearch'") > 0
+    return _available
+
+
+# Текст запроса как фраза FTS5: спецсимволы не разбираются как синтаксис
+def phrase(text):
+    return '"' + text.replace('"', '""') + '"'
+
+
+# Условие поиска подстроки text в столбце column таблицы индекса table.
+# key - выражение с id строки во внешнем запросе, fallback - условие с
+# одним параметром-шаблоном LIKE, если индекс не подходит.
+# Возвращает (sql, params).
+def match_condition(table, column, text, key="id", fallback=None):
+    text = text.strip()
+    if len(text) >= MIN_LENGTH and available():
+        return (f"{key} IN (SELECT rowid FROM {table} WHERE {table} MATCH ?)",
+                (f"{column} : {phrase(text)}",))
+    return fallback or f"{column} LIKE ?", (f"%{text}%",)
+
+
+# --- Глобальный поиск по клиентам, номерам, броням и финансам ---
+# Возвращает до limit строк (тип, id, название, подробности), лучшие
+# совпадения (bm25) первыми.
+def global_search(text, limit=50):
+    text = text.strip()
+    if len(text) < MIN_LENGTH or not available():
+        return []
+    query = phrase(text)
+    return db.fetchall("""
+        SELECT kind, ref, title, details FROM (
+            SELECT 'client' AS kind, c.id AS ref, c.name AS title,
+                   COALESCE(c.contact, '') || ', паспорт ' || COALESCE(c.passport, '') AS details,
+                   m.rank
+            FROM (SELECT rowid, rank FROM ClientsSearch
+                  WHERE ClientsSearch MATCH ? ORDER BY rank LIMIT ?) m
+            JOIN Clients c ON c.id = m.rowid
+            UNION ALL
+            SELECT 'room', r.id, r.room_number, r.status, m.rank
+            FROM (SELECT rowid, rank FROM RoomsSearch
+                  WHERE RoomsSearch MATCH ? ORDER BY rank LIMIT ?) m
+            JOIN Rooms r ON r.id = m.rowid
+            UNION ALL
+            SELECT 'booking', s.rowid, 'Бронь №' || s.rowid || ', номер ' || s.room_number,
+                   s.guests, m.rank
+            FROM (SELECT rowid, rank FROM BookingsSearch
+                  WHERE BookingsSearch MATCH ? ORDER BY rank LIMIT ?) m
+            JOIN BookingsSearch s ON s.rowid = m.rowid
+            UNION ALL
+            SELECT 'finance', f.id, f.description, printf('%.2f руб.', f.amount), m.rank
+            FROM (SELECT rowid, rank FROM FinancesSearch
+                  WHERE FinancesSearch MATCH ? ORDER BY rank LIMIT ?) m
+            JOIN Finances f ON f.id = m.rowid
+        )
+        ORDER BY rank
+        LIMIT ?
+    """, (query, limit) * 4 + (limit,))
@@ -0,0 +1,416 @@
+import tkinter as tk
+from tkinter import ttk
+
+
+# Значение ячейки в том виде, в каком его возвращает Treeview.item():
+# Tcl хранит строки, и tkinter превращает похожие на число значения в int
+def _tcl_value(value):
+    value = str(value)
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+# --- Таблица, которая создает элементы только для видимых строк ---
+# Строки хранятся в Python (модель), а в Treeview есть только окно из
+# видимых строк и запаса сверху и снизу. Внутренняя прокрутка Treeview
+# (колесо мыши, клавиши, see) двигает окно, после чего оно пересобирается
+# вокруг новой позиции; полоса прокрутки показывает положение во всей модели.
+#
+# Методы insert, delete, get_children, item, selection, see, yview работают
+# с моделью, поэтому таблицу можно подставить вместо ttk.Treeview в
+# существующий код. Для полной замены данных используется set_rows().
+# key(row) - идентификатор строки (iid), display(row) - значения ячеек;
+# display вызывается только для строк, попадающих в окно. on_end()
+# вызывается, когда окно дошло до последней строки, - для подгрузки данных.
+# Поддерживаются плоские списки с выбором одной строки (selectmode='browse').
+class VirtualTreeview(ttk.Treeview):
+    def __init__(self, master=None, key=None, display=None, on_end=None, **kw):
+        self._yscroll = kw.pop('yscrollcommand', None)
+        kw.setdefault('selectmode', 'browse')
+        super().__init__(master, **kw)
+        super().configure(yscrollcommand=self._on_inner_scroll)
+
+        self.key = key
+        self.display = display or tuple
+        self.on_end = on_end
+        self._rows = {}         # iid -> строка модели
+        self._tags = {}         # iid -> теги строки
+        self._order = []        # порядок iid; после delete может содержать удаленные
+        self._dirty = False
+        self._positions = None  # iid -> номер строки, строится по запросу
+        self._counter = 0
+
+        self._offset = 0        # номер первой видимой строки модели
+        self._visible = int(self.cget('height'))
+        self._start = 0         # номер строки модели, с которой начинается окно
+        self._window = []       # iid строк, созданных в Treeview
+        self._shown = set()
+        self._render_id = None
+
+        self._selected = None   # выбранная строка (может быть вне окна)
+        self._reported = None   # выбор, о котором уже сообщено <<TreeviewSelect>>
+
+        # Обработчик стоит перед привязками виджета, чтобы отфильтровать
+        # события выбора, вызванные пересборкой окна
+        tag = f"VirtualTreeview{self}"
+        self.bind_class(tag, '<<TreeviewSelect>>', self._on_select)
+        self.bindtags((tag,) + self.bindtags())
+
+    def configure(self, cnf=None, **kw):
+        if not cnf and not kw:
+            return super().configure()
+        if cnf and 'yscrollcommand' in cnf:
+            cnf = dict(cnf)
+            self._yscroll = cnf.pop('yscrollcommand')
+        if 'yscrollcommand' in kw:
+            self._yscroll = kw.pop('yscrollcommand')
+        if cnf or kw:
+            return super().configure(cnf, **kw)
+
+    config = configure
+
+    # --- Модель ---
+
+    # Замена всех строк. Новый набор сравнивается со старым по ключам, и в
+    # Treeview меняются только строки окна, которые добавились, изменились
+    # или исчезли. Выбор и первая видимая строка сохраняются, если строки
+    # с теми же ключами остались. display задается, только если меняется
+    # вид всех строк - тогда окно перерисовывается целиком.
+    def set_rows(self, rows, key=None, display=None):
+        if key is not None:
+            self.key = key
+        previous, previous_tags = self._rows, self._tags
+        if display is not None:
+            self.display = display
+            previous = {}
+        keys = self._keys()
+        anchor = keys[self._offset] if self._offset < len(keys) else None
+
+        self._rows = {}
+        self._order = []
+        for row in rows:
+            iid = self._new_iid(row)
+            self._rows[iid] = row
+            self._order.append(iid)
+        if len(self._rows) != len(self._order):
+            raise ValueError("Ключи строк таблицы должны быть уникальны")
+        self._tags = {}
+        self._dirty = False
+        self._positions = None
+
+        if anchor in self._rows:
+            self._offset = self._position(anchor)
+        if self._selected not in self._rows:
+            self._selected = None
+        self._render(previous, previous_tags)
+        if self._selected != self._reported:
+            self.event_generate('<<TreeviewSelect>>')
+
+    def rows(self):
+        return [self._rows[iid] for iid in self._keys()]
+
+    def _new_iid(self, row):
+        if self.key is not None:
+            return str(self.key(row))
+        self._counter += 1
+        return f"I{self._counter:03X}"
+
+    def _keys(self):
+        if self._dirty:
+            self._order = [iid for iid in self._order if iid in self._rows]
+            self._dirty = False
+        return self._order
+
+    def _position(self, iid):
+        if self._positions is None:
+            self._positions = {key: i for i, key in enumerate(self._keys())}
+        return self._positions[iid]
+
+    def _row(self, iid):
+        iid = str(iid)
+        if iid not in self._rows:
+            raise tk.TclError(f"Item {iid} not found")
+        return iid, self._rows[iid]
+
+    # --- Совместимость с ttk.Treeview ---
+
+    def insert(self, parent, index, iid=None, **kw):
+        if parent != '':
+            raise tk.TclError("VirtualTreeview supports flat lists only")
+        row = tuple(kw.get('values', ()))
+        iid = str(iid) if iid is not None else self._new_iid(row)
+        if iid in self._rows:
+            raise tk.TclError(f"Item {iid} already exists")
+        self._rows[iid] = row
+        if 'tags' in kw:
+            self._tags[iid] = kw['tags']
+        if index == 'end':
+            self._keys().append(iid)
+        else:
+            self._keys().insert(int(index), iid)
+        self._positions = None
+        self._schedule_render()
+        return iid
+
+    def delete(self, *items):
+        for iid in items:
+            iid, _ = self._row(iid)
+            del self._rows[iid]
+            self._tags.pop(iid, None)
+            if iid in self._shown:
+                super().delete(iid)
+                self._shown.discard(iid)
+                self._window.remove(iid)
+            if iid == self._selected:
+                self._selected = None
+        self._dirty = True
+        self._positions = None
+        self._schedule_render()
+
+    def get_children(self, item=None):
+        if item:
+            return ()
+        return tuple(self._keys())
+
+    def exists(self, item):
+        return str(item) in self._rows
+
+    def index(self, item):
+        iid, _ = self._row(item)
+        return self._position(iid)
+
+    def item(self, item, option=None, **kw):
+        iid, row = self._row(item)
+        if kw:
+            if 'values' in kw:
+                self._rows[iid] = tuple(kw.pop('values'))
+            if 'tags' in kw:
+                self._tags[iid] = kw.pop('tags')
+            if iid in self._shown:
+                super().item(iid, values=self.display(self._rows[iid]),
+                             tags=self._tags.get(iid, ''), **kw)
+            return
+        info = {
+            'text': '',
+            'image': '',
+            'values': [_tcl_value(value) for value in self.display(row)],
+            'open': 0,
+            'tags': self._tags.get(iid, ''),
+        }
+        if option is not None:
+            return info[option]
+        return info
+
+    def selection(self):
+        return (self._selected,) if self._selected is not None else ()
+
+    def selection_set(self, *items):
+        if len(items) == 1 and isinstance(items[0], (list, tuple)):
+            items = items[0]
+        self._selected = self._row(items[-1])[0] if items else None
+        self._sync_selection()
+        self.event_generate('<<TreeviewSelect>>')
+
+    def selection_add(self, *items):
+        self.selection_set(*items)
+
+    def selection_remove(self, *items):
+        self.selection_set()
+
+    def focus(self, item=None):
+        if item is None:
+            return self._selected or ''
+        if str(item) in self._shown:
+            super().focus(item)
+
+    # Прокрутка так, чтобы строка оказалась в видимой части
+    def see(self, item):
+        position = self.index(item)
+        if position < self._offset:
+            self._offset = position
+        elif position >= self._offset + self._visible:
+            self._offset = position - self._visible + 1
+        self._render()
+
+    def yview(self, *args):
+        if not args:
+            return self._fractions()
+        if args[0] == 'moveto':
+            return self.yview_moveto(args[1])
+        if args[0] == 'scroll':
+            return self.yview_scroll(args[1], args[2])
+
+    def yview_moveto(self, fraction):
+        self._offset = int(float(fraction) * len(self._rows))
+        self._render()
+
+    def yview_scroll(self, number, what):
+        step = self._visible if what == 'pages' else 1
+        self._offset += int(number) * step
+        self._render()
+
+    # --- Окно видимых строк ---
+
+    def _fractions(self):
+        total = len(self._rows)
+        if not total:
+            return 0.0, 1.0
+        return self._offset / total, min(total, self._offset + self._visible) / total
+
+    def _schedule_render(self):
+        if self._render_id is None:
+            self._render_id = self.after_idle(self._render)
+
+    # previous и previous_tags - строки до замены данных (set_rows); строки
+    # окна, которые в них отличаются, обновляются
+    def _render(self, previous=None, previous_tags=None):
+        if self._render_id is not None:
+            self.after_cancel(self._render_id)
+            self._render_id = None
+        keys = self._keys()
+        total = len(keys)
+        margin = max(self._visible, 10)
+        self._offset = max(0, min(self._offset, total - self._visible))
+        start = max(0, self._offset - margin)
+        window = keys[start:self._offset + self._visible + margin]
+
+        # Уходящие из окна строки удаляются, новые вставляются на свое место,
+        # оставшиеся при необходимости переставляются и обновляются
+        new = set(window)
+        leaving = [iid for iid in self._window if iid not in new]
+        if leaving:
+            super().delete(*leaving)
+        current = [iid for iid in self._window if iid in new]
+        for i, iid in enumerate(window):
+            tags = self._tags.get(iid, '')
+            if iid not in self._shown:
+                super().insert('', i, iid=iid, values=self.display(self._rows[iid]), tags=tags)
+                current.insert(i, iid)
+                continue
+            if current[i] != iid:
+                super().move(iid, '', i)
+                current.remove(iid)
+                current.insert(i, iid)
+            if previous is not None and (previous.get(iid) != self._rows[iid]
+                                         or previous_tags.get(iid, '') != tags):
+                super().item(iid, values=self.display(self._rows[iid]), tags=tags)
+        self._start = start
+        self._window = window
+        self._shown = new
+
+        self._sync_selection()
+        # Первая видимая строка окна; +0.25 защищает от ошибки округления
+        if window:
+            self.tk.call(self._w, 'yview', 'moveto', (self._offset - start + 0.25) / len(window))
+        if self._yscroll is not None:
+            self._yscroll(*self._fractions())
+        if self.on_end is not None and window and start + len(window) >= total:
+            self.on_end()
+
+    def _sync_selection(self):
+        if self._selected in self._shown:
+            if super().selection() != (self._selected,):
+                super().selection_set(self._selected)
+        elif super().selection():
+            super().selection_set(())
+
+    # Treeview сообщает о прокрутке внутри окна: колесо мыши, клавиши,
+    # изменение размера. Окно пересобирается вокруг новой первой строки.
+    def _on_inner_scroll(self, first, last):
+        if not self._window:
+            return
+        count = len(self._window)
+        first, last = float(first), float(last)
+        visible = max(1, round((last - first) * count))
+        if last >= 1.0 and self._start + count < len(self._rows):
+            visible += self._visible  # окно видно целиком - расширяем
+        offset = self._start + round(first * count)
+        if offset != self._offset or visible != self._visible:
+            self._offset = offset
+            self._visible = visible
+            self._schedule_render()
+        elif self._yscroll is not None:
+            self._yscroll(*self._fractions())
+
+    def _on_select(self, event):
+        inner = super().selection()
+        if inner:
+            self._selected = inner[0]
+        elif self._selected in self._shown:
+            self._selected = None
+        if self._selected == self._reported:
+            return "break"
+        self._reported = self._selected
+
+
+# --- Выпадающий список записей (id, название) ---
+# Показывает подписи записей, а выбранную запись возвращает selected() -
+# без разбора текста подписи. search(text) возвращает записи для текста,
+# введенного в поле списка, и вызывается при вводе; так список содержит
+# только первые совпадения, а не все записи таблицы.
+class EntryCombobox(ttk.Combobox):
+    NAVIGATION_KEYS = ('Up', 'Down', 'Return', 'Escape', 'Tab')
+
+    def __init__(self, master=None, search=None, label=None, **kw):
+        super().__init__(master, **kw)
+        self.search = search
+        self.label = label or (lambda entry: f"{entry[1]} (ID: {entry[0]})")
+        self._entries = []
+        if search is not None:
+            self.bind('<KeyRelease>', self._on_key, add='+')
+
+    def set_entries(self, entries):
+        self._entries = list(entries)
+        self['values'] = [self.label(entry) for entry in self._entries]
+
+    # Запись, подпись которой сейчас в поле, или None
+    def selected(self):
+        i = self.current()
+        return self._entries[i] if 0 <= i < len(self._entries) else None
+
+    # Повторный поиск по тексту поля (выбранная запись остается выбранной)
+    def refilter(self, *args):
+        if self.search is not None and self.selected() is None:
+            self.set_entries(self.search(self.get()))
+
+    def _on_key(self, event):
+        if event.keysym not in self.NAVIGATION_KEYS:
+            self.refilter()
+
+
+# --- Поиск по мере ввода ---
+# search() вызывается через delay мс после последнего изменения текста в
+# поле entry - пока пользователь печатает, запросы не отправляются, - и
+# сразу по Enter. Отмену устаревших запросов выполняет Worker (cancellable).
+class LiveSearch:
+    DELAY = 300  # мс
+
+    def __init__(self, entry, search, delay=DELAY):
+        self.entry = entry
+        self.search = search
+        self.delay = delay
+        self._text = entry.get()
+        self._after_id = None
+        entry.bind('<KeyRelease>', self._on_key, add='+')
+        entry.bind('<Return>', self.run, add='+')
+
+    def _on_key(self, event):
+        text = self.entry.get()
+        if event.keysym == 'Return' or text == self._text:
+            return  # Enter обработан run, стрелки и Shift текст не меняют
+        self._text = text
+        self.cancel()
+        self._after_id = self.entry.after(self.delay, self.run)
+
+    # Отмена отложенного поиска
+    def cancel(self):
+        if self._after_id is not None:
+            self.entry.after_cancel(self._after_id)
+            self._after_id = None
+
+    def run(self, event=None):
+        self.cancel()
+        self._text = self.entry.get()
+        self.search()
@@ -0,0 +1,160 @@
+import queue
+import sys
+import tkinter as tk
+from tkinter import messagebox
+from concurrent.futures import ThreadPoolExecutor
+
+from db import db, CancelToken, QueryCancelled
+
+
+# --- Фоновое выполнение запросов к бд и работы с файлами ---
+# Функция задачи выполняется в потоке пула и не должна обращаться к виджетам:
+# Tk допускает работу с ними только из главного потока. Результат
+# передается через очередь, которую главный цикл Tk опрашивает через after(),
+# и уже там вызывается on_done(result) или on_error(error).
+#
+# widget - фрейм, который на время выполнения показывает курсор ожидания.
+# key - задачи с одинаковым ключом заменяют друг друга: если обновление
+# таблицы запрошено повторно, результат предыдущего запроса отбрасывается.
+# Запросы задачи к бд выполняются с токеном отмены (db.CancelToken):
+# cancel(widget) прерывает все задачи фрейма (кнопка "Отменить"),
+# timeout - предельное время задачи в секундах, после которого запрос
+# прерывается с ошибкой db.QueryTimeout.
+# cancellable=True - предыдущая задача с тем же ключом еще и прерывается,
+# а не дорабатывает впустую, занимая поток пула (поиск по мере ввода).
+# on_chunk - результат передается по частям: func возвращает генератор
+# списков строк (например, db.chunks), on_chunk(строки на данный момент)
+# вызывается после каждой части, on_done - со всеми строками. Такая задача
+# всегда прерываемая.
+class Worker:
+    POLL_INTERVAL = 30  # мс
+
+    def __init__(self, root, max_workers=2):
+        self.root = root
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db-worker")
+        self._results = queue.Queue()
+        self._pending = 0
+        self._latest = {}
+        self._cancel = {}
+        self._tokens = {}
+        self._busy = {}
+        self._poll_id = None
+
+    def submit(self, func, *args, on_done=None, on_error=None, widget=None, key=None,
+               cancellable=False, on_chunk=None, timeout=None):
+        token = CancelToken(timeout)
+        if key is not None and (cancellable or on_chunk is not None):
+            previous = self._cancel.get(key)
+            if previous is not None:
+                previous.cancel()
+                running = self._latest.get(key)
+                if running is not None:
+                    running.cancel()  # еще не начатая задача не запустится
+            self._cancel[key] = token
+        future = self._executor.submit(self._run, token, on_chunk, func, args)
+        self._tokens[future] = (token, widget)
+        if key is not None:
+            self._latest[key] = future
+        if widget is not None:
+            self._set_busy(widget, 1)
+        self._pending += 1
+        future.add_done_callback(
+            lambda f: self._results.put((f, on_done, on_error, widget, key)))
+        if self._poll_id is None:
+            self._poll_id = self.root.after(self.POLL_INTERVAL, self._poll)
+        return future
+
+    # Прерывание выполняемых задач фрейма widget (всех задач, если None)
+    def cancel(self, widget=None):
+        for future, (token, owner) in list(self._tokens.items()):
+            if widget is None or owner is widget:
+                token.cancel()
+                future.cancel()
+
+    # Выполнение задачи в потоке пула
+    def _run(self, token, on_chunk, func, args):
+        with db.interruptible(token):
+            if on_chunk is None:
+                return func(*args)
+            # Отмена между частями завершает задачу так же, как отмена
+            # внутри запроса: ошибкой, а не неполным результатом
+            rows = []
+            for chunk in func(*args):
+                db.check()
+                rows.extend(chunk)
+                self._results.put((None, on_chunk, rows[:], token))
+            db.check()
+            return rows
+
+    # Обработка завершенных задач в главном потоке
+    def _poll(self):
+        self._poll_id = None
+        while True:
+            try:
+                item = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if item[0] is None:
+                # Часть результата задачи, которую еще не сменила новая
+                _, on_chunk, rows, token = item
+                if not token.cancelled():
+                    try:
+                        on_chunk(rows)
+                    except Exception:
+                        self.root.report_callback_exception(*sys.exc_info())
+                continue
+            future, on_done, on_error, widget, key = item
+            self._tokens.pop(future, None)
+            self._pending -= 1
+            if widget is not None:
+                self._set_busy(widget, -1)
+            if key is not None:
+                if self._latest.get(key) is not future:
+                    continue
+                del self._latest[key]
+                self._cancel.pop(key, None)
+            try:
+                self._deliver(future, on_done, on_error)
+            except Exception:
+                # Ошибка обработчика не должна останавливать разбор очереди
+                self.root.report_callback_exception(*sys.exc_info())
+        if self._pending:
+            self._poll_id = self.root.after(self.POLL_INTERVAL, self._poll)
+
+    # Отмененная задача без on_error завершается молча: отмену запросил сам пользователь
+    def _deliver(self, future, on_done, on_error):
+        error = QueryCancelled("Операция отменена") if future.cancelled() else future.exception()
+        if error is None:
+            if on_done is not None:
+                on_done(future.result())
+        elif on_error is not None:
+            on_error(error)
+        elif not isinstance(error, QueryCancelled):
+            messagebox.showerror("Ошибка", f"Не удалось выполнить операцию: {error}")
+
+    # Курсор ожидания на фрейме, пока у него есть незавершенные задачи
+    def _set_busy(self, widget, delta):
+        count = self._busy.get(widget, 0) + delta
+        try:
+            if delta > 0 and count == 1:
+                widget.configure(cursor="watch")
+            elif count <= 0:
+                widget.configure(cursor="")
+        except tk.TclError:
+            pass  # окно уже закрыто
+        if count > 0:
+            self._busy[widget] = count
+        else:
+            self._busy.pop(widget, None)
+
+    def is_busy(self, widget=None):
+        if widget is None:
+            return self._pending > 0
+        return widget in self._busy
+
+    # Ожидание незавершенных задач при выходе из приложения
+    def shutdown(self):
+        if self._poll_id is not None:
+            self.root.after_cancel(self._poll_id)
+            self._poll_id = None
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,179 @@
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Предел числа операций в одной фиксации и время, которое фиксация ждет
+# следующих операций, уже ожидающих очереди (с)
+MAX_BATCH = 200
+GROUP_WINDOW = 0.02
+
+
+# Поток писателя остановлен (закрытие приложения или сбой): операция не
+# будет зафиксирована. Наследует sqlite3.OperationalError, чтобы окна
+# показывали ее как обычную ошибку бд.
+class WriterStopped(sqlite3.OperationalError):
+    pass
+
+
+# Операции, фиксируемые одним COMMIT
+class Group:
+    def __init__(self):
+        self.size = 0
+        self.error = None
+        self.done = threading.Event()
+
+
+# --- Единственный писатель в бд ---
+# Все изменения идут через одно соединение и выполняются по очереди, поэтому
+# рабочие места не перехватывают друг у друга блокировку записи на каждую
+# операцию. Операция - тело блока Database.transaction() - выполняется в
+# потоке вызывающего под блокировкой писателя, внутри SAVEPOINT: ошибка
+# откатывает только ее. Поток писателя открывает транзакцию для группы
+# операций и фиксирует ее одним COMMIT, когда очередь опустела (или
+# набралось MAX_BATCH операций, или прошло GROUP_WINDOW). Вызывающий ждет
+# фиксации своей группы: при ошибке COMMIT она достается каждой операции
+# группы. В часы пик (заезд, импорт) одна фиксация обслуживает много
+# операций, а одиночная операция фиксируется сразу. Пока операция
+# выполняется, остальные (в том числе из главного потока) ждут, поэтому
+# массовые изменения делятся на короткие операции (см. importer.WRITE_SIZE).
+class Writer:
+    def __init__(self, database, max_batch=MAX_BATCH, window=GROUP_WINDOW):
+        self.database = database
+        self.max_batch = max_batch
+        self.window = window
+        self._conn = None
+        self._lock = threading.RLock()
+        self._cond = threading.Condition(self._lock)
+        self._group = None
+        self._queued = 0          # операции, ожидающие блокировки
+        self._queued_lock = threading.Lock()
+        self._savepoints = 0
+        self._local = threading.local()
+        self._closing = False
+        self._stopped = False
+        self._thread = None
+
+    # Запуск потока писателя; с этого момента Database.transaction() идет через него
+    def start(self):
+        self._conn = self.database.open_connection()
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+        self.database.writer = self
+        return self
+
+    # Фиксация оставшихся операций и остановка потока
+    def close(self):
+        self.database.writer = None
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+    # Соединение писателя, если текущий поток выполняет операцию (иначе None):
+    # чтение внутри блока транзакции должно видеть его незафиксированные изменения
+    def operation_connection(self):
+        if getattr(self._local, 'depth', 0):
+            return self._conn
+        return None
+
+    # PRAGMA data_version соединения писателя (см. Database.data_version)
+    def data_version(self):
+        with self._lock:
+            return "writer", self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _count(self, delta):
+        with self._queued_lock:
+            self._queued += delta
+
+    @contextmanager
+    def transaction(self):
+        depth = getattr(self._local, 'depth', 0)
+        if depth:
+            # Вложенный блок - часть операции, уже выполняемой этим потоком
+            with self._savepoint() as cursor:
+                yield cursor
+            return
+
+        self._count(1)
+        with self._cond:
+            self._count(-1)
+            if self._stopped or not self._thread.is_alive():
+                raise WriterStopped("Запись в базу данных остановлена")
+            if self._group is None:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                self.database.begin(self._conn)
+                self._group = Group()
+            group = self._group
+            self._local.depth = 1
+            try:
+                with self._savepoint() as cursor:
+                    yield cursor
+                group.size += 1
+            finally:
+                self._local.depth = 0
+                self._cond.notify_all()
+        group.done.wait()
+        if group.error is not None:
+            raise group.error
+
+    @contextmanager
+    def _savepoint(self):
+        self._savepoints += 1
+        name = f"op_{self._savepoints}"
+        self._conn.execute(f"SAVEPOINT {name}")
+        try:
+            yield self._conn.cursor()
+        except BaseException:
+            self._conn.execute(f"ROLLBACK TO {name}")
+            self._conn.execute(f"RELEASE {name}")
+            raise
+        else:
+            self._conn.execute(f"RELEASE {name}")
+
+    # Поток писателя: фиксация групп. Ожидающие операции группы освобождаются
+    # при любом исходе COMMIT, а если поток завершается (в том числе из-за
+    # непредвиденной ошибки), открытая группа получает WriterStopped,
+    # и новые операции сразу завершаются этой ошибкой.
+    def _run(self):
+        try:
+            while True:
+                with self._cond:
+                    while self._group is None and not self._closing:
+                        self._cond.wait()
+                    if self._group is None:
+                        return
+                    # Пока следующие операции ждут очереди, группа пополняется
+                    deadline = time.monotonic() + self.window
+                    while self._queued and self._group.size < self.max_batch:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    group, self._group = self._group, None
+                    try:
+                        self._conn.execute("COMMIT")
+                    except BaseException as e:
+                        group.error = e
+                        self._rollback()
+                    finally:
+                        group.done.set()
+        finally:
+            with self._cond:
+                self._stopped = True
+                group, self._group = self._group, None
+            if group is not None:
+                group.error = WriterStopped("Запись в базу данных остановлена")
+                group.done.set()
+
+    # Откат после неудачного COMMIT; если не удался и он, транзакция
+    # откатится при начале следующей группы (см. transaction())
+    def _rollback(self):
+        try:
+            if self._conn.in_transaction:
+                self._conn.execute("ROLLBACK")
+        except sqlite3.Error:
+            pass